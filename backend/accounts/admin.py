@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from .models import User, Role, PasswordResetToken, AuditLog
+from .audit_storage import bucket_model, ensure_bucket
 from .company_models import Company
 
 
@@ -76,11 +78,17 @@ class PasswordResetTokenAdmin(admin.ModelAdmin):
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
+    """Shows this month's audit bucket; the audit-logs API covers any date range."""
     list_display = ('action', 'user', 'entity_type', 'entity_id', 'created_at')
     list_filter = ('action', 'entity_type', 'created_at')
     search_fields = ('user__email', 'action', 'entity_type')
     readonly_fields = ('id', 'created_at')
     
+    def get_queryset(self, request):
+        month = timezone.now()
+        ensure_bucket(month)
+        return bucket_model(month).objects.select_related('user')
+    
     def has_add_permission(self, request):
         return False
     
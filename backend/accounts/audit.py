@@ -0,0 +1,188 @@
+"""
+Audit Log Writer
+Buffers AuditLog entries in process and writes them in bulk.
+
+Request handlers call record() (or record_request()), which only appends
+an unsaved AuditLog to an in-memory buffer. A background thread writes
+the buffer with bulk_create when it reaches FLUSH_SIZE entries or every
+FLUSH_INTERVAL seconds, whichever comes first. Entries keep the time
+they were recorded, not the time they were written.
+
+The buffer is flushed when the process exits (atexit), so a graceful
+worker restart loses nothing; a killed process loses at most the last
+interval. If the database is unavailable, entries are kept and retried,
+up to MAX_BUFFER entries.
+
+The writer thread also creates the upcoming monthly bucket tables (see
+accounts.audit_storage) every BUCKET_CHECK_SECONDS, so they exist before
+the month starts without a cron job.
+
+Configured by settings.AUDIT_LOG; with ASYNC off, record() writes
+immediately, which tests and one-off scripts may prefer.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .audit_storage import ensure_upcoming_buckets
+from .models import AuditLog
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'FLUSH_SIZE': 100,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_BUFFER': 50000,
+}
+
+BUCKET_CHECK_SECONDS = 6 * 60 * 60
+
+
+def get_client_ip(request):
+    """Get client IP address from request."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+class AuditWriter:
+    """In-process buffer of AuditLog entries with a background flusher thread."""
+
+    def __init__(self, flush_size=100, flush_interval=1.0, max_buffer=50000):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffer = []
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.stopping = False
+        self.buckets_checked_at = None
+
+    def add(self, entry):
+        with self.condition:
+            self._ensure_thread()
+            self.buffer.append(entry)
+            if len(self.buffer) >= self.flush_size:
+                self.condition.notify()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork: start one per process, on first use
+        if self.thread is not None and self.pid == os.getpid() and self.thread.is_alive():
+            return
+        self.pid = os.getpid()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                with self.condition:
+                    if not self.stopping and len(self.buffer) < self.flush_size:
+                        self.condition.wait(self.flush_interval)
+                    stopping = self.stopping
+                self.ensure_buckets()
+                self.flush()
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+    def ensure_buckets(self):
+        now = time.monotonic()
+        if self.buckets_checked_at is not None and now - self.buckets_checked_at < BUCKET_CHECK_SECONDS:
+            return
+        self.buckets_checked_at = now
+        try:
+            ensure_upcoming_buckets()
+        except Exception:
+            logger.exception('Could not create the upcoming audit log buckets')
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of entries written."""
+        with self.write_lock:
+            with self.condition:
+                entries, self.buffer = self.buffer, []
+            if not entries:
+                return 0
+            try:
+                AuditLog.objects.bulk_create(entries, batch_size=500)
+            except Exception:
+                logger.exception('Could not write %d audit log entries; will retry', len(entries))
+                # Reconnect on the next attempt
+                connection.close()
+                with self.condition:
+                    self.buffer[:0] = entries
+                    overflow = len(self.buffer) - self.max_buffer
+                    if overflow > 0:
+                        logger.error('Audit log buffer full, dropping %d oldest entries', overflow)
+                        del self.buffer[:overflow]
+                return 0
+            return len(entries)
+
+    def close(self):
+        """Stop the flusher thread after a final flush."""
+        with self.condition:
+            thread = self.thread if self.pid == os.getpid() else None
+            self.stopping = True
+            self.condition.notify()
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=10)
+        # Anything recorded while stopping, or left by a failed write
+        self.flush()
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG', {})}
+
+
+_config_values = _config()
+writer = AuditWriter(
+    flush_size=_config_values['FLUSH_SIZE'],
+    flush_interval=_config_values['FLUSH_INTERVAL'],
+    max_buffer=_config_values['MAX_BUFFER']
+)
+atexit.register(writer.close)
+
+
+def record(action, entity_type, user=None, entity_id=None, old_values=None, new_values=None,
+           ip_address=None, user_agent=''):
+    """Record an audit event. Returns the (possibly not yet saved) AuditLog."""
+    entry = AuditLog(
+        user=user,
+        action=action,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        old_values=old_values,
+        new_values=new_values,
+        ip_address=ip_address,
+        user_agent=user_agent
+    )
+    if _config()['ASYNC']:
+        writer.add(entry)
+    else:
+        entry.save()
+    return entry
+
+
+def record_request(request, action, entity_type, user=None, **fields):
+    """record() with the client IP and user agent of `request`."""
+    return record(
+        action,
+        entity_type,
+        user=user,
+        ip_address=get_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        **fields
+    )
@@ -0,0 +1,221 @@
+"""
+Audit Log Storage
+Monthly bucket tables for AuditLog entries.
+
+Audit entries are stored one table per calendar month (UTC):
+audit_logs_2026_10, audit_logs_2026_11, ... Each bucket has the columns
+and indexes of AuditLog. Writes through AuditLog (objects.create(),
+objects.bulk_create(), save()) are routed to the bucket of the entry's
+created_at. Reads go through search(), which only touches the buckets
+overlapping the requested date range, so queries over recent activity
+cost the same after years of data. Old buckets are archived and dropped
+whole by `manage.py archive_audit_logs`, without a large DELETE.
+
+Buckets are created ahead of time (after migrate, periodically by the
+audit writer thread, and by archive_audit_logs) and on first write if
+missing; a write inside a transaction that needs a new bucket is made
+when the transaction commits. The audit_logs table of the AuditLog model
+itself no longer receives rows.
+"""
+
+import datetime
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import DatabaseError, connection, models, transaction
+from django.utils import timezone
+
+from .models import AuditLog
+
+
+TABLE_PREFIX = 'audit_logs_'
+
+# Reads without a date range cover this much recent history
+DEFAULT_SEARCH_DAYS = 90
+
+_models = {}
+_known_tables = set()
+_lock = threading.Lock()
+
+
+def month_of(value):
+    """First day of the UTC month of a date or datetime."""
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = value.astimezone(datetime.timezone.utc)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def table_name(month):
+    return f'{TABLE_PREFIX}{month:%Y_%m}'
+
+
+def bucket_model(month):
+    """The model class for a month's bucket table (created once per process)."""
+    month = month_of(month)
+    model = _models.get(month)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(month)
+        if model is None:
+            model = _models[month] = _build_model(month)
+    return model
+
+
+def _build_model(month):
+    table = table_name(month)
+    attrs = {'__module__': __name__}
+    for field in AuditLog._meta.local_fields:
+        if field.name == 'user':
+            # Buckets outlive users; keep the id of deleted users
+            attrs['user'] = models.ForeignKey(
+                settings.AUTH_USER_MODEL,
+                on_delete=models.DO_NOTHING,
+                null=True,
+                blank=True,
+                related_name='+',
+                db_constraint=False
+            )
+        else:
+            attrs[field.name] = field.clone()
+    attrs['Meta'] = type('Meta', (), {
+        'app_label': AuditLog._meta.app_label,
+        'db_table': table,
+        'managed': False,
+        'ordering': ['-created_at'],
+        'indexes': [
+            models.Index(fields=['created_at'], name=f'{table}_created'),
+            models.Index(fields=['user', 'created_at'], name=f'{table}_user'),
+            models.Index(fields=['entity_type', 'entity_id'], name=f'{table}_entity'),
+            models.Index(fields=['action'], name=f'{table}_action'),
+        ],
+    })
+    return type(f'AuditLog{month:%Y%m}', (models.Model,), attrs)
+
+
+def existing_months():
+    """Months that have a bucket table, oldest first."""
+    tables = connection.introspection.table_names()
+    months = []
+    for table in tables:
+        if not table.startswith(TABLE_PREFIX):
+            continue
+        try:
+            months.append(datetime.datetime.strptime(table[len(TABLE_PREFIX):], '%Y_%m').date())
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def bucket_exists(month):
+    table = table_name(month_of(month))
+    if table not in _known_tables and table in connection.introspection.table_names():
+        _known_tables.add(table)
+    return table in _known_tables
+
+
+def ensure_bucket(month):
+    """
+    Create a month's bucket table if it does not exist yet. Must not run
+    inside a transaction on SQLite (see insert()).
+    """
+    month = month_of(month)
+    if bucket_exists(month):
+        return
+    table = table_name(month)
+    try:
+        model = bucket_model(month)
+        with connection.schema_editor() as editor:
+            editor.create_model(model)
+            # Not created with the table for unmanaged models
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+    except DatabaseError:
+        # Lost a race with another creator
+        if table not in connection.introspection.table_names():
+            raise
+    _known_tables.add(table)
+
+
+def ensure_upcoming_buckets(months_ahead=2):
+    """Create this month's bucket and the next ones."""
+    month = month_of(timezone.now())
+    for _ in range(months_ahead + 1):
+        ensure_bucket(month)
+        month = next_month(month)
+
+
+def drop_bucket(month):
+    model = bucket_model(month)
+    with connection.schema_editor() as editor:
+        editor.delete_model(model)
+    _known_tables.discard(model._meta.db_table)
+
+
+def insert(entries, batch_size=None):
+    """Write AuditLog instances to their months' buckets."""
+    by_month = {}
+    for entry in entries:
+        if entry.created_at is None:
+            entry.created_at = timezone.now()
+        by_month.setdefault(month_of(entry.created_at), []).append(entry)
+
+    for month, month_entries in by_month.items():
+        if connection.in_atomic_block and not bucket_exists(month):
+            # Tables cannot be created inside the caller's transaction on
+            # SQLite; write these entries once it commits
+            transaction.on_commit(partial(insert, month_entries, batch_size))
+            continue
+        ensure_bucket(month)
+        model = bucket_model(month)
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        model.objects.bulk_create(
+            [model(**{name: getattr(entry, name) for name in attnames}) for entry in month_entries],
+            batch_size=batch_size
+        )
+    return entries
+
+
+def search(start=None, end=None):
+    """
+    One queryset per bucket overlapping [start, end), newest first, each
+    filtered to the range. Defaults to the last DEFAULT_SEARCH_DAYS days.
+    """
+    if start is None:
+        start = timezone.now() - datetime.timedelta(days=DEFAULT_SEARCH_DAYS)
+    first, last = month_of(start), month_of(end) if end else None
+    querysets = []
+    for month in reversed(existing_months()):
+        if month < first or (last and month > last):
+            continue
+        queryset = bucket_model(month).objects.filter(created_at__gte=start)
+        if end:
+            queryset = queryset.filter(created_at__lt=end)
+        querysets.append(queryset)
+    return querysets
+
+
+def combine(querysets, ordering='-created_at'):
+    """A single ordered queryset over several buckets (UNION ALL)."""
+    if not querysets:
+        return AuditLog.objects.none()
+    if len(querysets) == 1:
+        return querysets[0].order_by(ordering)
+    first, *rest = [queryset.order_by() for queryset in querysets]
+    return first.union(*rest, all=True).order_by(ordering)
+
+
+def get_entry(pk):
+    """Find an entry by id in any bucket, newest buckets first."""
+    for month in reversed(existing_months()):
+        entry = bucket_model(month).objects.select_related('user').filter(pk=pk).first()
+        if entry is not None:
+            return entry
+    return None
@@ -0,0 +1,23 @@
+"""
+Authentication
+JWT authentication that keeps the token's role and tenant claims.
+"""
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .tokens import claims_from_token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that attaches the token's claims to the user as
+    `token_claims` (see accounts.tokens), so permission checks need not
+    load the role or profiles.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        claims = claims_from_token(validated_token, user)
+        if claims is not None:
+            user.token_claims = claims
+        return user
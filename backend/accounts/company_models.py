@@ -8,8 +8,10 @@ from django.db import models
 from django.core.validators import EmailValidator
 from django.utils import timezone
 
+from .tracking import TrackChangesMixin
 
-class Company(models.Model):
+
+class Company(TrackChangesMixin, models.Model):
     """
     Company model - represents a waste collection company (tenant).
     System Admin can manage multiple companies.
@@ -0,0 +1,99 @@
+"""
+Management command to archive and drop old audit log buckets.
+
+Audit entries are stored in one table per month (accounts.audit_storage).
+Buckets older than the retention period are written to gzip-compressed
+NDJSON files, one entry per line, and dropped once the file is complete.
+The command also creates the buckets for the coming months. Run it daily
+(e.g. from cron):
+
+    python manage.py archive_audit_logs
+    python manage.py archive_audit_logs --keep-months 24 --dry-run
+"""
+
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from accounts.audit_storage import (
+    bucket_model, drop_bucket, ensure_upcoming_buckets, existing_months, month_of, table_name
+)
+
+
+class Command(BaseCommand):
+    help = 'Archive audit log buckets older than the retention period and drop them'
+
+    def add_arguments(self, parser):
+        config = getattr(settings, 'AUDIT_LOG', {})
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=config.get('RETENTION_MONTHS', 12),
+            help='Months to keep besides the current one (default: AUDIT_LOG RETENTION_MONTHS)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=config.get('ARCHIVE_DIR') or os.path.join(settings.BASE_DIR, 'archive', 'audit_logs'),
+            help='Directory for the .ndjson.gz archives (default: AUDIT_LOG ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the buckets that would be archived',
+        )
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 0:
+            raise CommandError('--keep-months cannot be negative')
+
+        # First bucket to keep: the current month minus keep_months
+        cutoff = month_of(timezone.now())
+        for _ in range(options['keep_months']):
+            cutoff = month_of(cutoff - timedelta(days=1))
+        expired = [month for month in existing_months() if month < cutoff]
+
+        if options['dry_run']:
+            for month in expired:
+                self.stdout.write(f'  {table_name(month)}: {bucket_model(month).objects.count()} entries')
+            self.stdout.write(self.style.SUCCESS(f'✓ {len(expired)} buckets older than {cutoff:%Y-%m} would be archived'))
+            return
+
+        ensure_upcoming_buckets()
+        os.makedirs(options['output_dir'], exist_ok=True)
+        archived = 0
+        for month in expired:
+            path = os.path.join(options['output_dir'], f'{table_name(month)}.ndjson.gz')
+            written = self.archive(month, path)
+            if written != bucket_model(month).objects.count():
+                # Entries arrived while archiving; keep the bucket and retry next run
+                os.unlink(path)
+                self.stderr.write(f'  {table_name(month)} changed while archiving, skipped')
+                continue
+            drop_bucket(month)
+            archived += written
+            self.stdout.write(f'  {table_name(month)}: {written} entries -> {path}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Archived {archived} entries from buckets older than {cutoff:%Y-%m}'
+        ))
+
+    def archive(self, month, path):
+        """Write a bucket to `path` as gzipped NDJSON. Returns the number of entries."""
+        model = bucket_model(month)
+        fields = [field.attname for field in model._meta.concrete_fields]
+        temp_path = f'{path}.tmp'
+        written = 0
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            rows = model.objects.order_by('created_at', 'id').values(*fields)
+            for row in rows.iterator(chunk_size=5000):
+                f.write(json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')))
+                f.write('\n')
+                written += 1
+        os.replace(temp_path, path)
+        return written
@@ -0,0 +1,129 @@
+"""
+Management command that measures login throughput.
+
+Sends the same login request from several threads at once and reports
+logins per second and latency percentiles. Requests go through the full
+API stack in process (middleware, serializer, token generation, audit
+log), or to a running server with --url:
+
+    python manage.py benchmark_logins --email admin@example.com --password secret
+    python manage.py benchmark_logins --card-number 12345678 --password secret \\
+        --concurrency 16 --requests 500 --url http://localhost:8000/api/v1/auth/login/
+
+Every request is a real login: it updates the user's last login and
+writes an audit log entry. Password hashing dominates the cost of a
+login, so results depend on PASSWORD_HASHERS and the number of cores.
+"""
+
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Measure logins per second under concurrent requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Log in with this email')
+        parser.add_argument('--card-number', help='Log in with this card number')
+        parser.add_argument('--password', required=True, help='Password of the account')
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Concurrent logins (default: 8)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Total logins to send (default: 200)',
+        )
+        parser.add_argument(
+            '--url',
+            help='Login URL of a running server (default: call the API in process)',
+        )
+
+    def handle(self, *args, **options):
+        if bool(options['email']) == bool(options['card_number']):
+            raise CommandError('Pass exactly one of --email or --card-number')
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+
+        credentials = {'password': options['password']}
+        if options['email']:
+            credentials['email'] = options['email']
+        else:
+            credentials['card_number'] = options['card_number']
+        login = self.remote_login(options['url'], credentials) if options['url'] else self.local_login(credentials)
+
+        # Fail fast on bad credentials rather than timing error responses
+        status = login()[0]
+        if status != 200:
+            raise CommandError(f'Login failed with status {status}')
+
+        def timed_login(_):
+            started = time.perf_counter()
+            try:
+                status = login()[0]
+            finally:
+                if not options['url']:
+                    connection.close()
+            return status, time.perf_counter() - started
+
+        self.stdout.write(
+            f"Sending {options['requests']} logins, {options['concurrency']} at a time..."
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(timed_login, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for status, latency in results if status == 200)
+        failed = len(results) - len(latencies)
+        if not latencies:
+            raise CommandError(f'All {failed} logins failed')
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(f'  Latency: median {statistics.median(latencies) * 1000:.0f} ms, '
+                          f'p95 {percentile(0.95):.0f} ms, max {latencies[-1] * 1000:.0f} ms')
+        if failed:
+            self.stdout.write(self.style.WARNING(f'  {failed} logins failed'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(latencies) / elapsed:.1f} logins/sec ({len(latencies)} in {elapsed:.2f}s)'
+        ))
+
+    def local_login(self, credentials):
+        from rest_framework.test import APIClient
+
+        url = reverse('login')
+        clients = threading.local()
+
+        def login():
+            if not hasattr(clients, 'client'):
+                clients.client = APIClient()
+            response = clients.client.post(url, credentials, format='json')
+            return response.status_code, response
+        return login
+
+    def remote_login(self, url, credentials):
+        body = json.dumps(credentials).encode()
+
+        def login():
+            request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return response.status, response.read()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read()
+        return login
@@ -0,0 +1,19 @@
+"""
+Accounts Middleware
+"""
+
+from .tracking import current_request
+
+
+class AuditContextMiddleware:
+    """Makes the current request available to model change auditing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            current_request.reset(token)
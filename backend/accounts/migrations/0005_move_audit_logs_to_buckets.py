@@ -0,0 +1,99 @@
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+
+
+TABLE_PREFIX = 'audit_logs_'
+
+
+def bucket_model(apps, AuditLog, month):
+    """
+    The bucket table of a month, as a model in the migration's app
+    registry, with the columns and indexes the buckets had when this
+    migration was written.
+    """
+    table = f'{TABLE_PREFIX}{month:%Y_%m}'
+    attrs = {'__module__': __name__}
+    for field in AuditLog._meta.local_fields:
+        if field.name == 'user':
+            attrs['user'] = models.ForeignKey(
+                settings.AUTH_USER_MODEL,
+                on_delete=models.DO_NOTHING,
+                null=True,
+                blank=True,
+                related_name='+',
+                db_constraint=False
+            )
+        else:
+            attrs[field.name] = field.clone()
+    attrs['Meta'] = type('Meta', (), {
+        'apps': apps,
+        'app_label': 'accounts',
+        'db_table': table,
+        'managed': False,
+        'indexes': [
+            models.Index(fields=['created_at'], name=f'{table}_created'),
+            models.Index(fields=['user', 'created_at'], name=f'{table}_user'),
+            models.Index(fields=['entity_type', 'entity_id'], name=f'{table}_entity'),
+            models.Index(fields=['action'], name=f'{table}_action'),
+        ],
+    })
+    return type(f'MigrationAuditLog{month:%Y%m}', (models.Model,), attrs)
+
+
+def move_to_buckets(apps, schema_editor):
+    """
+    Move existing audit_logs rows into the monthly bucket tables, one month
+    per transaction: create the bucket if needed, INSERT ... SELECT the
+    month's rows and DELETE them from audit_logs. A failed run leaves
+    whole months either moved or not, and can be run again.
+    """
+    AuditLog = apps.get_model('accounts', 'AuditLog')
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    columns = ', '.join(quote(field.column) for field in AuditLog._meta.concrete_fields)
+    source = quote(AuditLog._meta.db_table)
+
+    while True:
+        first = AuditLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            break
+        first = first.astimezone(datetime.timezone.utc)
+        start = datetime.datetime(first.year, first.month, 1, tzinfo=datetime.timezone.utc)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+        model = bucket_model(apps, AuditLog, start.date())
+        target = model._meta.db_table
+
+        bounds = [connection.ops.adapt_datetimefield_value(value) for value in (start, end)]
+
+        with transaction.atomic(using=connection.alias):
+            if target not in connection.introspection.table_names():
+                schema_editor.create_model(model)
+                # Not created with the table for unmanaged models
+                for index in model._meta.indexes:
+                    schema_editor.add_index(model, index)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {quote(target)} ({columns}) SELECT {columns} FROM {source} '
+                    f'WHERE {quote("created_at")} >= %s AND {quote("created_at")} < %s',
+                    bounds
+                )
+                cursor.execute(
+                    f'DELETE FROM {source} WHERE {quote("created_at")} >= %s AND {quote("created_at")} < %s',
+                    bounds
+                )
+
+
+class Migration(migrations.Migration):
+
+    # Each month is moved in its own transaction
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0004_audit_log_created_at_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_buckets, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -136,15 +137,17 @@ class User(AbstractUser):
     
     def has_role(self, role_name):
         """Check if user has a specific role."""
-        return self.role and self.role.name == role_name
+        from .roles import get_roles
+        return self.role_id is not None and get_roles().name(self.role_id) == role_name
     
     def has_permission(self, permission_key):
         """Check if user has a specific permission."""
         if self.is_superuser:
             return True
-        if self.role and self.role.permissions:
-            return self.role.permissions.get(permission_key, False)
-        return False
+        if self.role_id is None:
+            return False
+        from .roles import get_roles
+        return get_roles().has_permission(self.role_id, permission_key)
 
 
 class PasswordResetToken(models.Model):
@@ -170,8 +173,26 @@ class PasswordResetToken(models.Model):
         return not self.used and self.expires_at > timezone.now()
 
 
+class AuditLogManager(models.Manager):
+    """Writes entries to the monthly bucket tables (see accounts.audit_storage)."""
+    
+    def create(self, **kwargs):
+        entry = self.model(**kwargs)
+        entry.save()
+        return entry
+    
+    def bulk_create(self, objs, batch_size=None, **kwargs):
+        from .audit_storage import insert
+        return insert(list(objs), batch_size=batch_size)
+
+
 class AuditLog(models.Model):
-    """Model for audit logging."""
+    """
+    Model for audit logging.
+    
+    Entries are stored in monthly bucket tables; read them with
+    accounts.audit_storage.search().
+    """
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_logs')
@@ -182,7 +203,8 @@ class AuditLog(models.Model):
     new_values = models.JSONField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the event is recorded; entries may be written later in bulk
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'audit_logs'
@@ -193,5 +215,11 @@ class AuditLog(models.Model):
             models.Index(fields=['action']),
         ]
     
+    objects = AuditLogManager()
+    
     def __str__(self):
         return f"{self.action} by {self.user} on {self.created_at}"
+    
+    def save(self, *args, **kwargs):
+        from .audit_storage import insert
+        insert([self])
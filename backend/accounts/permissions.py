@@ -1,5 +1,15 @@
 from rest_framework import permissions
 
+from .roles import get_roles
+
+
+def role_name(user):
+    """Name of the user's role, from the token claims or the role catalogue."""
+    claims = getattr(user, 'token_claims', None)
+    if claims is not None:
+        return claims['role']
+    return get_roles().name(user.role_id)
+
 
 class IsSystemAdmin(permissions.BasePermission):
     """Permission check for system admin users."""
@@ -7,7 +17,7 @@ class IsSystemAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and (
             request.user.is_superuser or 
-            (request.user.role and request.user.role.name == 'system_admin')
+            role_name(request.user) == 'system_admin'
         )
 
 
@@ -17,7 +27,7 @@ class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and (
             request.user.is_superuser or 
-            (request.user.role and request.user.role.name in ['system_admin', 'admin'])
+            role_name(request.user) in ['system_admin', 'admin']
         )
 
 
@@ -29,7 +39,7 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     
     def has_object_permission(self, request, view, obj):
         # Admin can access any object
-        if request.user.is_superuser or (request.user.role and request.user.role.name == 'admin'):
+        if request.user.is_superuser or role_name(request.user) == 'admin':
             return True
         
         # Owner can access their own object
@@ -44,7 +54,7 @@ class IsFinanceManager(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and (
             request.user.is_superuser or
-            (request.user.role and request.user.role.name in ['admin', 'finance_manager'])
+            role_name(request.user) in ['admin', 'finance_manager']
         )
 
 
@@ -54,5 +64,5 @@ class IsAccountant(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and (
             request.user.is_superuser or
-            (request.user.role and request.user.role.name in ['admin', 'finance_manager', 'accountant'])
+            role_name(request.user) in ['admin', 'finance_manager', 'accountant']
         )
@@ -0,0 +1,81 @@
+"""
+Role Catalogue
+Process-local cache of every Role and its permissions.
+
+Roles are few and rarely edited, but User.has_role(), has_permission()
+and the permission classes look them up on almost every request. The
+catalogue loads all roles in one query and answers those lookups from
+dictionaries.
+
+It is stamped with the version of the roles table (number of roles and
+latest updated_at, which every Role save moves forward). Saving or
+deleting a role drops this process's catalogue immediately (see
+signals.py); other processes compare the stamp with the database at most
+every ROLE_CHECK_SECONDS and reload when it changed.
+"""
+
+import threading
+import time
+
+from django.db.models import Count, Max
+
+from .models import Role
+
+
+ROLE_CHECK_SECONDS = 30
+
+_lock = threading.Lock()
+_catalogue = None
+_checked_at = 0.0
+
+
+class RoleCatalogue:
+    """Roles by id, with their names and permissions. Treat as read-only."""
+
+    def __init__(self, roles, version):
+        self.version = version
+        self.names = {}
+        self.permissions = {}
+        for role_id, name, permissions in roles:
+            self.names[role_id] = name
+            self.permissions[role_id] = permissions if isinstance(permissions, dict) else {}
+
+    def name(self, role_id):
+        return self.names.get(role_id)
+
+    def has_permission(self, role_id, permission_key):
+        return self.permissions.get(role_id, {}).get(permission_key, False)
+
+
+def current_version():
+    """Version stamp of the roles table."""
+    stamp = Role.objects.aggregate(n=Count('id'), changed=Max('updated_at'))
+    return (stamp['n'], stamp['changed'])
+
+
+def load_catalogue():
+    version = current_version()
+    return RoleCatalogue(Role.objects.values_list('id', 'name', 'permissions'), version)
+
+
+def get_roles():
+    """The process-wide role catalogue, reloaded when missing or stale."""
+    global _catalogue, _checked_at
+    catalogue = _catalogue
+    if catalogue is not None and time.monotonic() - _checked_at < ROLE_CHECK_SECONDS:
+        return catalogue
+    with _lock:
+        now = time.monotonic()
+        if _catalogue is not None and now - _checked_at < ROLE_CHECK_SECONDS:
+            return _catalogue
+        if _catalogue is None or current_version() != _catalogue.version:
+            _catalogue = load_catalogue()
+        _checked_at = now
+        return _catalogue
+
+
+def invalidate_roles():
+    """Drop the cached catalogue so the next lookup reloads it."""
+    global _catalogue
+    with _lock:
+        _catalogue = None
@@ -1,7 +1,11 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.auth import authenticate
+from django.utils import timezone
 from .models import User, Role, AuditLog
+from .tokens import ClaimsRefreshToken, claims_for
 
 
 class RoleSerializer(serializers.ModelSerializer):
@@ -132,26 +136,32 @@ class LoginSerializer(serializers.Serializer):
         
         user = None
         
-        # Try card_number login first (for customers)
+        # Try card_number login first (for customers): one query on the
+        # unique card_number index, joined to the user and role
         if card_number:
-            from customers.models import Customer
-            try:
-                customer = Customer.objects.select_related('user').get(card_number=card_number)
-                if customer.user:
-                    user = customer.user
-                    if user.check_password(password):
-                        if not user.is_active:
-                            raise serializers.ValidationError('User account is disabled.')
-                    else:
-                        user = None
-                else:
+            user = self.login_users().filter(customer_profile__card_number=card_number).first()
+            if user is None:
+                from customers.models import Customer
+                if Customer.objects.filter(card_number=card_number).exists():
                     raise serializers.ValidationError('No user account linked to this card.')
-            except Customer.DoesNotExist:
                 raise serializers.ValidationError('Invalid card number.')
+            self.check_not_locked(user)
+            if user.check_password(password):
+                if not user.is_active:
+                    raise serializers.ValidationError('User account is disabled.')
+            else:
+                user = None
         
         # Try email login (for staff/admin)
         if not user and email:
-            user = authenticate(username=email, password=password)
+            user = self.login_users().filter(email=email).first()
+            if user is None:
+                # Hash anyway, so unknown emails take as long as wrong passwords
+                User().set_password(password)
+            else:
+                self.check_not_locked(user)
+                if not user.check_password(password) or not user.is_active:
+                    user = None
         
         if not user:
             raise serializers.ValidationError('Unable to log in with provided credentials.')
@@ -164,6 +174,49 @@ class LoginSerializer(serializers.Serializer):
         
         attrs['user'] = user
         return attrs
+    
+    @staticmethod
+    def check_not_locked(user):
+        """Refuse locked accounts before hashing the password."""
+        if user.account_locked_until and user.account_locked_until > timezone.now():
+            wait = (user.account_locked_until - timezone.now()).total_seconds()
+            raise Throttled(wait=wait, detail='Too many failed login attempts.')
+    
+    @staticmethod
+    def login_users():
+        """Users with the role the login response includes, in the same query."""
+        return User.objects.select_related('role')
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that re-reads the role and tenant claims from the database."""
+    
+    token_class = ClaimsRefreshToken
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(
+            **{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed('User not found or inactive.', code='user_inactive')
+        refresh.set_claims(claims_for(user))
+        
+        data = {'access': str(refresh.access_token)}
+        
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Token blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
 
 
 class AuditLogSerializer(serializers.ModelSerializer):
@@ -0,0 +1,27 @@
+"""
+Accounts Signals
+Creates the upcoming audit log buckets after migrations, and drops the
+cached role catalogue when a role changes.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .audit_storage import ensure_upcoming_buckets
+from .models import Role
+from .roles import invalidate_roles
+
+
+@receiver(post_migrate)
+def create_audit_buckets(sender, app_config=None, using='default', **kwargs):
+    if app_config is not None and app_config.label == 'accounts':
+        ensure_upcoming_buckets()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def drop_role_catalogue(sender, **kwargs):
+    invalidate_roles()
+    # Other threads may reload the old roles until the change commits
+    transaction.on_commit(invalidate_roles)
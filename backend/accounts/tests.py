@@ -1,3 +1,134 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from operations.models import Collector
+from . import audit_storage
+from .models import AuditLog, User
+
+
+class AuditBucketTests(TransactionTestCase):
+    """Writes to a month whose bucket table does not exist yet."""
+
+    month = date(2031, 5, 1)
+
+    def tearDown(self):
+        if self.month in audit_storage.existing_months():
+            audit_storage.drop_bucket(self.month)
+
+    def test_write_inside_transaction_creates_bucket_on_commit(self):
+        with transaction.atomic():
+            AuditLog.objects.create(
+                action='update', entity_type='schedule', created_at=datetime(2031, 5, 3, tzinfo=timezone.utc)
+            )
+
+        self.assertEqual(audit_storage.bucket_model(self.month).objects.count(), 1)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'audit_logs_2031_05')
+        self.assertIn('audit_logs_2031_05_created', constraints)
+
+    def test_write_inside_rolled_back_transaction_is_dropped(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                AuditLog.objects.create(
+                    action='update', entity_type='schedule', created_at=datetime(2031, 5, 3, tzinfo=timezone.utc)
+                )
+                raise RuntimeError
+
+        self.assertNotIn(self.month, audit_storage.existing_months())
+
+
+class MoveAuditLogsMigrationTests(TransactionTestCase):
+    """accounts 0005 moves legacy audit_logs rows into the bucket tables."""
+
+    migration = import_module('accounts.migrations.0005_move_audit_logs_to_buckets')
+    months = [date(2031, 6, 1), date(2031, 7, 1)]
+
+    def setUp(self):
+        self.apps = MigrationExecutor(connection).loader.project_state(
+            ('accounts', '0005_move_audit_logs_to_buckets')
+        ).apps
+        LegacyAuditLog = self.apps.get_model('accounts', 'AuditLog')
+        LegacyAuditLog.objects.bulk_create([
+            LegacyAuditLog(action='update', entity_type='customer', created_at=datetime(2031, 6, 1, tzinfo=timezone.utc)),
+            LegacyAuditLog(action='update', entity_type='customer', created_at=datetime(2031, 6, 30, 23, 59, tzinfo=timezone.utc)),
+            LegacyAuditLog(action='create', entity_type='route', created_at=datetime(2031, 7, 1, tzinfo=timezone.utc)),
+        ])
+        # Created ahead of time by the running application
+        audit_storage.ensure_bucket(self.months[1])
+
+    def tearDown(self):
+        for month in self.months:
+            if month in audit_storage.existing_months():
+                audit_storage.drop_bucket(month)
+
+    def move(self):
+        with connection.schema_editor(atomic=False) as editor:
+            self.migration.move_to_buckets(self.apps, editor)
+
+    def test_rows_move_to_their_months_and_rerun_is_harmless(self):
+        self.move()
+        self.move()
+
+        self.assertFalse(self.apps.get_model('accounts', 'AuditLog').objects.exists())
+        self.assertEqual(audit_storage.bucket_model(self.months[0]).objects.count(), 2)
+        self.assertEqual(
+            list(audit_storage.bucket_model(self.months[1]).objects.values_list('entity_type', flat=True)),
+            ['route']
+        )
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'audit_logs_2031_06')
+        self.assertIn('audit_logs_2031_06_created', constraints)
+
+
+class ChangeTrackingActionTests(TestCase):
+    """The audited action is the API action that saved the instance."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ops@example.com', 'pw12345!', first_name='Ops', last_name='User')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.collector = Collector.objects.create(
+            employee_id='C1', first_name='Jean', last_name='K', phone='0788000001'
+        )
+
+    def audited_action(self, method, url, data=None):
+        with mock.patch('accounts.audit.record') as record:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(url, data or {}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(record.call_count, 1)
+        return record.call_args.args[0]
+
+    def test_extra_action_is_recorded_with_its_full_name(self):
+        action = self.audited_action('post', f'/api/v1/operations/collectors/{self.collector.id}/set_on_leave/')
+
+        self.assertEqual(action, 'set_on_leave')
+
+    def test_standard_update_is_recorded_as_update(self):
+        action = self.audited_action('patch', f'/api/v1/operations/collectors/{self.collector.id}/', {'notes': 'x'})
+
+        self.assertEqual(action, 'update')
+
+
+@override_settings(LOGIN_THROTTLE={'MAX_ACCOUNT_FAILURES': 2})
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('staff@example.com', 'pw12345!', first_name='Staff', last_name='User')
+
+    def test_lock_matches_the_email_case_insensitively(self):
+        for _ in range(2):
+            response = self.client.post('/api/v1/auth/login/', {'email': 'Staff@Example.COM', 'password': 'wrong'})
+            self.assertEqual(response.status_code, 400)
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.account_locked_until)
+        self.assertEqual(self.user.failed_login_attempts, 2)
@@ -0,0 +1,149 @@
+"""
+Login Throttling
+Brute-force protection for LoginView, with counters kept in a cache.
+
+Failed logins are counted per client IP, per email and per card number
+in sliding windows of WINDOW_SECONDS. The counters live in the cache
+named by LOGIN_THROTTLE['CACHE'] (the default cache, local memory unless
+CACHES says otherwise; use Redis or Memcached to share counts between
+processes), so a burst of failed attempts costs cache increments rather
+than writes to the users table.
+
+When an email or card number reaches MAX_ACCOUNT_FAILURES, it is locked
+for LOCKOUT_SECONDS. The lock is kept in the cache and written to the
+user's account_locked_until and failed_login_attempts once, when it
+starts, so it also holds in processes that do not share the cache. An IP
+that reaches MAX_IP_FAILURES is refused until its count decays. Refused
+attempts are answered without hashing the password.
+"""
+
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .audit import get_client_ip
+from .models import User
+
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'WINDOW_SECONDS': 15 * 60,
+    'MAX_IP_FAILURES': 100,
+    'MAX_ACCOUNT_FAILURES': 5,
+    'LOCKOUT_SECONDS': 15 * 60,
+}
+
+KEY_PREFIX = 'login-throttle'
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'LOGIN_THROTTLE', {})}
+
+
+class SlidingWindowCounter:
+    """
+    Approximate sliding-window event counts in a cache: the count of the
+    current fixed window plus the previous window's count, weighted by how
+    much of it still overlaps the sliding window.
+    """
+
+    def __init__(self, cache, window):
+        self.cache = cache
+        self.window = window
+
+    def _keys(self, key, now):
+        bucket, offset = divmod(now, self.window)
+        bucket = int(bucket)
+        return f'{key}:{bucket}', f'{key}:{bucket - 1}', 1 - offset / self.window
+
+    def count(self, key, now=None):
+        current, previous, weight = self._keys(key, now or time.time())
+        values = self.cache.get_many([current, previous])
+        return values.get(current, 0) + values.get(previous, 0) * weight
+
+    def hit(self, key, now=None):
+        """Count one event. Returns the new count."""
+        current, previous, weight = self._keys(key, now or time.time())
+        # Kept for two windows: as the current one, then as the previous one
+        self.cache.add(current, 0, timeout=2 * self.window)
+        try:
+            count = self.cache.incr(current)
+        except ValueError:
+            # Evicted between add() and incr()
+            self.cache.set(current, 1, timeout=2 * self.window)
+            count = 1
+        return count + self.cache.get(previous, 0) * weight
+
+    def reset(self, key, now=None):
+        current, previous, _ = self._keys(key, now or time.time())
+        self.cache.delete_many([current, previous])
+
+
+def _key(scope, value):
+    # Hashed: emails may hold characters some cache backends reject in keys
+    return f'{KEY_PREFIX}:{scope}:{hashlib.sha256(value.encode()).hexdigest()[:32]}'
+
+
+def normalize_email(email):
+    return str(email).strip().lower()
+
+
+def account_keys(data):
+    """Counter keys of the email and card number a login attempt names."""
+    keys = []
+    if data.get('email'):
+        keys.append(('email', _key('email', normalize_email(data['email']))))
+    if data.get('card_number'):
+        keys.append(('card_number', _key('card', str(data['card_number']).strip())))
+    return keys
+
+
+class LoginThrottle:
+    """Failed-login counters and locks for one login request."""
+
+    def __init__(self, request, data):
+        config = _config()
+        self.config = config
+        self.cache = caches[config['CACHE']]
+        self.counter = SlidingWindowCounter(self.cache, config['WINDOW_SECONDS'])
+        self.data = data
+        self.ip_key = _key('ip', get_client_ip(request) or '')
+        self.account_keys = account_keys(data)
+
+    def wait(self):
+        """Seconds until this attempt may be made, or None if it may be made now."""
+        locks = self.cache.get_many([f'{key}:locked' for _, key in self.account_keys])
+        if locks:
+            return max(1, int(max(locks.values()) - time.time()))
+        if self.counter.count(self.ip_key) >= self.config['MAX_IP_FAILURES']:
+            return self.config['WINDOW_SECONDS']
+        return None
+
+    def failed(self):
+        """Count a failed attempt, locking the accounts that reached the limit."""
+        self.counter.hit(self.ip_key)
+        limit = self.config['MAX_ACCOUNT_FAILURES']
+        for field, key in self.account_keys:
+            failures = self.counter.hit(key)
+            # Only the attempt that crosses the limit starts the lock
+            if failures - 1 < limit <= failures:
+                self.lock(field, key, int(failures))
+
+    def lock(self, field, key, failures):
+        lockout = self.config['LOCKOUT_SECONDS']
+        self.cache.set(f'{key}:locked', time.time() + lockout, timeout=lockout)
+        if field == 'email':
+            users = User.objects.filter(email__iexact=normalize_email(self.data['email']))
+        else:
+            users = User.objects.filter(customer_profile__card_number=self.data['card_number'])
+        users.update(failed_login_attempts=failures, account_locked_until=timezone.now() + timedelta(seconds=lockout))
+
+    def succeeded(self):
+        """Forget the failures of the accounts that just logged in."""
+        for _, key in self.account_keys:
+            self.counter.reset(key)
+            self.cache.delete(f'{key}:locked')
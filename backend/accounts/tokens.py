@@ -0,0 +1,87 @@
+"""
+Token Claims
+Role and tenant claims carried by the JWT access and refresh tokens.
+
+Tokens issued at login (and on refresh) carry the user's role, company
+and collector/customer profile ids, so permission checks and the portals
+read them from the token instead of loading the role and profiles on
+every request. ClaimsJWTAuthentication (accounts.authentication) attaches
+them to request.user; user_claim() reads them, falling back to the
+database for users authenticated another way (e.g. the Django admin) or
+with tokens issued before claims were added.
+
+Claims are re-read from the database whenever a refresh token is
+exchanged. A token's claims are only trusted while its role_id and
+company_id match the user's, so moving a user to another role or company
+applies to their next request. The profile claims are only a hint that a
+profile exists: the portals still load the profile itself, and a null
+profile claim is checked against the database, since a profile may have
+been linked after the token was issued.
+"""
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+CLAIMS = ('role_id', 'role', 'company_id', 'collector_id', 'customer_id')
+
+PROFILE_CLAIMS = ('collector_id', 'customer_id')
+
+
+def _str(value):
+    return str(value) if value is not None else None
+
+
+def claims_for(user):
+    """The claims of `user`, from the database."""
+    from .models import User
+    from .roles import get_roles
+
+    collector_id, customer_id = User.objects.filter(pk=user.pk).values_list(
+        'collector_profile__id', 'customer_profile__id'
+    ).first() or (None, None)
+    return {
+        'role_id': _str(user.role_id),
+        'role': get_roles().name(user.role_id),
+        'company_id': _str(user.company_id),
+        'collector_id': _str(collector_id),
+        'customer_id': _str(customer_id),
+    }
+
+
+def claims_from_token(token, user):
+    """
+    The claims in a validated token of `user`, or None if the token
+    predates them or the user's role or company changed since.
+    """
+    if any(name not in token for name in CLAIMS):
+        return None
+    if token['role_id'] != _str(user.role_id) or token['company_id'] != _str(user.company_id):
+        return None
+    return {name: token[name] for name in CLAIMS}
+
+
+def user_claim(user, name):
+    """
+    A claim of the user's token, or the same value read from the database.
+    Null profile claims are read from the database too, once per request.
+    """
+    claims = getattr(user, 'token_claims', None)
+    unlinked = claims is not None and name in PROFILE_CLAIMS and claims[name] is None
+    if claims is None or (unlinked and not getattr(user, 'token_claims_checked', False)):
+        claims = user.token_claims = claims_for(user)
+        user.token_claims_checked = True
+    return claims[name]
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token (and access tokens made from it) carrying CLAIMS."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_claims(claims_for(user))
+        return token
+
+    def set_claims(self, claims):
+        for name, value in claims.items():
+            self[name] = value
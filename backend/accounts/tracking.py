@@ -0,0 +1,200 @@
+"""
+Model Change Tracking
+Audits field-level changes to models, with old and new values.
+
+Models opt in with TrackChangesMixin. When an instance is loaded from the
+database, the mixin keeps the row it was built from (the tuple the query
+returned, with JSON values copied), so saving needs no extra query. On
+save(), the loaded values are compared with the instance's current ones;
+if any differ, an AuditLog entry with just the changed fields in
+old_values/new_values is recorded when the transaction commits, through
+the buffered writer in accounts.audit, which inserts entries in bulk.
+Rolled-back changes are not audited.
+
+The entry's user, IP and action come from the request being handled (see
+accounts.middleware.AuditContextMiddleware): the action is the API action
+that saved the instance (e.g. "suspend"), or "update".
+"""
+
+import contextvars
+import datetime
+import decimal
+import uuid
+from functools import partial
+
+from django.db import models, router, transaction
+
+
+# Set by AuditContextMiddleware for the duration of a request
+current_request = contextvars.ContextVar('current_request', default=None)
+
+# Viewset actions that are plain updates rather than named actions
+STANDARD_ACTIONS = {'list', 'create', 'retrieve', 'update', 'partial_update', 'destroy'}
+
+
+def jsonable(value):
+    """A value as stored in AuditLog's JSON columns."""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def copy_json(value):
+    """Copy of a decoded JSON value (cheaper than copy.deepcopy)."""
+    if isinstance(value, dict):
+        return {key: copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_json(item) for item in value]
+    return value
+
+
+def request_context():
+    """User, action, IP and user agent of the current request, if any."""
+    request = current_request.get()
+    if request is None:
+        return {}
+
+    from .audit import get_client_ip
+
+    # DRF sets the authenticated user on the underlying Django request
+    user = getattr(request, 'user', None)
+    return {
+        'user': user if user is not None and user.is_authenticated else None,
+        'action': request_action(request),
+        'ip_address': get_client_ip(request),
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+    }
+
+
+def request_action(request):
+    """
+    Name of the API action a request runs: the viewset action (e.g.
+    "set_on_leave"), or the URL name for other views. None for the
+    standard viewset actions.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    # Set by DRF's ViewSetMixin.as_view(): {method: action}
+    actions = getattr(match.func, 'actions', None)
+    if actions is not None:
+        action = actions.get(request.method.lower())
+    else:
+        action = match.url_name.replace('-', '_') if match.url_name else None
+    return action if action not in STANDARD_ACTIONS else None
+
+
+def record_change(entity_type, entity_id, old_values, new_values, context):
+    from . import audit
+
+    audit.record(
+        context.get('action') or 'update',
+        entity_type,
+        user=context.get('user'),
+        entity_id=entity_id,
+        old_values=old_values,
+        new_values=new_values,
+        ip_address=context.get('ip_address'),
+        user_agent=context.get('user_agent', '')
+    )
+
+
+class TrackChangesMixin:
+    """
+    Records an AuditLog entry with the changed fields whenever a loaded
+    instance is saved. Fields in AUDIT_EXCLUDE and auto_now timestamps are
+    ignored.
+    """
+
+    AUDIT_EXCLUDE = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # JSON values can be changed in place; keep a copy to compare with
+        json_positions = cls._json_positions(field_names)
+        if json_positions:
+            values = list(values)
+            for i in json_positions:
+                values[i] = copy_json(values[i])
+        instance._audit_loaded = (field_names, values)
+        return instance
+
+    @classmethod
+    def _json_positions(cls, field_names):
+        # Every row of a query passes the same field_names list
+        cached = cls.__dict__.get('_audit_json_positions')
+        if cached is not None and cached[0] is field_names:
+            return cached[1]
+        json_fields = {field.attname for field in cls._meta.concrete_fields if isinstance(field, models.JSONField)}
+        positions = [i for i, name in enumerate(field_names) if name in json_fields]
+        cls._audit_json_positions = (field_names, positions)
+        return positions
+
+    @classmethod
+    def audited_fields(cls):
+        fields = cls.__dict__.get('_audited_fields')
+        if fields is None:
+            fields = frozenset(
+                field.attname for field in cls._meta.concrete_fields
+                if not getattr(field, 'auto_now', False) and field.name not in cls.AUDIT_EXCLUDE
+            )
+            cls._audited_fields = fields
+        return fields
+
+    def audit_changes(self, update_fields=None):
+        """(old_values, new_values) of the audited fields changed since loading."""
+        loaded = getattr(self, '_audit_loaded', None)
+        if loaded is None:
+            return {}, {}
+        audited = self.audited_fields()
+        old_values, new_values = {}, {}
+        for name, old in zip(*loaded):
+            if name not in audited or (update_fields is not None and name not in update_fields):
+                continue
+            new = getattr(self, name)
+            if new != old:
+                old_values[name] = jsonable(old)
+                new_values[name] = jsonable(new)
+        return old_values, new_values
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {self._meta.get_field(name).attname for name in update_fields}
+        old_values, new_values = self.audit_changes(update_fields)
+
+        super().save(*args, **kwargs)
+
+        if new_values:
+            transaction.on_commit(
+                partial(
+                    record_change,
+                    self._meta.model_name,
+                    self.pk,
+                    old_values,
+                    new_values,
+                    request_context()
+                ),
+                using=kwargs.get('using') or router.db_for_write(type(self), instance=self)
+            )
+        self._audit_saved(update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._audit_saved({self._meta.get_field(name).attname for name in fields} if fields else None)
+
+    def _audit_saved(self, update_fields):
+        # Later saves are compared with what was just written. Deferred
+        # fields are not in __dict__ and stay unloaded.
+        saved = {
+            field.attname: copy_json(self.__dict__[field.attname])
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and (update_fields is None or field.attname in update_fields)
+        }
+        loaded = getattr(self, '_audit_loaded', None)
+        if update_fields is not None and loaded is not None:
+            saved = {**dict(zip(*loaded)), **saved}
+        self._audit_loaded = (tuple(saved), tuple(saved.values()))
@@ -1,14 +1,19 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, Throttled, ValidationError
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 import secrets
 
-from .models import User, Role, PasswordResetToken, AuditLog
+from .models import User, Role, PasswordResetToken
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
     RoleSerializer, LoginSerializer, ChangePasswordSerializer,
@@ -16,6 +21,10 @@ from .serializers import (
     AuditLogSerializer
 )
 from .permissions import IsAdmin, IsOwnerOrAdmin
+from .throttling import LoginThrottle
+from .tokens import ClaimsRefreshToken
+from . import audit, audit_storage
+from notifications.outbox import enqueue
 
 User = get_user_model()
 
@@ -49,18 +58,30 @@ class LoginView(TokenObtainPairView):
     
     def post(self, request, *args, **kwargs):
         """Login user and return tokens."""
+        throttle = LoginThrottle(request, request.data)
+        wait = throttle.wait()
+        if wait is not None:
+            raise Throttled(wait=wait, detail='Too many failed login attempts.')
+        
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        if not serializer.is_valid():
+            throttle.failed()
+            raise ValidationError(serializer.errors)
         user = serializer.validated_data['user']
+        throttle.succeeded()
         
-        # Update last login
+        # Update last login: one UPDATE of just the login columns
         user.last_login = timezone.now()
-        user.last_login_ip = self.get_client_ip(request)
-        user.failed_login_attempts = 0
-        user.save()
+        user.last_login_ip = audit.get_client_ip(request)
+        update_fields = ['last_login', 'last_login_ip']
+        if user.failed_login_attempts or user.account_locked_until:
+            user.failed_login_attempts = 0
+            user.account_locked_until = None
+            update_fields += ['failed_login_attempts', 'account_locked_until']
+        user.save(update_fields=update_fields)
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
         
         # Log audit
         self.log_audit(request, user, 'login')
@@ -71,24 +92,9 @@ class LoginView(TokenObtainPairView):
             'user': UserSerializer(user).data
         })
     
-    def get_client_ip(self, request):
-        """Get client IP address from request."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-    
     def log_audit(self, request, user, action):
         """Log audit event."""
-        AuditLog.objects.create(
-            user=user,
-            action=action,
-            entity_type='auth',
-            ip_address=self.get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
+        audit.record_request(request, action, 'auth', user=user)
 
 
 class LogoutView(viewsets.GenericViewSet):
@@ -106,26 +112,11 @@ class LogoutView(viewsets.GenericViewSet):
                 token.blacklist()
             
             # Log audit
-            AuditLog.objects.create(
-                user=request.user,
-                action='logout',
-                entity_type='auth',
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
-            )
+            audit.record_request(request, 'logout', 'auth', user=request.user)
             
             return Response({'message': 'Successfully logged out.'})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-    
-    def get_client_ip(self, request):
-        """Get client IP address from request."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -166,10 +157,11 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer.save()
         
         # Log audit
-        AuditLog.objects.create(
+        audit.record_request(
+            request,
+            'update_profile',
+            'user',
             user=request.user,
-            action='update_profile',
-            entity_type='user',
             entity_id=request.user.id,
             new_values=serializer.data
         )
@@ -187,12 +179,7 @@ class UserViewSet(viewsets.ModelViewSet):
         user.save()
         
         # Log audit
-        AuditLog.objects.create(
-            user=user,
-            action='change_password',
-            entity_type='user',
-            entity_id=user.id
-        )
+        audit.record_request(request, 'change_password', 'user', user=user, entity_id=user.id)
         
         return Response({'message': 'Password changed successfully.'})
     
@@ -212,10 +199,11 @@ class UserViewSet(viewsets.ModelViewSet):
             user.save()
             
             # Log audit
-            AuditLog.objects.create(
+            audit.record_request(
+                request,
+                'update_role',
+                'user',
                 user=request.user,
-                action='update_role',
-                entity_type='user',
                 entity_id=user.id,
                 old_values={'role': str(old_role) if old_role else None},
                 new_values={'role': str(role)}
@@ -251,7 +239,19 @@ class PasswordResetViewSet(viewsets.GenericViewSet):
                 expires_at=expires_at
             )
             
-            # TODO: Send reset email with token
+            # Queued for the notification worker; the request never waits on SMTP
+            enqueue(
+                'email',
+                user.email,
+                'password_reset',
+                {
+                    'user': user,
+                    'reset_url': f'{settings.FRONTEND_URL}/reset-password?token={token}',
+                    'expires_hours': 24,
+                },
+                company=user.company,
+                user=user
+            )
             
             return Response({'message': 'Password reset email sent.'})
         except User.DoesNotExist:
@@ -281,12 +281,7 @@ class PasswordResetViewSet(viewsets.GenericViewSet):
             reset_token.save()
             
             # Log audit
-            AuditLog.objects.create(
-                user=user,
-                action='password_reset',
-                entity_type='user',
-                entity_id=user.id
-            )
+            audit.record_request(request, 'password_reset', 'user', user=user, entity_id=user.id)
             
             return Response({'message': 'Password reset successfully.'})
         except PasswordResetToken.DoesNotExist:
@@ -303,11 +298,64 @@ class RoleViewSet(viewsets.ModelViewSet):
 
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
-    """API endpoint for audit logs (read-only)."""
+    """
+    API endpoint for audit logs (read-only).
+    
+    Entries are stored in monthly buckets, so only the buckets in the
+    requested range are read: date_from and date_to (ISO date or datetime,
+    default the last 90 days). Also filters by user, action, entity_type
+    and entity_id, searches action, entity type and user email (search=),
+    and orders by created_at (ordering=created_at or -created_at).
+    """
     
-    queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdmin]
-    filterset_fields = ['user', 'action', 'entity_type']
-    search_fields = ['action', 'entity_type', 'user__email']
-    ordering_fields = ['created_at']
+    # Filters are applied to each bucket in get_queryset()
+    filter_backends = []
+    filter_fields = ['user', 'action', 'entity_type', 'entity_id']
+    
+    def parse_date_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValidationError({name: 'Expected an ISO date or datetime.'})
+            parsed = datetime.combine(day + timedelta(days=1) if name == 'date_to' else day, time.min)
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    
+    def get_queryset(self):
+        params = self.request.query_params
+        querysets = audit_storage.search(self.parse_date_param('date_from'), self.parse_date_param('date_to'))
+        
+        filters = {name: params[name] for name in self.filter_fields if params.get(name)}
+        search = params.get('search', '').strip()
+        try:
+            querysets = [queryset.select_related('user').filter(**filters) for queryset in querysets]
+            if search:
+                querysets = [
+                    queryset.filter(
+                        Q(action__icontains=search) |
+                        Q(entity_type__icontains=search) |
+                        Q(user__email__icontains=search)
+                    )
+                    for queryset in querysets
+                ]
+        except DjangoValidationError as e:
+            raise ValidationError({'error': e.messages})
+        
+        ordering = params.get('ordering', '-created_at')
+        if ordering not in ('created_at', '-created_at'):
+            ordering = '-created_at'
+        return audit_storage.combine(querysets, ordering)
+    
+    def get_object(self):
+        try:
+            entry = audit_storage.get_entry(self.kwargs['pk'])
+        except DjangoValidationError:
+            entry = None
+        if entry is None:
+            raise NotFound('Audit log entry not found.')
+        return entry
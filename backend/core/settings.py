@@ -67,6 +67,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.middleware.AuditContextMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -148,7 +149,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -171,7 +172,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(minutes=config('REFRESH_TOKEN_LIFETIME', default=1440, cast=int)),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # LoginView records last_login itself, in the same UPDATE as last_login_ip
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -180,6 +182,20 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Re-reads the role and tenant claims (accounts.tokens) on refresh
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.ClaimsTokenRefreshSerializer',
+}
+
+# Login Throttling
+# Failed logins are counted per IP, email and card number in the CACHES entry
+# named by CACHE (accounts.throttling); use a shared cache such as Redis so
+# all processes see the same counts
+LOGIN_THROTTLE = {
+    'CACHE': config('LOGIN_THROTTLE_CACHE', default='default'),
+    'WINDOW_SECONDS': config('LOGIN_THROTTLE_WINDOW_SECONDS', default=900, cast=int),
+    'MAX_IP_FAILURES': config('LOGIN_THROTTLE_MAX_IP_FAILURES', default=100, cast=int),
+    'MAX_ACCOUNT_FAILURES': config('LOGIN_THROTTLE_MAX_ACCOUNT_FAILURES', default=5, cast=int),
+    'LOCKOUT_SECONDS': config('LOGIN_THROTTLE_LOCKOUT_SECONDS', default=900, cast=int),
 }
 
 # CORS Configuration
@@ -201,6 +217,65 @@ EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='CleanPay <no-reply@cleanpay.rw>')
+
+# Frontend base URL, used for links in notifications
+FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5173')
+
+# Notification Channels
+# RATE is the provider's sustained limit in messages per second, BURST how many may go out at once.
+# Buckets are per worker process: split the limit if several workers serve one channel.
+NOTIFICATION_CHANNELS = {
+    'email': {
+        'BACKEND': config('NOTIFICATION_EMAIL_BACKEND', default='notifications.providers.EmailProvider'),
+        'RATE': config('NOTIFICATION_EMAIL_RATE', default=10, cast=float),
+        'BURST': config('NOTIFICATION_EMAIL_BURST', default=20, cast=int),
+        'BATCH_SIZE': 50,
+        'OPTIONS': {},
+    },
+    'sms': {
+        'BACKEND': config('NOTIFICATION_SMS_BACKEND', default='notifications.providers.ConsoleSmsProvider'),
+        'RATE': config('NOTIFICATION_SMS_RATE', default=20, cast=float),
+        'BURST': config('NOTIFICATION_SMS_BURST', default=50, cast=int),
+        'BATCH_SIZE': 100,
+        'OPTIONS': {},
+    },
+}
+
+# Mobile Money Gateways
+# Providers without a BACKEND refuse payments. The local simulator, which
+# approves most payments, stands in for them only in DEBUG or when
+# PAYMENT_GATEWAY_SIMULATOR is set.
+PAYMENT_GATEWAY_SIMULATOR = config('PAYMENT_GATEWAY_SIMULATOR', default=DEBUG, cast=bool)
+PAYMENT_GATEWAYS = {
+    'mtn': {
+        'BACKEND': config('MTN_MOMO_GATEWAY', default=''),
+        'CALLBACK_TOKEN': config('MTN_MOMO_CALLBACK_TOKEN', default=''),
+        'OPTIONS': {},
+    },
+    'airtel': {
+        'BACKEND': config('AIRTEL_MONEY_GATEWAY', default=''),
+        'CALLBACK_TOKEN': config('AIRTEL_MONEY_CALLBACK_TOKEN', default=''),
+        'OPTIONS': {},
+    },
+}
+
+# Customer Reminders
+# Customers with fewer prepaid collections than this get a low-balance warning
+LOW_BALANCE_THRESHOLD = config('LOW_BALANCE_THRESHOLD', default=3, cast=int)
+
+# Audit Log
+# Entries are buffered in each process and written in bulk by a background thread,
+# into one table per month (accounts.audit_storage)
+AUDIT_LOG = {
+    'ASYNC': config('AUDIT_LOG_ASYNC', default=True, cast=bool),
+    'FLUSH_SIZE': 100,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_BUFFER': 50000,
+    # Monthly buckets older than this are archived and dropped by archive_audit_logs
+    'RETENTION_MONTHS': config('AUDIT_LOG_RETENTION_MONTHS', default=12, cast=int),
+    'ARCHIVE_DIR': config('AUDIT_LOG_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'audit_logs')),
+}
 
 # Security Settings
 SESSION_COOKIE_SECURE = not DEBUG
@@ -31,8 +31,8 @@ urlpatterns = [
     path('api/v1/', include('accounts.urls')),
     path('api/v1/', include('customers.urls')),
     path('api/v1/operations/', include('operations.urls')),
-    # path('api/v1/payments/', include('payments.urls')),
-    # path('api/v1/invoices/', include('invoices.urls')),
+    path('api/v1/payments/', include('payments.urls')),
+    path('api/v1/invoices/', include('invoices.urls')),
     # path('api/v1/transactions/', include('transactions.urls')),
 ]
 
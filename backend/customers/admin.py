@@ -1,10 +1,10 @@
 """
 Customer Management Admin
-Admin interface configuration for Customer, PaymentMethod, and CustomerNote models.
+Admin interface configuration for Customer, PaymentMethod, CustomerNote and BalanceEntry models.
 """
 
 from django.contrib import admin
-from .models import Customer, PaymentMethod, CustomerNote
+from .models import Customer, PaymentMethod, CustomerNote, BalanceEntry
 
 
 class PaymentMethodInline(admin.TabularInline):
@@ -40,7 +40,7 @@ class CustomerAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'payment_terms', 'industry', 'created_at')
     search_fields = ('first_name', 'last_name', 'email', 'company_name', 'phone')
-    readonly_fields = ('id', 'created_at', 'updated_at', 'deleted_at', 'created_by')
+    readonly_fields = ('id', 'latitude', 'longitude', 'created_at', 'updated_at', 'deleted_at', 'created_by')
     
     fieldsets = (
         ('Basic Information', {
@@ -50,7 +50,7 @@ class CustomerAdmin(admin.ModelAdmin):
             'fields': ('tax_id', 'website', 'industry')
         }),
         ('Address Information', {
-            'fields': ('billing_address', 'shipping_address'),
+            'fields': ('billing_address', 'latitude', 'longitude'),
             'classes': ('collapse',)
         }),
         ('Payment Settings', {
@@ -158,3 +158,25 @@ class CustomerNoteAdmin(admin.ModelAdmin):
         preview = obj.note[:50] + '...' if len(obj.note) > 50 else obj.note
         return preview
     get_note_preview.short_description = 'Note'
+
+
+@admin.register(BalanceEntry)
+class BalanceEntryAdmin(admin.ModelAdmin):
+    """Admin interface for BalanceEntry model (append-only)."""
+    
+    list_display = ('customer', 'kind', 'amount', 'balance_after', 'reference', 'created_by', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('customer__first_name', 'customer__last_name', 'customer__card_number', 'reference')
+    raw_id_fields = ('customer', 'created_by')
+    readonly_fields = ('id', 'created_at')
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        # Entries must go through customers.balance so the cached balance follows
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,180 @@
+"""
+Prepaid Balance
+The only place that changes Customer.prepaid_balance.
+
+Every change writes an immutable BalanceEntry and updates the cached
+balance with an F() expression in the same transaction, so concurrent
+top-ups and collections never lose updates. Debits are conditional
+UPDATEs that refuse to take a balance below zero.
+"""
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import BalanceEntry, Customer
+
+
+class InsufficientBalance(Exception):
+    """The customer does not have enough prepaid collections."""
+
+
+class DuplicateBalanceEntry(Exception):
+    """An entry with the same kind and reference already exists."""
+
+
+def apply_entry(customer_id, amount, kind, reference='', note='', created_by=None):
+    """
+    Change a customer's balance by `amount` collections and record it.
+    
+    Raises Customer.DoesNotExist, InsufficientBalance for debits larger
+    than the balance, and DuplicateBalanceEntry if `reference` was already
+    used for this kind (nothing is changed in either case).
+    """
+    if amount == 0:
+        raise ValueError('amount must not be zero')
+    
+    try:
+        with transaction.atomic():
+            customers = Customer.objects.filter(id=customer_id)
+            if amount < 0:
+                customers = customers.filter(prepaid_balance__gte=-amount)
+            if not customers.update(prepaid_balance=F('prepaid_balance') + amount):
+                if not Customer.objects.filter(id=customer_id).exists():
+                    raise Customer.DoesNotExist(f'Customer {customer_id} not found')
+                raise InsufficientBalance(f'Customer {customer_id} has fewer than {-amount} collections')
+            
+            # The row is locked by the UPDATE, so this read is our own result
+            balance = Customer.objects.filter(id=customer_id).values_list('prepaid_balance', flat=True).get()
+            return BalanceEntry.objects.create(
+                customer_id=customer_id,
+                amount=amount,
+                balance_after=balance,
+                kind=kind,
+                reference=reference,
+                note=note,
+                created_by=created_by,
+            )
+    except IntegrityError:
+        if reference and BalanceEntry.objects.filter(kind=kind, reference=reference).exists():
+            raise DuplicateBalanceEntry(f'{kind} entry {reference} already recorded')
+        raise
+
+
+def credit(customer_id, amount, kind='top_up', **kwargs):
+    """Add collections to a customer's balance."""
+    if amount <= 0:
+        raise ValueError('credit amount must be positive')
+    return apply_entry(customer_id, amount, kind, **kwargs)
+
+
+def debit(customer_id, amount, kind='collection', **kwargs):
+    """Take collections from a customer's balance, never below zero."""
+    if amount <= 0:
+        raise ValueError('debit amount must be positive')
+    return apply_entry(customer_id, -amount, kind, **kwargs)
+
+
+def debit_collections(debits):
+    """
+    Debit one collection per (customer_id, reference) pair in one batch.
+    
+    Customers are locked in ID order, each is charged for as many of its
+    collections as its balance covers, and one UPDATE is issued per
+    distinct amount. Must run inside a transaction. Returns the
+    (customer_id, reference) pairs that could not be paid.
+    """
+    by_customer = defaultdict(list)
+    for customer_id, reference in debits:
+        by_customer[customer_id].append(reference)
+    if not by_customer:
+        return []
+    
+    balances = dict(
+        Customer.objects.select_for_update().filter(
+            id__in=list(by_customer)
+        ).order_by('id').values_list('id', 'prepaid_balance')
+    )
+    
+    entries = []
+    unpaid = []
+    by_amount = defaultdict(list)
+    for customer_id, references in by_customer.items():
+        balance = balances.get(customer_id, 0)
+        paid = references[:max(balance, 0)]
+        unpaid.extend((customer_id, reference) for reference in references[len(paid):])
+        if not paid:
+            continue
+        by_amount[len(paid)].append(customer_id)
+        for reference in paid:
+            balance -= 1
+            entries.append(BalanceEntry(
+                customer_id=customer_id,
+                amount=-1,
+                balance_after=balance,
+                kind='collection',
+                reference=reference,
+            ))
+    
+    for amount, customer_ids in by_amount.items():
+        Customer.objects.filter(id__in=customer_ids, prepaid_balance__gte=amount).update(
+            prepaid_balance=F('prepaid_balance') - amount
+        )
+    BalanceEntry.objects.bulk_create(entries, batch_size=1000)
+    return unpaid
+
+
+def credit_many(credits, kind='top_up'):
+    """
+    Record many credits of (customer_id, amount, reference, note) in one batch.
+    
+    References already recorded for `kind` are skipped, so replaying a
+    batch is harmless. Each customer is locked once, in ID order, and one
+    UPDATE is issued per distinct total. Must run inside a transaction.
+    Returns the created entries.
+    """
+    credits = list(credits)
+    if not credits:
+        return []
+    
+    existing = set(BalanceEntry.objects.filter(
+        kind=kind,
+        reference__in=[reference for _, _, reference, _ in credits if reference]
+    ).values_list('reference', flat=True))
+    
+    by_customer = defaultdict(list)
+    for customer_id, amount, reference, note in credits:
+        if amount <= 0:
+            raise ValueError('credit amount must be positive')
+        if reference and reference in existing:
+            continue
+        existing.add(reference)
+        by_customer[customer_id].append((amount, reference, note))
+    if not by_customer:
+        return []
+    
+    balances = Customer.objects.select_for_update().filter(
+        id__in=list(by_customer)
+    ).order_by('id').values_list('id', 'prepaid_balance')
+    
+    entries = []
+    by_total = defaultdict(list)
+    for customer_id, balance in balances:
+        total = 0
+        for amount, reference, note in by_customer[customer_id]:
+            balance += amount
+            total += amount
+            entries.append(BalanceEntry(
+                customer_id=customer_id,
+                amount=amount,
+                balance_after=balance,
+                kind=kind,
+                reference=reference,
+                note=note,
+            ))
+        by_total[total].append(customer_id)
+    
+    for total, customer_ids in by_total.items():
+        Customer.objects.filter(id__in=customer_ids).update(prepaid_balance=F('prepaid_balance') + total)
+    return BalanceEntry.objects.bulk_create(entries, batch_size=1000)
@@ -0,0 +1,91 @@
+"""
+Management command to reconcile cached prepaid balances with the ledger.
+
+Customer.prepaid_balance is a cache of the sum of the customer's
+BalanceEntry amounts. This walks customers in ID order, one batch at a
+time, and reports any whose cached balance has drifted from the ledger:
+
+    python manage.py reconcile_balances --company <company-id> [--fix]
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from customers.models import BalanceEntry, Customer
+
+
+class Command(BaseCommand):
+    help = 'Compare cached prepaid balances with the balance ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            help='Only reconcile customers of this company (default: all companies)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Customers checked per query (default: 1000)',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Reset drifted balances to the ledger total',
+        )
+
+    def handle(self, *args, **options):
+        customers = Customer.objects.all()
+        if options['company']:
+            customers = customers.filter(company_id=options['company'])
+
+        checked = 0
+        mismatches = []
+        last_id = None
+        while True:
+            # Keyset pagination keeps every batch an index range scan
+            batch = customers.order_by('id')
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            rows = list(batch.values_list('id', 'prepaid_balance')[:options['batch_size']])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            checked += len(rows)
+
+            ledger = dict(
+                BalanceEntry.objects.filter(
+                    customer_id__in=[row[0] for row in rows]
+                ).order_by().values('customer_id').annotate(
+                    total=Sum('amount')
+                ).values_list('customer_id', 'total')
+            )
+            for customer_id, cached in rows:
+                expected = ledger.get(customer_id) or 0
+                if cached != expected:
+                    mismatches.append((customer_id, cached, expected))
+
+        for customer_id, cached, expected in mismatches:
+            self.stdout.write(f'  {customer_id}: cached {cached}, ledger {expected}')
+
+        if options['fix'] and mismatches:
+            fixed = 0
+            for customer_id, _, _ in mismatches:
+                with transaction.atomic():
+                    # Recompute under the row lock, as entries may have been added since
+                    Customer.objects.select_for_update().filter(id=customer_id).values_list('id', flat=True).first()
+                    total = BalanceEntry.objects.filter(customer_id=customer_id).aggregate(
+                        total=Sum('amount')
+                    )['total'] or 0
+                    fixed += Customer.objects.filter(id=customer_id).update(prepaid_balance=total)
+            self.stdout.write(self.style.SUCCESS(f'✓ Checked {checked} customers, fixed {fixed} balances'))
+            return
+
+        if mismatches:
+            self.stdout.write(self.style.WARNING(
+                f'{len(mismatches)} of {checked} customers differ from the ledger (run with --fix to reset)'
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Checked {checked} customers, all balances match the ledger'))
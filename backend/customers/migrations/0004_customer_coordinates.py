@@ -0,0 +1,51 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_coordinates(apps, schema_editor):
+    """Fill latitude/longitude from existing billing addresses."""
+    Customer = apps.get_model('customers', 'Customer')
+    batch = []
+    for customer in Customer.objects.only('id', 'billing_address').iterator(chunk_size=2000):
+        address = customer.billing_address or {}
+        try:
+            customer.latitude = float(address.get('latitude'))
+            customer.longitude = float(address.get('longitude'))
+        except (TypeError, ValueError):
+            continue
+        batch.append(customer)
+        if len(batch) >= 2000:
+            Customer.objects.bulk_update(batch, ['latitude', 'longitude'])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, ['latitude', 'longitude'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_company_name_alter_role_name_company_and_more'),
+        ('customers', '0003_customer_company'),
+        ('operations', '0005_route_stop_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['company', 'latitude', 'longitude'], name='customers_c_company_73512c_idx'),
+        ),
+        migrations.RunPython(copy_coordinates, migrations.RunPython.noop),
+    ]
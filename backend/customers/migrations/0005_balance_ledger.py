@@ -0,0 +1,60 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:11
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """Record existing balances as opening entries so the ledger matches."""
+    Customer = apps.get_model('customers', 'Customer')
+    BalanceEntry = apps.get_model('customers', 'BalanceEntry')
+    batch = []
+    for customer_id, balance in Customer.objects.exclude(prepaid_balance=0).values_list('id', 'prepaid_balance').iterator(chunk_size=2000):
+        batch.append(BalanceEntry(
+            customer_id=customer_id,
+            amount=balance,
+            balance_after=balance,
+            kind='opening',
+        ))
+        if len(batch) >= 2000:
+            BalanceEntry.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        BalanceEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_customer_coordinates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.IntegerField(help_text='Change in collections; negative for debits')),
+                ('balance_after', models.IntegerField(help_text='Customer balance after this entry')),
+                ('kind', models.CharField(choices=[('opening', 'Opening Balance'), ('top_up', 'Top-up'), ('collection', 'Collection'), ('adjustment', 'Adjustment'), ('refund', 'Refund')], max_length=20)),
+                ('reference', models.CharField(blank=True, help_text='External reference (payment, collection event) - unique per kind', max_length=100)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balance_entries_created', to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='balance_entries', to='customers.customer')),
+            ],
+            options={
+                'verbose_name_plural': 'Balance entries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['customer', 'created_at'], name='customers_b_custome_33797d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='balanceentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('reference', ''), _negated=True), fields=('kind', 'reference'), name='unique_balance_entry_reference'),
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
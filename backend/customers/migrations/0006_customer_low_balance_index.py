@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_company_name_alter_role_name_company_and_more'),
+        ('customers', '0005_balance_ledger'),
+        ('operations', '0007_collection_event_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['status', 'prepaid_balance'], name='customers_c_status_46e005_idx'),
+        ),
+    ]
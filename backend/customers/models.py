@@ -9,10 +9,12 @@ from django.contrib.auth import get_user_model
 from django.core.validators import EmailValidator, RegexValidator
 from django.utils import timezone
 
+from accounts.tracking import TrackChangesMixin
+
 User = get_user_model()
 
 
-class Customer(models.Model):
+class Customer(TrackChangesMixin, models.Model):
     """
     Customer model - represents a customer in the system.
     Can be linked to a User account or exist as a standalone customer.
@@ -88,6 +90,10 @@ class Customer(models.Model):
         help_text="JSON format: {district, sector, cell, village, street}"
     )
     
+    # Copied from billing_address on save so map queries can use an index
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    
     # Service Provider Information
     service_provider = models.CharField(
         max_length=255,
@@ -161,6 +167,9 @@ class Customer(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['company_name']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['company', 'latitude', 'longitude']),
+            # Low-balance warnings
+            models.Index(fields=['status', 'prepaid_balance']),
         ]
     
     def __str__(self):
@@ -210,10 +219,40 @@ class Customer(models.Model):
             if not Customer.objects.filter(card_number=card_num).exists():
                 return card_num
     
+    def sync_coordinates(self):
+        """Copy latitude/longitude from the billing address, if valid."""
+        address = self.billing_address or {}
+        try:
+            self.latitude = float(address.get('latitude'))
+            self.longitude = float(address.get('longitude'))
+        except (TypeError, ValueError):
+            self.latitude = self.longitude = None
+    
     def save(self, *args, **kwargs):
-        """Override save to auto-generate card number if not set."""
+        """
+        Override save to auto-generate card number if not set.
+        
+        Saves of existing rows never write prepaid_balance: it is changed
+        only by customers.balance, and the value loaded with the instance
+        may be stale.
+        """
         if not self.card_number:
             self.card_number = self.generate_card_number()
+        self.sync_coordinates()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'billing_address' in update_fields:
+            update_fields = set(update_fields) | {'latitude', 'longitude'}
+        if not self._state.adding and not kwargs.get('force_insert'):
+            if update_fields is None:
+                # As Django does for a plain save: the loaded fields
+                deferred = self.get_deferred_fields()
+                update_fields = {
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                }
+            update_fields = set(update_fields) - {'prepaid_balance'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
     
     def soft_delete(self):
@@ -379,3 +418,69 @@ class CustomerNote(models.Model):
     def __str__(self):
         preview = self.note[:50] + '...' if len(self.note) > 50 else self.note
         return f"Note by {self.created_by} on {self.created_at.date()}: {preview}"
+
+
+class BalanceEntry(models.Model):
+    """
+    Balance Entry - immutable ledger line for a customer's prepaid balance.
+    
+    Credits are positive and debits negative, in collections. The running
+    total is cached on Customer.prepaid_balance, which is only changed
+    through customers.balance together with a new entry.
+    """
+    
+    KIND_CHOICES = [
+        ('opening', 'Opening Balance'),
+        ('top_up', 'Top-up'),
+        ('collection', 'Collection'),
+        ('adjustment', 'Adjustment'),
+        ('refund', 'Refund'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.PROTECT,
+        related_name='balance_entries',
+        db_index=False
+    )
+    amount = models.IntegerField(help_text="Change in collections; negative for debits")
+    balance_after = models.IntegerField(help_text="Customer balance after this entry")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    reference = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="External reference (payment, collection event) - unique per kind"
+    )
+    note = models.CharField(max_length=255, blank=True)
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='balance_entries_created'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'reference'],
+                condition=~models.Q(reference=''),
+                name='unique_balance_entry_reference'
+            ),
+        ]
+        verbose_name_plural = 'Balance entries'
+    
+    def __str__(self):
+        return f"{self.customer_id}: {self.amount:+d} ({self.kind})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Balance entries are immutable.')
+        super().save(*args, **kwargs)
@@ -5,15 +5,28 @@ API endpoints for customers to access their own data (invoices, payments, schedu
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from django.http import FileResponse
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
 
+from accounts.tokens import user_claim
+from invoices.documents import get_document, receipt_context, statement_context
+from invoices.serializers import InvoiceSerializer
+from payments.processing import OPEN_STATUSES, create_top_up, resolve_provider
+from payments.serializers import PaymentTransactionSerializer, TopUpRequestSerializer
 from .models import Customer, PaymentMethod
-from .serializers import CustomerDetailSerializer, PaymentMethodSerializer
+from .serializers import (
+    CustomerDetailSerializer, PaymentMethodSerializer, BalanceEntrySerializer, validate_billing_address
+)
+
+
+# Most recent ledger entries shown in the portal payment history
+PORTAL_HISTORY_LIMIT = 100
 
 
 class CustomerPortalPermission(IsAuthenticated):
@@ -25,6 +38,9 @@ class CustomerPortalPermission(IsAuthenticated):
 
 def get_customer_profile(user):
     """Get customer profile for a user, returns None if not linked."""
+    # The token claim only hints at a profile; loading it below checks it
+    if not user_claim(user, 'customer_id'):
+        return None
     if hasattr(user, 'customer_profile') and user.customer_profile is not None:
         return user.customer_profile
     return None
@@ -143,9 +159,15 @@ class CustomerPortalProfileView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Only allow updating certain fields
-        allowed_fields = ['phone', 'billing_address', 'shipping_address', 'preferred_payment_method']
+        allowed_fields = ['phone', 'billing_address', 'preferred_payment_method']
         update_data = {k: v for k, v in request.data.items() if k in allowed_fields}
         
+        if 'billing_address' in update_data:
+            try:
+                update_data['billing_address'] = validate_billing_address(update_data['billing_address'])
+            except ValidationError as e:
+                return Response({'error': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        
         for field, value in update_data.items():
             setattr(customer, field, value)
         customer.save()
@@ -212,7 +234,7 @@ class CustomerPortalSchedulesView(APIView):
         date_filter = request.query_params.get('date')  # 'upcoming', 'past', 'today'
         
         try:
-            from operations.models import Schedule
+            from operations.models import CollectionEvent, Schedule
             schedules = Schedule.objects.filter(
                 route__customers=customer
             ).select_related('route', 'collector')
@@ -227,7 +249,16 @@ class CustomerPortalSchedulesView(APIView):
             elif date_filter == 'today':
                 schedules = schedules.filter(scheduled_date=now.date())
             
-            schedules = schedules.order_by('-scheduled_date', '-scheduled_time_start')
+            schedules = list(schedules.order_by('-scheduled_date', '-scheduled_time_start')[:50])  # Limit to 50 for performance
+            
+            # This customer's own outcome on each schedule, from the collection ledger
+            outcomes = {
+                schedule_id: (outcome, occurred_at)
+                for schedule_id, outcome, occurred_at in CollectionEvent.objects.filter(
+                    customer=customer,
+                    schedule_id__in=[s.id for s in schedules]
+                ).values_list('schedule_id', 'outcome', 'occurred_at')
+            }
             
             schedule_data = [{
                 'id': str(s.id),
@@ -241,7 +272,9 @@ class CustomerPortalSchedulesView(APIView):
                 'service_area_name': s.route.service_area.name if s.route and s.route.service_area else None,
                 'collector_name': s.collector.full_name if s.collector else None,
                 'notes': s.notes,
-            } for s in schedules[:50]]  # Limit to 50 for performance
+                'collection_outcome': outcomes.get(s.id, (None, None))[0],
+                'collected_at': outcomes.get(s.id, (None, None))[1],
+            } for s in schedules]
             
             return Response({
                 'count': len(schedule_data),
@@ -266,24 +299,30 @@ class CustomerPortalTopUpView(APIView):
                 'error': 'Customer profile not found.'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        collections = request.data.get('collections')
-        payment_method = request.data.get('payment_method', 'momo')
-        
-        if not collections or int(collections) <= 0:
+        serializer = TopUpRequestSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                'error': 'Invalid number of collections.'
+                'error': 'Invalid top-up request.',
+                'details': serializer.errors,
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # TODO: Implement actual payment processing
-        # For now, just return a success message
-        # In production, this would integrate with payment gateway
+        # Only queue the payment here; the payment worker talks to the provider
+        try:
+            payment = create_top_up(
+                customer,
+                serializer.validated_data['collections'],
+                resolve_provider(serializer.validated_data['payment_method']),
+                msisdn=serializer.validated_data.get('phone', ''),
+                requested_by=request.user
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'message': 'Top-up request received. Payment processing will be implemented.',
-            'collections': collections,
-            'payment_method': payment_method,
-            'status': 'pending',
-        }, status=status.HTTP_200_OK)
+            'message': 'Top-up requested. Approve the payment on your phone.',
+            'transaction': PaymentTransactionSerializer(payment).data,
+            'status': payment.status,
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class CustomerPortalPaymentsView(APIView):
@@ -300,11 +339,75 @@ class CustomerPortalPaymentsView(APIView):
                 'message': 'Customer profile not yet created.',
             })
         
-        # TODO: Implement when payments/transactions app is ready
-        # This should return history of top-ups and collection payments
+        # Top-ups and collection debits both come from the balance ledger
+        entries = customer.balance_entries.order_by('-created_at')
+        kind = request.query_params.get('kind')
+        if kind:
+            entries = entries.filter(kind=kind)
+        
+        pending = customer.payment_transactions.filter(status__in=OPEN_STATUSES).order_by('-created_at')
+        
+        return Response({
+            'count': entries.count(),
+            'prepaid_balance': customer.prepaid_balance,
+            'pending_top_ups': PaymentTransactionSerializer(pending, many=True).data,
+            'results': BalanceEntrySerializer(entries[:PORTAL_HISTORY_LIMIT], many=True).data,
+        })
+
+
+class CustomerPortalInvoicesView(APIView):
+    """Get the customer's monthly statements, newest first."""
+    
+    permission_classes = [CustomerPortalPermission]
+    
+    def get(self, request):
+        customer = get_customer_profile(request.user)
+        if not customer:
+            return Response({
+                'count': 0,
+                'results': [],
+                'message': 'Customer profile not yet created.',
+            })
+        
+        invoices = customer.invoices.exclude(status='void').order_by('-period_start')
         return Response({
-            'count': 0,
-            'results': [],
-            'message': 'Payment history feature coming soon.'
+            'count': invoices.count(),
+            'results': InvoiceSerializer(invoices[:PORTAL_HISTORY_LIMIT], many=True).data,
         })
 
+
+class CustomerPortalStatementView(APIView):
+    """Download one of the customer's monthly statements as a PDF."""
+    
+    permission_classes = [CustomerPortalPermission]
+    
+    def get(self, request, invoice_id):
+        customer = get_customer_profile(request.user)
+        invoice = customer and customer.invoices.select_related('company', 'customer').filter(id=invoice_id).first()
+        if not invoice:
+            return Response({
+                'error': 'Statement not found.'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        path = get_document('statement', statement_context(invoice))
+        return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'{invoice.number}.pdf')
+
+
+class CustomerPortalReceiptView(APIView):
+    """Download the receipt for one of the customer's successful top-ups as a PDF."""
+    
+    permission_classes = [CustomerPortalPermission]
+    
+    def get(self, request, payment_id):
+        customer = get_customer_profile(request.user)
+        payment = customer and customer.payment_transactions.select_related('company', 'customer').filter(
+            id=payment_id,
+            status='successful'
+        ).first()
+        if not payment:
+            return Response({
+                'error': 'Receipt not found.'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        path = get_document('receipt', receipt_context(payment))
+        return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'receipt-{payment.id}.pdf')
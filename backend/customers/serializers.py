@@ -4,12 +4,46 @@ Handles serialization for Customer, PaymentMethod, and CustomerNote models.
 """
 
 from rest_framework import serializers
-from .models import Customer, PaymentMethod, CustomerNote
+from .models import Customer, PaymentMethod, CustomerNote, BalanceEntry
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+BILLING_ADDRESS_FIELDS = ['district', 'sector', 'cell', 'village', 'street', 'latitude', 'longitude']
+
+
+def validate_billing_address(value):
+    """
+    Validate billing address format for Rwanda: district, sector, cell,
+    village, street, plus the GPS position of the pickup point (copied to
+    Customer.latitude/longitude on save). All fields are optional.
+    """
+    if not value:
+        return value
+    if not isinstance(value, dict):
+        raise serializers.ValidationError("billing_address must be an object.")
+    for field in value.keys():
+        if field not in BILLING_ADDRESS_FIELDS:
+            raise serializers.ValidationError(
+                f"Invalid address field: {field}. Allowed fields are: {', '.join(BILLING_ADDRESS_FIELDS)}"
+            )
+    
+    if ('latitude' in value) != ('longitude' in value):
+        raise serializers.ValidationError("latitude and longitude must be given together.")
+    if 'latitude' in value:
+        try:
+            latitude, longitude = float(value['latitude']), float(value['longitude'])
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("latitude and longitude must be numbers.")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise serializers.ValidationError(
+                "latitude must be between -90 and 90 and longitude between -180 and 180."
+            )
+        value = {**value, 'latitude': latitude, 'longitude': longitude}
+    return value
+
+
 class CustomerNoteSerializer(serializers.ModelSerializer):
     """Serializer for CustomerNote model."""
     
@@ -188,7 +222,7 @@ class CustomerDetailSerializer(serializers.ModelSerializer):
             'customer_notes',
             'is_active_flag'
         ]
-        read_only_fields = ['id', 'card_number', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'card_number', 'prepaid_balance', 'created_by', 'created_at', 'updated_at']
     
     def get_full_name(self, obj):
         """Get customer's full name."""
@@ -233,7 +267,6 @@ class CustomerCreateUpdateSerializer(serializers.ModelSerializer):
             'website',
             'industry',
             'billing_address',
-            'shipping_address',
             'payment_terms',
             'credit_limit',
             'preferred_payment_method',
@@ -262,17 +295,7 @@ class CustomerCreateUpdateSerializer(serializers.ModelSerializer):
         return data
     
     def validate_billing_address(self, value):
-        """Validate billing address format for Rwanda."""
-        if value:
-            # Rwanda address structure: district, sector, cell, village, street
-            # All fields are optional
-            allowed_fields = ['district', 'sector', 'cell', 'village', 'street']
-            for field in value.keys():
-                if field not in allowed_fields:
-                    raise serializers.ValidationError(
-                        f"Invalid address field: {field}. Allowed fields are: {', '.join(allowed_fields)}"
-                    )
-        return value
+        return validate_billing_address(value)
     
     def validate_credit_limit(self, value):
         """Validate credit limit is non-negative."""
@@ -324,6 +347,45 @@ class CustomerCreateUpdateSerializer(serializers.ModelSerializer):
         return customer
 
 
+class BalanceEntrySerializer(serializers.ModelSerializer):
+    """Serializer for prepaid balance ledger entries (read-only)."""
+    
+    created_by_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = BalanceEntry
+        fields = [
+            'id',
+            'customer',
+            'amount',
+            'balance_after',
+            'kind',
+            'reference',
+            'note',
+            'created_by',
+            'created_by_name',
+            'created_at'
+        ]
+        read_only_fields = fields
+    
+    def get_created_by_name(self, obj):
+        """Get name of user who created the entry."""
+        return obj.created_by.get_full_name() if obj.created_by else None
+
+
+class BalanceAdjustmentSerializer(serializers.Serializer):
+    """Validate a manual balance adjustment."""
+    
+    amount = serializers.IntegerField()
+    note = serializers.CharField(max_length=255)
+    
+    def validate_amount(self, value):
+        """Ensure the adjustment changes the balance."""
+        if value == 0:
+            raise serializers.ValidationError("Amount must not be zero.")
+        return value
+
+
 class CustomerStatsSerializer(serializers.Serializer):
     """Serializer for customer statistics."""
     
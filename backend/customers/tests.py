@@ -1,3 +1,154 @@
+from django.db import transaction
+from django.db.models import Sum
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import User
+from accounts.tokens import ClaimsRefreshToken
+from .balance import DuplicateBalanceEntry, InsufficientBalance, credit, credit_many, debit, debit_collections
+from .models import Customer
+
+
+class CustomerCoordinatesTests(TestCase):
+    """Coordinates given in billing_address reach Customer.latitude/longitude."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff@example.com', 'pw12345!', first_name='Staff', last_name='User')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.customer = Customer.objects.create(first_name='Aline', last_name='M', email='aline@example.com')
+
+    def patch(self, billing_address):
+        return self.client.patch(
+            f'/api/v1/customers/{self.customer.id}/', {'billing_address': billing_address}, format='json'
+        )
+
+    def test_coordinates_are_copied_from_billing_address(self):
+        response = self.patch({'district': 'Gasabo', 'latitude': '-1.9441', 'longitude': 30.0619})
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.customer.refresh_from_db()
+        self.assertAlmostEqual(self.customer.latitude, -1.9441)
+        self.assertAlmostEqual(self.customer.longitude, 30.0619)
+
+    def test_out_of_range_coordinates_are_rejected(self):
+        response = self.patch({'latitude': 91, 'longitude': 30})
+
+        self.assertEqual(response.status_code, 400)
+        self.customer.refresh_from_db()
+        self.assertIsNone(self.customer.latitude)
+
+    def test_latitude_without_longitude_is_rejected(self):
+        self.assertEqual(self.patch({'latitude': -1.9}).status_code, 400)
+
+    def test_portal_profile_validates_coordinates(self):
+        customer_user = User.objects.create_user('aline@example.com', 'pw12345!', first_name='Aline', last_name='M')
+        self.customer.user = customer_user
+        self.customer.save()
+        self.client.force_authenticate(customer_user)
+
+        bad = self.client.patch('/api/v1/portal/profile/', {'billing_address': {'latitude': 'x', 'longitude': 1}}, format='json')
+        good = self.client.patch('/api/v1/portal/profile/', {'billing_address': {'latitude': -1.95, 'longitude': 30.06}}, format='json')
+
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(good.status_code, 200)
+        self.customer.refresh_from_db()
+        self.assertAlmostEqual(self.customer.latitude, -1.95)
+
+    def test_billing_address_must_be_an_object(self):
+        self.assertEqual(self.patch('Kigali').status_code, 400)
+        self.assertEqual(self.patch(['Gasabo']).status_code, 400)
+
+    def test_portal_billing_address_must_be_an_object(self):
+        customer_user = User.objects.create_user('aline@example.com', 'pw12345!', first_name='Aline', last_name='M')
+        self.customer.user = customer_user
+        self.customer.save()
+        self.client.force_authenticate(customer_user)
+
+        response = self.client.patch('/api/v1/portal/profile/', {'billing_address': 'Kigali'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class PortalProfileClaimTests(TestCase):
+    """The customer_id token claim is only a hint; the profile is what counts."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('aline@example.com', 'pw12345!', first_name='Aline', last_name='M')
+        self.client = APIClient()
+        # Issued before the user has a customer profile
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_profile_linked_after_login_is_found(self):
+        customer = Customer.objects.create(first_name='Aline', last_name='M', email='aline@example.com', user=self.user)
+
+        response = self.client.get('/api/v1/portal/profile/')
+
+        self.assertEqual(response.data['id'], str(customer.id))
+
+    def test_user_without_profile_gets_placeholder(self):
+        response = self.client.get('/api/v1/portal/profile/')
+
+        self.assertIsNone(response.data['id'])
+
+
+class BalanceLedgerTests(TestCase):
+    """Customer.prepaid_balance always equals the sum of the customer's entries."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(first_name='Aline', last_name='M', email='aline@example.com')
+
+    def assertLedgerBalanced(self, expected):
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.prepaid_balance, expected)
+        self.assertEqual(self.customer.balance_entries.aggregate(total=Sum('amount'))['total'] or 0, expected)
+
+    def test_credits_and_debits_are_recorded_with_running_balance(self):
+        credit(self.customer.id, 5, reference='pay-1')
+        debit(self.customer.id, 2, reference='event-1')
+
+        self.assertLedgerBalanced(3)
+        self.assertEqual(
+            list(self.customer.balance_entries.order_by('created_at').values_list('amount', 'balance_after')),
+            [(5, 5), (-2, 3)]
+        )
+
+    def test_debit_beyond_the_balance_changes_nothing(self):
+        credit(self.customer.id, 1, reference='pay-1')
+
+        with self.assertRaises(InsufficientBalance):
+            debit(self.customer.id, 2, reference='event-1')
+
+        self.assertLedgerBalanced(1)
+        self.assertEqual(self.customer.balance_entries.count(), 1)
+
+    def test_reference_is_credited_once(self):
+        credit(self.customer.id, 4, reference='pay-1')
+
+        with self.assertRaises(DuplicateBalanceEntry):
+            credit(self.customer.id, 4, reference='pay-1')
+        with transaction.atomic():
+            created = credit_many([(self.customer.id, 4, 'pay-1', ''), (self.customer.id, 2, 'pay-2', '')])
+
+        self.assertEqual(len(created), 1)
+        self.assertLedgerBalanced(6)
+
+    def test_batch_debits_stop_at_zero(self):
+        credit(self.customer.id, 2, reference='pay-1')
+
+        with transaction.atomic():
+            unpaid = debit_collections([(self.customer.id, f'event-{n}') for n in range(3)])
+
+        self.assertEqual(unpaid, [(self.customer.id, 'event-2')])
+        self.assertLedgerBalanced(0)
+
+    def test_saving_a_stale_instance_keeps_the_ledger_balance(self):
+        stale = Customer.objects.get(pk=self.customer.pk)
+        credit(self.customer.id, 10, reference='pay-1')
+
+        stale.phone = '0788000002'
+        stale.save()
+
+        self.assertLedgerBalanced(10)
+        self.assertEqual(self.customer.phone, '0788000002')
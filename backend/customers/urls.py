@@ -13,6 +13,9 @@ from .portal_views import (
     CustomerPortalSchedulesView,
     CustomerPortalTopUpView,
     CustomerPortalPaymentsView,
+    CustomerPortalInvoicesView,
+    CustomerPortalStatementView,
+    CustomerPortalReceiptView,
 )
 
 # Create router and register viewsets
@@ -33,4 +36,7 @@ urlpatterns = [
     path('portal/schedules/', CustomerPortalSchedulesView.as_view(), name='portal-schedules'),
     path('portal/topup/', CustomerPortalTopUpView.as_view(), name='portal-topup'),
     path('portal/payments/', CustomerPortalPaymentsView.as_view(), name='portal-payments'),
+    path('portal/payments/<uuid:payment_id>/receipt/', CustomerPortalReceiptView.as_view(), name='portal-receipt'),
+    path('portal/invoices/', CustomerPortalInvoicesView.as_view(), name='portal-invoices'),
+    path('portal/invoices/<uuid:invoice_id>/statement/', CustomerPortalStatementView.as_view(), name='portal-statement'),
 ]
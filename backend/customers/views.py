@@ -12,6 +12,7 @@ from django.utils import timezone
 from datetime import timedelta
 from django_filters.rest_framework import DjangoFilterBackend
 
+from .balance import InsufficientBalance, apply_entry
 from .models import Customer, PaymentMethod, CustomerNote
 from .serializers import (
     CustomerListSerializer,
@@ -19,7 +20,9 @@ from .serializers import (
     CustomerCreateUpdateSerializer,
     CustomerStatsSerializer,
     PaymentMethodSerializer,
-    CustomerNoteSerializer
+    CustomerNoteSerializer,
+    BalanceEntrySerializer,
+    BalanceAdjustmentSerializer
 )
 
 
@@ -207,6 +210,40 @@ class CustomerViewSet(viewsets.ModelViewSet):
         notes = customer.customer_notes.all()
         serializer = CustomerNoteSerializer(notes, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def balance_history(self, request, pk=None):
+        """Get the prepaid balance ledger for a customer, newest first."""
+        customer = self.get_object()
+        entries = customer.balance_entries.select_related('created_by').order_by('-created_at')
+        
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            serializer = BalanceEntrySerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = BalanceEntrySerializer(entries, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['post'])
+    def adjust_balance(self, request, pk=None):
+        """Manually credit (positive) or debit (negative) a customer's prepaid balance."""
+        customer = self.get_object()
+        serializer = BalanceAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            entry = apply_entry(
+                customer.id,
+                serializer.validated_data['amount'],
+                kind='adjustment',
+                note=serializer.validated_data['note'],
+                created_by=request.user
+            )
+        except InsufficientBalance as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(BalanceEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
 
 
 class PaymentMethodViewSet(viewsets.ModelViewSet):
@@ -1,3 +1,24 @@
+"""
+Invoices Admin Configuration
+"""
+
 from django.contrib import admin
+from .models import Invoice, InvoiceRun
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(admin.ModelAdmin):
+    list_display = ['number', 'customer', 'period_start', 'collections_made', 'closing_balance',
+                    'amount_due', 'due_date', 'status']
+    list_filter = ['status', 'period_start', 'exceeds_credit_limit']
+    search_fields = ['number', 'customer__first_name', 'customer__last_name', 'customer__card_number']
+    raw_id_fields = ['company', 'customer']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+
 
-# Register your models here.
+@admin.register(InvoiceRun)
+class InvoiceRunAdmin(admin.ModelAdmin):
+    list_display = ['company', 'period_start', 'status', 'customers_processed', 'invoices_created',
+                    'started_at', 'finished_at']
+    list_filter = ['status', 'period_start']
+    readonly_fields = ['id', 'last_customer_id', 'started_at', 'updated_at', 'finished_at']
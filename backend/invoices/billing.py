@@ -0,0 +1,204 @@
+"""
+Invoice Generation
+Bills a company's customers for a month in keyset-paginated batches.
+
+Each batch of customers is billed with one aggregate query per source
+(collection events, balance ledger, mobile money payments), and its
+invoices are written with bulk_create in the same transaction as the
+run's checkpoint. Memory stays bounded by the batch size, and a run that
+stops part way resumes after the last customer it committed.
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from customers.models import BalanceEntry, Customer
+from operations.models import CollectionEvent
+from payments.models import PaymentTransaction
+from .models import Invoice, InvoiceRun
+
+
+BATCH_SIZE = 1000
+
+# Days after the period end an invoice is due, by Customer.payment_terms
+TERMS_DAYS = {
+    'immediate': 0,
+    'net_15': 15,
+    'net_30': 30,
+    'net_60': 60,
+    'net_90': 90,
+}
+
+
+def month_bounds(day):
+    """First day of the month containing `day` and of the month after it."""
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def parse_month(value):
+    """Parse 'YYYY-MM' into the month's bounds. Raises ValueError."""
+    try:
+        year, month = (int(part) for part in str(value).split('-'))
+        return month_bounds(date(year, month, 1))
+    except (TypeError, ValueError):
+        raise ValueError('month must be YYYY-MM')
+
+
+def aware(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def invoice_number(period_start, customer_id, card_number):
+    return f"INV-{period_start:%Y%m}-{card_number or customer_id.hex[:12].upper()}"
+
+
+def bill_batch(run, customers, unit_price):
+    """Build invoices for one batch of (id, card_number, payment_terms, credit_limit) rows."""
+    customer_ids = [row[0] for row in customers]
+    start, end = aware(run.period_start), aware(run.period_end)
+
+    events = {
+        row['customer_id']: row
+        for row in CollectionEvent.objects.filter(
+            customer_id__in=customer_ids,
+            occurred_at__gte=start,
+            occurred_at__lt=end
+        ).order_by().values('customer_id').annotate(
+            made=Count('id', filter=Q(outcome='collected')),
+            missed=Count('id', filter=Q(outcome='missed')),
+        )
+    }
+
+    in_period = Q(created_at__gte=start)
+    ledger = {
+        row['customer_id']: row
+        for row in BalanceEntry.objects.filter(
+            customer_id__in=customer_ids,
+            created_at__lt=end
+        ).order_by().values('customer_id').annotate(
+            opening=Sum('amount', filter=Q(created_at__lt=start)),
+            debited=Sum('amount', filter=in_period & Q(kind='collection')),
+            topped_up=Sum('amount', filter=in_period & Q(kind='top_up')),
+            adjusted=Sum('amount', filter=in_period & ~Q(kind__in=['collection', 'top_up'])),
+        )
+    }
+
+    payments = {
+        row['customer_id']: row
+        for row in PaymentTransaction.objects.filter(
+            customer_id__in=customer_ids,
+            status='successful',
+            completed_at__gte=start,
+            completed_at__lt=end
+        ).order_by().values('customer_id').annotate(
+            count=Count('id'),
+            paid=Sum('amount'),
+        )
+    }
+
+    invoices = []
+    for customer_id, card_number, payment_terms, credit_limit in customers:
+        made = events.get(customer_id, {}).get('made', 0)
+        missed = events.get(customer_id, {}).get('missed', 0)
+        entries = ledger.get(customer_id, {})
+        opening = entries.get('opening') or 0
+        debited = -(entries.get('debited') or 0)
+        topped_up = entries.get('topped_up') or 0
+        adjusted = entries.get('adjusted') or 0
+        unpaid = max(made - debited, 0)
+        amount_due = unit_price * unpaid
+
+        invoices.append(Invoice(
+            number=invoice_number(run.period_start, customer_id, card_number),
+            company_id=run.company_id,
+            customer_id=customer_id,
+            period_start=run.period_start,
+            period_end=run.period_end,
+            collections_made=made,
+            collections_missed=missed,
+            collections_debited=debited,
+            collections_unpaid=unpaid,
+            opening_balance=opening,
+            collections_topped_up=topped_up,
+            adjustments=adjusted,
+            closing_balance=opening - debited + topped_up + adjusted,
+            unit_price=unit_price,
+            payments_count=payments.get(customer_id, {}).get('count', 0),
+            amount_paid=payments.get(customer_id, {}).get('paid') or Decimal('0'),
+            amount_due=amount_due,
+            due_date=run.period_end + timedelta(days=TERMS_DAYS.get(payment_terms, 30)),
+            exceeds_credit_limit=amount_due > credit_limit,
+            status='issued' if amount_due else 'paid',
+        ))
+    return invoices
+
+
+def generate_invoices(company, period_start, batch_size=BATCH_SIZE, restart=False, progress=None):
+    """
+    Generate the month's invoices for a company, resuming an unfinished
+    run for the same period. Invoices that already exist are left alone.
+    `progress(run)` is called after each committed batch. Returns the run.
+    """
+    period_start, period_end = month_bounds(period_start)
+    run, _ = InvoiceRun.objects.get_or_create(
+        company=company,
+        period_start=period_start,
+        defaults={'period_end': period_end}
+    )
+    if run.status == 'completed' and not restart:
+        return run
+    if restart:
+        run.last_customer_id = None
+        run.customers_processed = 0
+        run.invoices_created = 0
+    run.status = 'running'
+    run.error = ''
+    run.finished_at = None
+    run.save()
+
+    unit_price = company.prepaid_collection_price
+    customers = Customer.objects.filter(
+        company=company,
+        created_at__lt=aware(period_end)
+    ).filter(
+        Q(deleted_at__isnull=True) | Q(deleted_at__gte=aware(period_start))
+    ).order_by('id')
+
+    try:
+        while True:
+            batch = customers
+            if run.last_customer_id:
+                batch = batch.filter(id__gt=run.last_customer_id)
+            rows = list(batch.values_list('id', 'card_number', 'payment_terms', 'credit_limit')[:batch_size])
+            if not rows:
+                break
+
+            with transaction.atomic():
+                billed = set(Invoice.objects.filter(
+                    customer_id__in=[row[0] for row in rows],
+                    period_start=period_start
+                ).values_list('customer_id', flat=True))
+                invoices = bill_batch(run, [row for row in rows if row[0] not in billed], unit_price)
+                Invoice.objects.bulk_create(invoices, batch_size=batch_size, ignore_conflicts=True)
+
+                run.last_customer_id = rows[-1][0]
+                run.customers_processed += len(rows)
+                run.invoices_created += len(invoices)
+                run.save(update_fields=['last_customer_id', 'customers_processed', 'invoices_created', 'updated_at'])
+
+            if progress:
+                progress(run)
+    except Exception as e:
+        InvoiceRun.objects.filter(id=run.id).update(status='failed', error=str(e), updated_at=timezone.now())
+        raise
+
+    run.status = 'completed'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return run
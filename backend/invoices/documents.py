@@ -0,0 +1,147 @@
+"""
+Document Rendering
+Payment receipts and monthly statements as PDFs, cached on disk.
+
+Documents are rendered from fixed-width text templates
+(templates/invoices/*.txt) and stored content-addressed under
+MEDIA_ROOT/documents/: the file name is a hash of the template source and
+of exactly the data the document shows. A repeat download of unchanged
+data is served from disk, and any change to the data or the template
+renders a new file instead of serving a stale one.
+
+Context builders run in the web or command process and do the database
+reads; rendering needs only the context, so bulk rendering can hand it to
+worker processes.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+
+from .pdf import text_to_pdf
+
+
+DOCUMENTS_DIR = 'documents'
+
+TEMPLATES = {
+    'statement': 'invoices/statement.txt',
+    'receipt': 'invoices/receipt.txt',
+}
+
+
+def money(amount, currency='RWF'):
+    return f'{amount:,.2f} {currency}'
+
+
+def company_context(company):
+    return {
+        'name': company.name,
+        'address': company.address_display,
+        'contact': ' | '.join(filter(None, [company.phone, company.email])),
+    }
+
+
+def customer_context(customer):
+    return {
+        'name': customer.get_full_name(),
+        'card_number': customer.card_number or '',
+        'address': customer.get_billing_address_string() or 'N/A',
+    }
+
+
+def statement_context(invoice):
+    """Everything a statement shows. `invoice` needs company and customer loaded."""
+    return {
+        'title': f'Statement {invoice.number}',
+        'company': company_context(invoice.company),
+        'customer': customer_context(invoice.customer),
+        'invoice': {
+            'number': invoice.number,
+            'period': f'{invoice.period_start:%B %Y}',
+            'issued': f'{invoice.created_at:%Y-%m-%d}',
+            'due_date': f'{invoice.due_date:%Y-%m-%d}',
+            'opening_balance': invoice.opening_balance,
+            'collections_topped_up': invoice.collections_topped_up,
+            'adjustments': invoice.adjustments,
+            'collections_debited': invoice.collections_debited,
+            'closing_balance': invoice.closing_balance,
+            'collections_made': invoice.collections_made,
+            'collections_missed': invoice.collections_missed,
+            'collections_unpaid': invoice.collections_unpaid,
+            'payments_count': invoice.payments_count,
+            'amount_paid': money(invoice.amount_paid),
+            'unit_price': money(invoice.unit_price),
+            'amount_due': money(invoice.amount_due),
+            'status': invoice.get_status_display(),
+        },
+    }
+
+
+def receipt_context(payment):
+    """Everything a receipt shows. `payment` needs company and customer loaded."""
+    return {
+        'title': f'Receipt {payment.id}',
+        'company': company_context(payment.company),
+        'customer': customer_context(payment.customer),
+        'receipt': {
+            'number': f'RCT-{payment.id.hex[:12].upper()}',
+            'paid_at': f'{payment.completed_at:%Y-%m-%d %H:%M} UTC',
+            'provider': payment.get_provider_display(),
+            'msisdn': payment.msisdn,
+            'provider_reference': payment.provider_reference or 'N/A',
+            'collections': payment.collections,
+            'unit_price': money(payment.amount / payment.collections, payment.currency),
+            'amount': money(payment.amount, payment.currency),
+        },
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def template_digest(kind):
+    return hashlib.sha256(get_template(TEMPLATES[kind]).template.source.encode()).hexdigest()
+
+
+def document_path(kind, context):
+    """Content-addressed cache path for a document."""
+    key = hashlib.sha256(
+        (template_digest(kind) + json.dumps(context, sort_keys=True, default=str)).encode()
+    ).hexdigest()
+    return os.path.join(settings.MEDIA_ROOT, DOCUMENTS_DIR, kind, key[:2], f'{key}.pdf')
+
+
+def render_document(kind, context):
+    """Render a document to PDF bytes."""
+    return text_to_pdf(render_to_string(TEMPLATES[kind], context), title=context.get('title', ''))
+
+
+def write_document(kind, context, path):
+    """Render a document to `path` unless it is already there. Returns the path."""
+    if os.path.exists(path):
+        return path
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file and rename, so readers never see a partial PDF
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(render_document(kind, context))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+
+def get_document(kind, context):
+    """Path of the cached PDF for a document, rendering it on a cache miss."""
+    return write_document(kind, context, document_path(kind, context))
+
+
+def render_task(task):
+    """Process pool entry point: (kind, context, path) -> path."""
+    return write_document(*task)
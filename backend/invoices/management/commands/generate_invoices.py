@@ -0,0 +1,72 @@
+"""
+Management command to generate monthly customer invoices.
+
+Bills every customer of a company (or of all active companies) for a
+month, resuming an interrupted run from its checkpoint. Intended to run
+at the start of each month for the previous one (e.g. from cron):
+
+    python manage.py generate_invoices --month 2026-09 --company <company-id>
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.company_models import Company
+from invoices.billing import BATCH_SIZE, generate_invoices, month_bounds, parse_month
+
+
+class Command(BaseCommand):
+    help = 'Generate monthly invoices for customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Month to bill as YYYY-MM (default: last month)',
+        )
+        parser.add_argument(
+            '--company',
+            help='Only bill this company (default: all active companies)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Customers billed per transaction (default: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Start from the first customer again (existing invoices are kept)',
+        )
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                period_start, _ = parse_month(options['month'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            this_month, _ = month_bounds(timezone.now().date())
+            period_start, _ = month_bounds(this_month - timedelta(days=1))
+
+        companies = Company.objects.filter(status='active')
+        if options['company']:
+            companies = Company.objects.filter(id=options['company'])
+
+        for company in companies:
+            def progress(run):
+                self.stdout.write(f'  {company.name}: {run.customers_processed} customers, {run.invoices_created} invoices')
+
+            run = generate_invoices(
+                company,
+                period_start,
+                batch_size=options['batch_size'],
+                restart=options['restart'],
+                progress=progress
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {company.name} {period_start:%Y-%m}: {run.invoices_created} invoices '
+                f'for {run.customers_processed} customers'
+            ))
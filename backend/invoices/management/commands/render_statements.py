@@ -0,0 +1,86 @@
+"""
+Management command to pre-render monthly statement PDFs.
+
+Renders every statement of a month into the document cache so customers'
+downloads are served from disk. Database reads happen here; rendering and
+writing run in a pool of worker processes:
+
+    python manage.py render_statements --month 2026-09 --processes 4
+
+Statements whose data has not changed since they were last rendered are
+skipped.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from invoices.billing import parse_month
+from invoices.documents import document_path, render_task, statement_context
+from invoices.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Render monthly statement PDFs into the document cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', required=True, help='Month to render as YYYY-MM')
+        parser.add_argument('--company', help='Only render statements of this company')
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Rendering worker processes (default: CPU count)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Statements read from the database at a time (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            period_start, _ = parse_month(options['month'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        invoices = Invoice.objects.select_related('company', 'customer').filter(
+            period_start=period_start
+        ).exclude(status='void').order_by('id')
+        if options['company']:
+            invoices = invoices.filter(company_id=options['company'])
+
+        # Workers must not inherit open database connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        rendered = cached = 0
+        last_id = None
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup) as pool:
+            while True:
+                batch = invoices if last_id is None else invoices.filter(id__gt=last_id)
+                batch = list(batch[:options['batch_size']])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                tasks = []
+                for invoice in batch:
+                    context = statement_context(invoice)
+                    path = document_path('statement', context)
+                    if os.path.exists(path):
+                        cached += 1
+                    else:
+                        tasks.append(('statement', context, path))
+                rendered += len(list(pool.map(render_task, tasks, chunksize=50)))
+                self.stdout.write(f'  {rendered + cached} statements ({rendered} rendered)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {rendered} statements rendered, {cached} already cached, in {elapsed:.1f}s'
+        ))
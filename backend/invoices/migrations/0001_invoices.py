@@ -0,0 +1,82 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0003_user_company_name_alter_role_name_company_and_more'),
+        ('customers', '0005_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('last_customer_id', models.UUIDField(blank=True, null=True)),
+                ('customers_processed', models.PositiveIntegerField(default=0)),
+                ('invoices_created', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_runs', to='accounts.company')),
+            ],
+            options={
+                'verbose_name': 'Invoice Run',
+                'verbose_name_plural': 'Invoice Runs',
+                'ordering': ['-period_start', '-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('number', models.CharField(max_length=30, unique=True)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('collections_made', models.PositiveIntegerField(default=0)),
+                ('collections_missed', models.PositiveIntegerField(default=0)),
+                ('collections_debited', models.PositiveIntegerField(default=0, help_text='Collections paid from the prepaid balance')),
+                ('collections_unpaid', models.PositiveIntegerField(default=0, help_text='Collections the balance did not cover')),
+                ('opening_balance', models.IntegerField(default=0)),
+                ('collections_topped_up', models.IntegerField(default=0)),
+                ('adjustments', models.IntegerField(default=0)),
+                ('closing_balance', models.IntegerField(default=0)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('amount_due', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('due_date', models.DateField()),
+                ('exceeds_credit_limit', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('issued', 'Issued'), ('paid', 'Paid'), ('void', 'Void')], default='issued', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='accounts.company')),
+                ('customer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='customers.customer')),
+            ],
+            options={
+                'verbose_name': 'Invoice',
+                'verbose_name_plural': 'Invoices',
+                'ordering': ['-period_start', 'number'],
+                'indexes': [models.Index(fields=['company', 'period_start', 'status'], name='invoice_company_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='invoice',
+            constraint=models.UniqueConstraint(fields=('customer', 'period_start'), name='unique_invoice_per_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicerun',
+            constraint=models.UniqueConstraint(fields=('company', 'period_start'), name='unique_invoice_run_per_period'),
+        ),
+    ]
@@ -1,3 +1,131 @@
+"""
+Invoice Models
+Monthly customer statements/invoices and the runs that generate them.
+"""
+
+import uuid
 from django.db import models
 
-# Create your models here.
+
+class Invoice(models.Model):
+    """
+    A customer's monthly statement of prepaid collections, top-ups and any
+    amount due for collections the prepaid balance did not cover.
+
+    Balances and counts are in collections; money is in the company's
+    currency at the price per collection when the invoice was generated.
+    """
+
+    STATUS_CHOICES = [
+        ('issued', 'Issued'),
+        ('paid', 'Paid'),
+        ('void', 'Void'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    number = models.CharField(max_length=30, unique=True)
+    company = models.ForeignKey(
+        'accounts.Company',
+        on_delete=models.PROTECT,
+        related_name='invoices'
+    )
+    customer = models.ForeignKey(
+        'customers.Customer',
+        on_delete=models.PROTECT,
+        related_name='invoices',
+        db_index=False  # Covered by unique_invoice_per_period
+    )
+
+    # Billing Period [period_start, period_end)
+    period_start = models.DateField()
+    period_end = models.DateField()
+
+    # Collections
+    collections_made = models.PositiveIntegerField(default=0)
+    collections_missed = models.PositiveIntegerField(default=0)
+    collections_debited = models.PositiveIntegerField(default=0, help_text="Collections paid from the prepaid balance")
+    collections_unpaid = models.PositiveIntegerField(default=0, help_text="Collections the balance did not cover")
+
+    # Prepaid Balance (collections)
+    opening_balance = models.IntegerField(default=0)
+    collections_topped_up = models.IntegerField(default=0)
+    adjustments = models.IntegerField(default=0)
+    closing_balance = models.IntegerField(default=0)
+
+    # Money
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    payments_count = models.PositiveIntegerField(default=0)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    amount_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    due_date = models.DateField()
+    exceeds_credit_limit = models.BooleanField(default=False)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='issued')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-period_start', 'number']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['customer', 'period_start'],
+                name='unique_invoice_per_period'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'period_start', 'status'], name='invoice_company_period_idx'),
+        ]
+        verbose_name = 'Invoice'
+        verbose_name_plural = 'Invoices'
+
+    def __str__(self):
+        return f"{self.number} ({self.status})"
+
+
+class InvoiceRun(models.Model):
+    """
+    Progress of invoice generation for one company and period.
+
+    Customers are billed in ID order and the last billed customer ID is
+    saved with each batch, so an interrupted run resumes where it stopped.
+    """
+
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(
+        'accounts.Company',
+        on_delete=models.CASCADE,
+        related_name='invoice_runs'
+    )
+    period_start = models.DateField()
+    period_end = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+
+    # Checkpoint
+    last_customer_id = models.UUIDField(null=True, blank=True)
+    customers_processed = models.PositiveIntegerField(default=0)
+    invoices_created = models.PositiveIntegerField(default=0)
+
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-period_start', '-started_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'period_start'],
+                name='unique_invoice_run_per_period'
+            ),
+        ]
+        verbose_name = 'Invoice Run'
+        verbose_name_plural = 'Invoice Runs'
+
+    def __str__(self):
+        return f"{self.company} {self.period_start:%Y-%m} ({self.status})"
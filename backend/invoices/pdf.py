@@ -0,0 +1,74 @@
+"""
+Plain-Text PDF Writer
+Lays out pre-formatted text as an A4 PDF in a monospaced font.
+
+Documents are rendered to fixed-width text from templates, so a PDF only
+needs to place lines on pages. The output has no timestamps or random IDs,
+so the same text always produces the same bytes.
+"""
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 10
+LEADING = 12
+
+# Courier glyphs are 0.6 em wide
+LINE_CHARS = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+PAGE_LINES = int((PAGE_HEIGHT - 2 * MARGIN) / LEADING)
+
+
+def escape(text):
+    """Encode a line as a PDF literal string body (Latin-1, escaped)."""
+    encoded = text.encode('latin-1', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def wrap(lines):
+    for line in lines:
+        line = line.rstrip().expandtabs(4)
+        if not line:
+            yield ''
+        while line:
+            yield line[:LINE_CHARS]
+            line = line[LINE_CHARS:]
+
+
+def text_to_pdf(text, title=''):
+    """Render text to PDF bytes, starting a new page on form feeds or when full."""
+    pages = []
+    for block in text.split('\f'):
+        lines = list(wrap(block.splitlines()))
+        pages.extend(lines[i:i + PAGE_LINES] for i in range(0, len(lines), PAGE_LINES))
+    pages = pages or [[]]
+
+    # 1 catalog, 2 page tree, 3 font, 4 info, then a page and its content per page
+    objects = {
+        3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+        4: b'<< /Title (' + escape(title) + b') /Producer (CleanPay) >>',
+    }
+    kids = []
+    for i, lines in enumerate(pages):
+        page_id, content_id = 5 + 2 * i, 6 + 2 * i
+        kids.append(f'{page_id} 0 R'.encode())
+        stream = b'BT /F1 %d Tf %d TL %d %d Td\n' % (FONT_SIZE, LEADING, MARGIN, PAGE_HEIGHT - MARGIN - FONT_SIZE)
+        stream += b''.join(b'(' + escape(line) + b') Tj T*\n' for line in lines) + b'ET'
+        objects[page_id] = (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+        objects[content_id] = b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream'
+    objects[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[2] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(pages)
+
+    output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(output)
+        output += b'%d 0 obj\n' % number + objects[number] + b'\nendobj\n'
+
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offsets[number] for number in sorted(objects))
+    output += b'trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
@@ -0,0 +1,62 @@
+"""
+Invoice Serializers
+"""
+
+from rest_framework import serializers
+
+from .models import Invoice, InvoiceRun
+
+
+class InvoiceSerializer(serializers.ModelSerializer):
+    """Serializer for customer invoices (read-only)."""
+    
+    customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
+    
+    class Meta:
+        model = Invoice
+        fields = [
+            'id',
+            'number',
+            'company',
+            'customer',
+            'customer_name',
+            'period_start',
+            'period_end',
+            'collections_made',
+            'collections_missed',
+            'collections_debited',
+            'collections_unpaid',
+            'opening_balance',
+            'collections_topped_up',
+            'adjustments',
+            'closing_balance',
+            'unit_price',
+            'payments_count',
+            'amount_paid',
+            'amount_due',
+            'due_date',
+            'exceeds_credit_limit',
+            'status',
+            'created_at'
+        ]
+        read_only_fields = fields
+
+
+class InvoiceRunSerializer(serializers.ModelSerializer):
+    """Serializer for invoice generation runs (read-only)."""
+    
+    class Meta:
+        model = InvoiceRun
+        fields = [
+            'id',
+            'company',
+            'period_start',
+            'period_end',
+            'status',
+            'customers_processed',
+            'invoices_created',
+            'error',
+            'started_at',
+            'finished_at'
+        ]
+        read_only_fields = fields
@@ -1,3 +1,220 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.company_models import Company
+from accounts.models import User
+from customers.models import Customer
+from payments.models import PaymentTransaction
+from .billing import generate_invoices
+from .documents import get_document, receipt_context, render_document, statement_context
+from .models import Invoice, InvoiceRun
+from .pdf import LINE_CHARS, text_to_pdf
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InvoiceRunTests(TestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(
+            name='Green Ltd', email='green@example.com', prepaid_collection_price=Decimal('500')
+        )
+        for n in range(3):
+            Customer.objects.create(
+                first_name='Customer', last_name=str(n), email=f'customer{n}@example.com', company=self.company
+            )
+        self.month = timezone.now().date().replace(day=1)
+
+    def test_interrupted_run_resumes_after_its_checkpoint(self):
+        def stop_after_first_batch(run):
+            raise Interrupted
+
+        with self.assertRaises(Interrupted):
+            generate_invoices(self.company, self.month, batch_size=1, progress=stop_after_first_batch)
+
+        run = InvoiceRun.objects.get()
+        self.assertEqual((run.status, run.customers_processed), ('failed', 1))
+        self.assertEqual(Invoice.objects.count(), 1)
+
+        run = generate_invoices(self.company, self.month, batch_size=1)
+
+        self.assertEqual((run.status, run.customers_processed, run.invoices_created), ('completed', 3, 3))
+        self.assertEqual(Invoice.objects.count(), 3)
+
+    def test_completed_run_is_not_billed_twice(self):
+        first = generate_invoices(self.company, self.month)
+        again = generate_invoices(self.company, self.month)
+        restarted = generate_invoices(self.company, self.month, restart=True)
+
+        self.assertEqual(again.id, first.id)
+        self.assertEqual(restarted.invoices_created, 0)
+        self.assertEqual(Invoice.objects.count(), 3)
+
+
+class PdfAssertions:
+
+    def assertValidPdf(self, data):
+        """Header, trailer, and an xref table whose offsets point at its objects."""
+        self.assertTrue(data.startswith(b'%PDF-1.4\n'))
+        self.assertTrue(data.endswith(b'%%EOF\n'))
+        xref = int(data.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+        self.assertTrue(data[xref:].startswith(b'xref\n'))
+        entries = data[xref:].split(b'trailer')[0].splitlines()[3:]
+        self.assertIn(b'/Size %d ' % (len(entries) + 1), data)
+        for number, entry in enumerate(entries, start=1):
+            offset = int(entry[:10])
+            self.assertTrue(data[offset:].startswith(b'%d 0 obj' % number))
+
+
+class PdfWriterTests(PdfAssertions, TestCase):
+
+    def test_text_is_laid_out_on_pages(self):
+        data = text_to_pdf('Receipt (copy)\\\n' + 'x' * 200 + '\fSecond page', title='Receipt')
+
+        self.assertValidPdf(data)
+        self.assertIn(b'/Count 2', data)
+        self.assertIn(b'(Receipt \\(copy\\)\\\\) Tj', data)
+        # Long lines are wrapped rather than running off the page
+        self.assertIn(b'(' + b'x' * LINE_CHARS + b') Tj', data)
+        self.assertNotIn(b'x' * (LINE_CHARS + 1), data)
+
+    def test_same_text_gives_same_bytes(self):
+        self.assertEqual(text_to_pdf('Statement', title='S'), text_to_pdf('Statement', title='S'))
+
+
+class DocumentTestCase(PdfAssertions, TestCase):
+    """Shared fixtures: two customers with a statement and a receipt each, documents in a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.company = Company.objects.create(
+            name='Green Ltd', email='green@example.com', prepaid_collection_price=Decimal('500')
+        )
+        self.customer, self.other = [self.customer_with_receipt(name) for name in ('Aline', 'Other')]
+        generate_invoices(self.company, timezone.now().date().replace(day=1))
+
+    def customer_with_receipt(self, name):
+        customer = Customer.objects.create(
+            first_name=name, last_name='M', email=f'{name.lower()}@example.com', phone='0788000001', company=self.company
+        )
+        PaymentTransaction.objects.create(
+            company=self.company,
+            customer=customer,
+            provider='mtn',
+            msisdn=customer.phone,
+            collections=4,
+            amount=Decimal('2000'),
+            status='successful',
+            provider_reference='MTN-1',
+            completed_at=timezone.now()
+        )
+        return customer
+
+    def statement(self, customer=None):
+        return Invoice.objects.select_related('company', 'customer').get(customer=customer or self.customer)
+
+    def payment(self, customer=None):
+        return PaymentTransaction.objects.select_related('company', 'customer').get(customer=customer or self.customer)
+
+
+class DocumentRenderingTests(DocumentTestCase):
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_statement_renders_to_a_pdf(self):
+        invoice = self.statement()
+
+        data = self.read(get_document('statement', statement_context(invoice)))
+
+        self.assertValidPdf(data)
+        self.assertIn(invoice.number.encode(), data)
+
+    def test_receipt_renders_to_a_pdf(self):
+        context = receipt_context(self.payment())
+
+        data = self.read(get_document('receipt', context))
+
+        self.assertValidPdf(data)
+        self.assertIn(context['receipt']['number'].encode(), data)
+
+    def test_unchanged_document_is_served_from_the_cache(self):
+        path = get_document('statement', statement_context(self.statement()))
+
+        with mock.patch('invoices.documents.render_document', wraps=render_document) as render:
+            again = get_document('statement', statement_context(self.statement()))
+
+        self.assertEqual(again, path)
+        render.assert_not_called()
+
+    def test_changed_document_is_rendered_again(self):
+        path = get_document('statement', statement_context(self.statement()))
+        Invoice.objects.update(adjustments=2)
+
+        with mock.patch('invoices.documents.render_document', wraps=render_document) as render:
+            changed = get_document('statement', statement_context(self.statement()))
+
+        self.assertNotEqual(changed, path)
+        render.assert_called_once()
+        self.assertTrue(os.path.exists(path))
+        self.assertNotEqual(self.read(changed), self.read(path))
+
+
+class PortalDocumentTests(DocumentTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.customer.user = User.objects.create_user('aline@example.com', 'pw12345!', first_name='Aline', last_name='M')
+        self.customer.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer.user)
+
+    def download(self, url):
+        response = self.client.get(url)
+        if response.status_code == 200:
+            return response.status_code, b''.join(response.streaming_content)
+        return response.status_code, None
+
+    def test_customer_downloads_own_statement(self):
+        invoice = self.statement()
+
+        status, data = self.download(f'/api/v1/portal/invoices/{invoice.id}/statement/')
+
+        self.assertEqual(status, 200)
+        self.assertValidPdf(data)
+        self.assertIn(invoice.number.encode(), data)
+
+    def test_customer_downloads_own_receipt(self):
+        status, data = self.download(f'/api/v1/portal/payments/{self.payment().id}/receipt/')
+
+        self.assertEqual(status, 200)
+        self.assertValidPdf(data)
+
+    def test_other_customers_documents_are_not_found(self):
+        self.assertEqual(self.download(f'/api/v1/portal/invoices/{self.statement(self.other).id}/statement/')[0], 404)
+        self.assertEqual(self.download(f'/api/v1/portal/payments/{self.payment(self.other).id}/receipt/')[0], 404)
+
+    def test_receipt_of_unsettled_payment_is_not_found(self):
+        PaymentTransaction.objects.filter(customer=self.customer).update(status='pending', completed_at=None)
+
+        self.assertEqual(self.download(f'/api/v1/portal/payments/{self.payment().id}/receipt/')[0], 404)
+
+    def test_user_without_customer_profile_gets_nothing(self):
+        self.client.force_authenticate(User.objects.create_user('staff@example.com', 'pw12345!', first_name='S', last_name='U'))
+
+        self.assertEqual(self.download(f'/api/v1/portal/invoices/{self.statement().id}/statement/')[0], 404)
@@ -1,3 +1,55 @@
-from django.shortcuts import render
+"""
+Invoice Views
+Monthly customer invoices and their generation runs.
+"""
 
-# Create your views here.
+from django.http import FileResponse
+from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django_filters.rest_framework import DjangoFilterBackend
+
+from .documents import get_document, statement_context
+from .models import Invoice, InvoiceRun
+from .serializers import InvoiceSerializer, InvoiceRunSerializer
+
+
+class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for customer invoices (read-only).
+    Invoices are generated by the generate_invoices management command.
+    """
+    queryset = Invoice.objects.select_related('customer', 'company').all()
+    serializer_class = InvoiceSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['customer', 'status', 'period_start', 'exceeds_credit_limit']
+    search_fields = ['number', 'customer__first_name', 'customer__last_name', 'customer__card_number']
+    ordering_fields = ['period_start', 'amount_due', 'due_date']
+    ordering = ['-period_start', 'number']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.company_id:
+            queryset = queryset.filter(company_id=self.request.user.company_id)
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """Download the invoice's statement as a PDF (served from the render cache)."""
+        invoice = self.get_object()
+        path = get_document('statement', statement_context(invoice))
+        return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'{invoice.number}.pdf')
+    
+    @action(detail=False, methods=['get'])
+    def runs(self, request):
+        """Invoice generation runs and their progress, newest first."""
+        runs = InvoiceRun.objects.all()
+        if request.user.company_id:
+            runs = runs.filter(company_id=request.user.company_id)
+        
+        page = self.paginate_queryset(runs)
+        if page is not None:
+            return self.get_paginated_response(InvoiceRunSerializer(page, many=True).data)
+        return Response(InvoiceRunSerializer(runs, many=True).data)
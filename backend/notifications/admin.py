@@ -1,3 +1,34 @@
+"""
+Notifications Admin Configuration
+"""
+
 from django.contrib import admin
+from django.utils import timezone
+from .models import Notification
+
 
-# Register your models here.
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'channel', 'recipient', 'template', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['channel', 'status', 'template', 'created_at']
+    search_fields = ['recipient', 'subject', 'provider_message_id']
+    raw_id_fields = ['company', 'user', 'customer']
+    readonly_fields = ['channel', 'recipient', 'template', 'subject', 'body', 'status', 'attempts',
+                       'next_attempt_at', 'last_error', 'provider_message_id', 'created_at', 'sent_at']
+    date_hierarchy = 'created_at'
+    actions = ['retry_now', 'cancel']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected notifications now')
+    def retry_now(self, request, queryset):
+        updated = queryset.filter(status__in=['queued', 'failed']).update(
+            status='queued', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} notifications queued for delivery.')
+    
+    @admin.action(description='Cancel selected queued notifications')
+    def cancel(self, request, queryset):
+        updated = queryset.filter(status='queued').update(status='cancelled')
+        self.message_user(request, f'{updated} notifications cancelled.')
@@ -0,0 +1,79 @@
+"""
+Management command that runs the notification delivery worker.
+
+Sends queued email and SMS messages in batches, one worker loop per
+channel, pacing each channel with a token bucket at its configured rate
+(settings.NOTIFICATION_CHANNELS):
+
+    python manage.py send_notifications
+    python manage.py send_notifications --channel sms
+
+Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+workers can run at once, but rate limits are per process: give each
+worker its share of a provider's limit.
+"""
+
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from notifications.models import Notification
+from notifications.outbox import ChannelWorker
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email and SMS notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--channel',
+            action='append',
+            choices=[value for value, _ in Notification.CHANNEL_CHOICES],
+            help='Channel to deliver (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when nothing is due (default: 1)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver what is due now and exit',
+        )
+
+    def handle(self, *args, **options):
+        channels = options['channel'] or [value for value, _ in Notification.CHANNEL_CHOICES]
+        workers = [ChannelWorker(channel) for channel in channels]
+        totals = Counter()
+        try:
+            while True:
+                busy = False
+                throttled = []
+                for worker in workers:
+                    outcomes = worker.run_once()
+                    if outcomes is None:
+                        throttled.append(worker)
+                    elif outcomes:
+                        busy = True
+                        totals.update(outcomes)
+                        self.stdout.write(
+                            f'  {worker.channel}: ' + ', '.join(f'{n} {outcome}' for outcome, n in sorted(outcomes.items()))
+                        )
+                if busy:
+                    continue
+                if throttled:
+                    # Work may be waiting behind the rate limit
+                    time.sleep(min(worker.wait_time() for worker in throttled))
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Sent {totals['sent']} notifications ({totals['retry']} to retry, {totals['failed']} failed)"
+        ))
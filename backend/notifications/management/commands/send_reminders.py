@@ -0,0 +1,69 @@
+"""
+Management command that queues customer reminders.
+
+Queues low-balance warnings for customers under the threshold and
+reminders for customers whose route has a collection tomorrow. Customers
+reminded within the de-duplication window are skipped, so the command can
+run as often as needed (e.g. hourly from cron); the notification worker
+delivers what it queues:
+
+    python manage.py send_reminders
+    python manage.py send_reminders --only low_balance --threshold 2
+"""
+
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.reminders import send_collection_reminders, send_low_balance_warnings
+
+
+class Command(BaseCommand):
+    help = 'Queue low-balance warnings and upcoming collection reminders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=['low_balance', 'collection_reminder'],
+            help='Queue only one kind of reminder',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=settings.LOW_BALANCE_THRESHOLD,
+            help=f'Warn below this many collections (default: {settings.LOW_BALANCE_THRESHOLD})',
+        )
+        parser.add_argument(
+            '--date',
+            help='Remind about collections on this date, YYYY-MM-DD (default: tomorrow)',
+        )
+        parser.add_argument(
+            '--company',
+            help='Only this company (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Customers per insert batch (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        collection_date = None
+        if options['date']:
+            try:
+                collection_date = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date '{options['date']}', expected YYYY-MM-DD")
+
+        def progress(template, queued):
+            self.stdout.write(f'  {template}: {queued} queued')
+
+        arguments = {'company': options['company'], 'batch_size': options['batch_size'], 'progress': progress}
+        if options['only'] != 'collection_reminder':
+            queued = send_low_balance_warnings(options['threshold'], **arguments)
+            self.stdout.write(self.style.SUCCESS(f'✓ Queued {queued} low balance warnings'))
+        if options['only'] != 'low_balance':
+            queued = send_collection_reminders(collection_date, **arguments)
+            self.stdout.write(self.style.SUCCESS(f'✓ Queued {queued} collection reminders'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_company_name_alter_role_name_company_and_more'),
+        ('customers', '0006_customer_low_balance_index'),
+        ('notifications', '0001_notification_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['customer', 'template', 'created_at'], name='notification_dedupe_idx'),
+        ),
+    ]
@@ -1,3 +1,81 @@
+"""
+Notification Models
+Outbox of email and SMS messages waiting to be delivered.
+"""
+
 from django.db import models
 
-# Create your models here.
+
+class Notification(models.Model):
+    """
+    A rendered message in the delivery outbox.
+
+    Request handlers and jobs only insert rows here; the notification
+    worker sends them in batches per channel, within each provider's rate
+    limit, retrying failed sends with backoff.
+    """
+
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255, help_text="Email address or phone number")
+    template = models.CharField(max_length=50, help_text="Template the message was rendered from")
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+
+    # Who the message is about
+    company = models.ForeignKey(
+        'accounts.Company',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+    customer = models.ForeignKey(
+        'customers.Customer',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+
+    # Delivery State
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    provider_message_id = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Worker claim: queued messages of a channel that are due
+            models.Index(fields=['channel', 'status', 'next_attempt_at'], name='notification_due_idx'),
+            # Reminder de-duplication: has this customer had this template recently?
+            models.Index(fields=['customer', 'template', 'created_at'], name='notification_dedupe_idx'),
+        ]
+        verbose_name = 'Notification'
+        verbose_name_plural = 'Notifications'
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient}: {self.template} ({self.status})"
@@ -0,0 +1,163 @@
+"""
+Notification Outbox
+Queues messages from request handlers and jobs, and delivers them.
+
+Callers render a template into a Notification row with enqueue() (or
+build() + bulk_create for fan-out jobs) inside their own transaction, so a
+message is queued exactly when the change it describes commits, and no
+request waits on SMTP or an SMS gateway.
+
+The worker (`manage.py send_notifications`) runs a ChannelWorker per
+channel. Each takes tokens from the channel's bucket, claims that many due
+messages with SELECT ... FOR UPDATE SKIP LOCKED, sends them as one batch
+and records the results in bulk. Failed sends are retried with
+exponential backoff up to MAX_ATTEMPTS.
+"""
+
+import random
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Notification
+from .providers import SendResult, TokenBucket, channel_config, get_provider
+
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+
+# Claimed messages are hidden from other workers for this long
+CLAIM_LEASE = timedelta(minutes=5)
+
+SMS_MAX_LENGTH = 459  # three concatenated SMS parts
+
+
+def render(template, channel, context):
+    """
+    Render notifications/<template>.<channel>.txt. For email, the first
+    line is the subject. Returns (subject, body).
+    """
+    text = render_to_string(f'notifications/{template}.{channel}.txt', context).strip()
+    if channel != 'email':
+        return '', text[:SMS_MAX_LENGTH]
+    subject, _, body = text.partition('\n')
+    return subject.removeprefix('Subject:').strip(), body.strip()
+
+
+def build(channel, recipient, template, context=None, **links):
+    """An unsaved Notification, e.g. for bulk_create. `links` sets company/user/customer."""
+    subject, body = render(template, channel, context or {})
+    return Notification(
+        channel=channel,
+        recipient=recipient,
+        template=template,
+        subject=subject,
+        body=body,
+        next_attempt_at=timezone.now(),
+        **links
+    )
+
+
+def enqueue(channel, recipient, template, context=None, **links):
+    """Queue one message for delivery. Returns the Notification."""
+    notification = build(channel, recipient, template, context, **links)
+    notification.save()
+    return notification
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(channel, limit):
+    """Lease up to `limit` due queued messages of a channel to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Notification.objects.select_for_update(skip_locked=True).filter(
+                channel=channel,
+                status='queued',
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Notification.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(Notification.objects.filter(id__in=ids).order_by('next_attempt_at', 'id'))
+
+
+def deliver(channel, provider, limit):
+    """Claim and send one batch. Returns a Counter of outcomes."""
+    notifications = claim(channel, limit)
+    if not notifications:
+        return Counter()
+
+    try:
+        results = provider.send_batch(notifications)
+    except Exception as e:
+        results = [SendResult(False, error=f'{type(e).__name__}: {e}')] * len(notifications)
+
+    now = timezone.now()
+    outcomes = Counter()
+    for notification, result in zip(notifications, results):
+        notification.attempts += 1
+        if result.ok:
+            notification.status = 'sent'
+            notification.sent_at = now
+            notification.provider_message_id = result.message_id
+            notification.last_error = ''
+        elif result.retryable and notification.attempts < MAX_ATTEMPTS:
+            notification.next_attempt_at = now + retry_delay(notification.attempts)
+            notification.last_error = result.error
+        else:
+            notification.status = 'failed'
+            notification.last_error = result.error
+        outcomes['retry' if notification.status == 'queued' else notification.status] += 1
+
+    Notification.objects.bulk_update(
+        notifications,
+        ['status', 'attempts', 'next_attempt_at', 'sent_at', 'provider_message_id', 'last_error'],
+        batch_size=500
+    )
+    return outcomes
+
+
+class ChannelWorker:
+    """Delivers one channel's messages within its configured rate limit."""
+
+    def __init__(self, channel, provider=None, bucket=None):
+        config = channel_config(channel)
+        self.channel = channel
+        self.provider = provider or get_provider(channel)
+        self.bucket = bucket or TokenBucket(config['RATE'], config['BURST'])
+        self.batch_size = config['BATCH_SIZE']
+        self.backlog = False
+
+    @property
+    def minimum(self):
+        # While there is a backlog, wait for full batches rather than
+        # sending a trickle of one-message batches as tokens refill
+        return min(self.batch_size, int(self.bucket.capacity)) if self.backlog else 1
+
+    def wait_time(self):
+        return self.bucket.wait_time(self.minimum)
+
+    def run_once(self):
+        """
+        Send one batch if the rate limit allows. Returns the Counter of
+        outcomes, or None when the bucket is too low.
+        """
+        tokens = self.bucket.take(self.batch_size, self.minimum)
+        if not tokens:
+            return None
+        outcomes = deliver(self.channel, self.provider, tokens)
+        claimed = sum(outcomes.values())
+        self.backlog = claimed == tokens
+        if claimed < tokens:
+            self.bucket.give_back(tokens - claimed)
+        return outcomes
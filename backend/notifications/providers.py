@@ -0,0 +1,151 @@
+"""
+Notification Providers
+Delivery backends per channel, and the token buckets that pace them.
+
+Channels are configured in settings.NOTIFICATION_CHANNELS:
+
+    NOTIFICATION_CHANNELS = {
+        'sms': {
+            'BACKEND': 'notifications.providers.ConsoleSmsProvider',
+            'RATE': 10,          # sustained messages per second
+            'BURST': 20,         # messages that may go out at once
+            'BATCH_SIZE': 50,
+            'OPTIONS': {},
+        },
+    }
+"""
+
+import sys
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.module_loading import import_string
+
+
+class SendResult:
+    """Outcome of sending one message."""
+
+    def __init__(self, ok, message_id='', error='', retryable=True):
+        self.ok = ok
+        self.message_id = message_id
+        self.error = error
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """
+    Allows `rate` events per second on average and up to `capacity` at once.
+    Not shared between processes: run one worker per channel, or split the
+    provider's limit between workers.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, wanted, minimum=1):
+        """
+        Take up to `wanted` whole tokens now, or none if fewer than `minimum`
+        are available. Returns how many were taken.
+        """
+        with self.lock:
+            self._refill()
+            taken = int(min(wanted, self.tokens))
+            if taken < minimum:
+                return 0
+            self.tokens -= taken
+            return taken
+
+    def give_back(self, count):
+        """Return tokens that were taken but not used."""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + count)
+
+    def wait_time(self, wanted=1):
+        """Seconds until `wanted` tokens are available."""
+        with self.lock:
+            self._refill()
+            return max(0.0, (min(wanted, self.capacity) - self.tokens) / self.rate)
+
+
+class NotificationProvider:
+    """Base class for channel backends."""
+
+    def __init__(self, channel, **options):
+        self.channel = channel
+
+    def send_batch(self, notifications):
+        """Send Notification rows. Returns one SendResult per notification, in order."""
+        raise NotImplementedError
+
+
+class EmailProvider(NotificationProvider):
+    """Sends through Django's EMAIL_BACKEND, one connection per batch."""
+
+    def __init__(self, channel, from_email=None, **options):
+        super().__init__(channel, **options)
+        self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
+
+    def send_batch(self, notifications):
+        results = []
+        with get_connection(fail_silently=False) as connection:
+            for notification in notifications:
+                message = EmailMessage(
+                    subject=notification.subject,
+                    body=notification.body,
+                    from_email=self.from_email,
+                    to=[notification.recipient],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                    results.append(SendResult(True))
+                except Exception as e:
+                    results.append(SendResult(False, error=f'{type(e).__name__}: {e}'))
+        return results
+
+
+class ConsoleSmsProvider(NotificationProvider):
+    """Local stand-in for an SMS gateway: writes messages to stdout."""
+
+    def __init__(self, channel, latency=0, stream=None, **options):
+        super().__init__(channel, **options)
+        self.latency = latency
+        self.stream = stream or sys.stdout
+
+    def send_batch(self, notifications):
+        time.sleep(self.latency)
+        for notification in notifications:
+            self.stream.write(f'[SMS to {notification.recipient}] {notification.body}\n')
+        self.stream.flush()
+        return [SendResult(True, message_id=f'console-{uuid.uuid4().hex[:12]}') for _ in notifications]
+
+
+DEFAULT_CHANNELS = {
+    'email': {'BACKEND': 'notifications.providers.EmailProvider', 'RATE': 10, 'BURST': 20, 'BATCH_SIZE': 50},
+    'sms': {'BACKEND': 'notifications.providers.ConsoleSmsProvider', 'RATE': 20, 'BURST': 50, 'BATCH_SIZE': 100},
+}
+
+
+def channel_config(channel):
+    config = dict(DEFAULT_CHANNELS[channel])
+    config.update(getattr(settings, 'NOTIFICATION_CHANNELS', {}).get(channel, {}))
+    return config
+
+
+def get_provider(channel):
+    """A new provider instance for a channel, as configured."""
+    config = channel_config(channel)
+    return import_string(config['BACKEND'])(channel, **config.get('OPTIONS', {}))
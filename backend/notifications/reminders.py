@@ -0,0 +1,141 @@
+"""
+Customer Reminders
+Low-balance warnings and upcoming-collection reminders, fanned out into
+the notification outbox.
+
+Each kind of reminder is one set-based query over active customers,
+walked in primary-key order in batches. The query skips customers who
+already got the same reminder within its de-duplication window, using a
+NOT EXISTS lookup on notification_dedupe_idx. Rendered messages are
+bulk-inserted into the outbox, and the notification worker delivers them
+at the providers' rates.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from customers.models import Customer
+from operations.models import Schedule
+from .models import Notification
+from .outbox import build
+
+
+# A customer gets at most one reminder of each kind per window
+DEDUPE_WINDOWS = {
+    'low_balance': timedelta(days=7),
+    'collection_reminder': timedelta(hours=20),
+}
+
+CUSTOMER_FIELDS = ['id', 'first_name', 'phone', 'email', 'prepaid_balance', 'route_id', 'company_id', 'company__name']
+
+
+def recipients(template, since=None):
+    """
+    Active, reachable customers who have not had `template` since
+    `since` (default: the start of its de-duplication window).
+    """
+    since = since or timezone.now() - DEDUPE_WINDOWS[template]
+    recent = Notification.objects.filter(
+        customer=OuterRef('pk'),
+        template=template,
+        created_at__gte=since
+    )
+    return Customer.objects.filter(
+        status='active',
+        deleted_at__isnull=True
+    ).exclude(
+        phone='', email=''
+    ).exclude(
+        Exists(recent)
+    )
+
+
+def low_balance_customers(threshold=None, company=None):
+    threshold = settings.LOW_BALANCE_THRESHOLD if threshold is None else threshold
+    customers = recipients('low_balance').filter(prepaid_balance__lt=threshold)
+    if company:
+        customers = customers.filter(company=company)
+    return customers
+
+
+def scheduled_routes(date, company=None):
+    """Routes with a collection scheduled on `date`: {route_id: schedule values}."""
+    schedules = Schedule.objects.filter(scheduled_date=date, status='scheduled')
+    if company:
+        schedules = schedules.filter(route__service_area__company=company)
+    return {
+        schedule['route_id']: schedule
+        for schedule in schedules.values('route_id', 'route__name', 'scheduled_time_start', 'waste_type')
+    }
+
+
+def reminder_customers(routes, company=None):
+    customers = recipients('collection_reminder').filter(route_id__in=list(routes))
+    if company:
+        customers = customers.filter(company=company)
+    return customers
+
+
+def message_for(template, customer, context):
+    """An unsaved Notification to `customer` (a values() row): SMS if they have a phone, else email."""
+    channel, recipient = ('sms', customer['phone']) if customer['phone'] else ('email', customer['email'])
+    return build(
+        channel,
+        recipient,
+        template,
+        {'customer': customer, 'company_name': customer['company__name'], **context},
+        company_id=customer['company_id'],
+        customer_id=customer['id']
+    )
+
+
+def fan_out(customers, template, context_for, batch_size=2000, progress=None):
+    """
+    Queue `template` for every customer in the queryset, walking it by
+    primary key. `context_for(customer)` returns extra template context.
+    Returns the number of notifications queued.
+    """
+    queued = 0
+    last_id = None
+    customers = customers.order_by('id').values(*CUSTOMER_FIELDS)
+    while True:
+        batch = customers.filter(id__gt=last_id) if last_id else customers
+        batch = list(batch[:batch_size])
+        if not batch:
+            return queued
+        Notification.objects.bulk_create(
+            [message_for(template, customer, context_for(customer)) for customer in batch],
+            batch_size=batch_size
+        )
+        queued += len(batch)
+        last_id = batch[-1]['id']
+        if progress:
+            progress(template, queued)
+
+
+def send_low_balance_warnings(threshold=None, company=None, batch_size=2000, progress=None):
+    threshold = settings.LOW_BALANCE_THRESHOLD if threshold is None else threshold
+    return fan_out(
+        low_balance_customers(threshold, company),
+        'low_balance',
+        lambda customer: {'threshold': threshold},
+        batch_size,
+        progress
+    )
+
+
+def send_collection_reminders(date=None, company=None, batch_size=2000, progress=None):
+    date = date or timezone.localdate() + timedelta(days=1)
+    routes = scheduled_routes(date, company)
+    if not routes:
+        return 0
+    return fan_out(
+        reminder_customers(routes, company),
+        'collection_reminder',
+        lambda customer: {'date': date, 'schedule': routes[customer['route_id']]},
+        batch_size,
+        progress
+    )
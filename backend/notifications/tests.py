@@ -1,3 +1,412 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import dateformat, timezone
+
+from accounts.company_models import Company
+from accounts.models import User
+from customers.models import Customer
+from operations.models import Route, Schedule, ServiceArea
+from .models import Notification
+from .outbox import CLAIM_LEASE, MAX_ATTEMPTS, RETRY_BASE_SECONDS, ChannelWorker, claim, deliver, enqueue
+from .providers import EmailProvider, NotificationProvider, SendResult, TokenBucket
+from .reminders import DEDUPE_WINDOWS, recipients, send_collection_reminders, send_low_balance_warnings
+
+
+class FakeClock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeProvider(NotificationProvider):
+    """Records each batch; `outcome(notification)` decides every result, `error` fails the batch."""
+
+    def __init__(self, outcome=None, error=None):
+        super().__init__('sms')
+        self.outcome = outcome or (lambda notification: SendResult(True, message_id=f'fake-{notification.id}'))
+        self.error = error
+        self.batches = []
+
+    def send_batch(self, notifications):
+        self.batches.append([notification.id for notification in notifications])
+        if self.error:
+            raise self.error
+        return [self.outcome(notification) for notification in notifications]
+
+
+def queue_sms(count):
+    return [
+        enqueue('sms', f'07880000{n:02}', 'low_balance', {
+            'company_name': 'Green Ltd',
+            'customer': {'first_name': f'Customer {n}', 'prepaid_balance': 1},
+        })
+        for n in range(count)
+    ]
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(rate=2, capacity=10, clock=self.clock)
+
+    def test_take_is_limited_by_the_tokens_available(self):
+        self.assertEqual(self.bucket.take(25), 10)
+        self.assertEqual(self.bucket.take(1), 0)
+
+        self.clock.advance(1.5)
+
+        self.assertEqual(self.bucket.take(5), 3)
+        self.assertEqual(self.bucket.take(1), 0)
+
+    def test_take_below_minimum_takes_nothing(self):
+        self.bucket.take(10)
+        self.clock.advance(2)
+
+        self.assertEqual(self.bucket.take(10, minimum=5), 0)
+        self.assertEqual(self.bucket.take(10, minimum=4), 4)
+
+    def test_tokens_refill_up_to_capacity(self):
+        self.bucket.take(10)
+        self.clock.advance(60)
+
+        self.assertEqual(self.bucket.take(25), 10)
+
+    def test_give_back_returns_unused_tokens_up_to_capacity(self):
+        self.bucket.take(6)
+        self.bucket.give_back(4)
+        self.assertEqual(self.bucket.take(25), 8)
+
+        self.bucket.give_back(25)
+        self.assertEqual(self.bucket.take(25), 10)
+
+    def test_wait_time(self):
+        self.assertEqual(self.bucket.wait_time(5), 0)
+
+        self.bucket.take(10)
+
+        self.assertEqual(self.bucket.wait_time(), 0.5)
+        self.assertEqual(self.bucket.wait_time(4), 2)
+        # More than the bucket holds: waits for a full bucket
+        self.assertEqual(self.bucket.wait_time(50), 5)
+
+
+class ClaimTests(TestCase):
+
+    def test_claimed_messages_are_leased(self):
+        first, second, third = queue_sms(3)
+
+        claimed = claim('sms', 2)
+
+        self.assertEqual([notification.id for notification in claimed], [first.id, second.id])
+        for notification in claimed:
+            self.assertGreater(notification.next_attempt_at, timezone.now() + CLAIM_LEASE - timedelta(minutes=1))
+        # Hidden from the next claim until the lease runs out
+        self.assertEqual([notification.id for notification in claim('sms', 10)], [third.id])
+        self.assertEqual(claim('sms', 10), [])
+
+        Notification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(len(claim('sms', 10)), 3)
+
+    def test_only_due_queued_messages_of_the_channel_are_claimed(self):
+        due, later, sent = queue_sms(3)
+        Notification.objects.filter(id=later.id).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+        Notification.objects.filter(id=sent.id).update(status='sent')
+
+        self.assertEqual(claim('email', 10), [])
+        self.assertEqual([notification.id for notification in claim('sms', 10)], [due.id])
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentClaimTests(TransactionTestCase):
+
+    def test_rows_locked_by_another_worker_are_skipped(self):
+        locked = queue_sms(4)[:2]
+        claimed = []
+
+        def other_worker():
+            try:
+                claimed.extend(claim('sms', 10))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            list(Notification.objects.select_for_update().filter(id__in=[n.id for n in locked]))
+            thread = threading.Thread(target=other_worker)
+            thread.start()
+            thread.join(timeout=10)
+
+        self.assertEqual(len(claimed), 2)
+        self.assertFalse({notification.id for notification in claimed} & {n.id for n in locked})
+
+
+class DeliverTests(TestCase):
+
+    def setUp(self):
+        self.notifications = queue_sms(4)
+
+    def make_due(self):
+        Notification.objects.update(next_attempt_at=timezone.now())
+
+    def test_successful_batch_is_marked_sent(self):
+        provider = FakeProvider()
+
+        outcomes = deliver('sms', provider, 10)
+
+        self.assertEqual(outcomes, {'sent': 4})
+        self.assertEqual(len(provider.batches), 1)
+        for notification in Notification.objects.all():
+            self.assertEqual((notification.status, notification.attempts), ('sent', 1))
+            self.assertEqual(notification.provider_message_id, f'fake-{notification.id}')
+            self.assertIsNotNone(notification.sent_at)
+
+    def test_partial_failure_is_recorded_per_message(self):
+        ok, retry, rejected, unclaimed = [notification.id for notification in self.notifications]
+
+        def outcome(notification):
+            if notification.id == retry:
+                return SendResult(False, error='Gateway timeout')
+            if notification.id == rejected:
+                return SendResult(False, error='Invalid number', retryable=False)
+            return SendResult(True)
+
+        before = timezone.now()
+        outcomes = deliver('sms', FakeProvider(outcome), 3)
+
+        self.assertEqual(outcomes, {'sent': 1, 'retry': 1, 'failed': 1})
+        results = {notification.id: notification for notification in Notification.objects.all()}
+        self.assertEqual(results[ok].status, 'sent')
+        self.assertEqual((results[retry].status, results[retry].last_error), ('queued', 'Gateway timeout'))
+        self.assertGreaterEqual(results[retry].next_attempt_at, before + timedelta(seconds=RETRY_BASE_SECONDS * 0.8))
+        self.assertLess(results[retry].next_attempt_at, before + CLAIM_LEASE)
+        self.assertEqual((results[rejected].status, results[rejected].last_error), ('failed', 'Invalid number'))
+        self.assertEqual((results[unclaimed].status, results[unclaimed].attempts), ('queued', 0))
+
+    def test_raising_provider_retries_the_whole_batch(self):
+        outcomes = deliver('sms', FakeProvider(error=ConnectionError('gateway down')), 10)
+
+        self.assertEqual(outcomes, {'retry': 4})
+        for notification in Notification.objects.all():
+            self.assertEqual((notification.status, notification.attempts), ('queued', 1))
+            self.assertEqual(notification.last_error, 'ConnectionError: gateway down')
+
+    def test_retries_stop_after_max_attempts(self):
+        provider = FakeProvider(lambda notification: SendResult(False, error='Gateway timeout'))
+        delays = []
+
+        for attempt in range(1, MAX_ATTEMPTS):
+            self.make_due()
+            started = timezone.now()
+            self.assertEqual(deliver('sms', provider, 10), {'retry': 4})
+            delays.append(Notification.objects.earliest('next_attempt_at').next_attempt_at - started)
+        self.make_due()
+        outcomes = deliver('sms', provider, 10)
+
+        self.assertEqual(outcomes, {'failed': 4})
+        for notification in Notification.objects.all():
+            self.assertEqual((notification.status, notification.attempts), ('failed', MAX_ATTEMPTS))
+        # Exponential backoff, with jitter of at most 20%
+        for earlier, later in zip(delays, delays[1:]):
+            self.assertGreater(later, earlier * 1.2)
+        self.make_due()
+        self.assertEqual(deliver('sms', provider, 10), {})
+
+
+@override_settings(NOTIFICATION_CHANNELS={'sms': {'BATCH_SIZE': 3}})
+class ChannelWorkerTests(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.provider = FakeProvider()
+        self.worker = ChannelWorker('sms', self.provider, TokenBucket(rate=1, capacity=4, clock=self.clock))
+
+    def test_backlog_waits_for_full_batches(self):
+        queue_sms(5)
+
+        self.assertEqual(self.worker.run_once(), {'sent': 3})
+        self.assertTrue(self.worker.backlog)
+        # One token left: no one-message batch while there is a backlog
+        self.assertIsNone(self.worker.run_once())
+        self.assertEqual(self.worker.wait_time(), 2)
+
+        self.clock.advance(2)
+
+        self.assertEqual(self.worker.run_once(), {'sent': 2})
+        self.assertFalse(self.worker.backlog)
+        self.assertEqual([len(batch) for batch in self.provider.batches], [3, 2])
+
+    def test_unused_tokens_are_given_back(self):
+        queue_sms(1)
+
+        self.assertEqual(self.worker.run_once(), {'sent': 1})
+        self.assertEqual(self.worker.run_once(), {})
+
+        self.assertEqual(self.worker.bucket.take(10), 3)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class PasswordResetNotificationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('aline@example.com', 'pw12345!', first_name='Aline', last_name='M')
+
+    def request_reset(self, email):
+        return self.client.post(
+            '/api/v1/auth/password-reset/request_reset/', {'email': email}, content_type='application/json'
+        )
+
+    def test_reset_email_is_queued_not_sent(self):
+        response = self.request_reset('aline@example.com')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        notification = Notification.objects.get()
+        self.assertEqual((notification.channel, notification.recipient), ('email', 'aline@example.com'))
+        self.assertEqual((notification.template, notification.user), ('password_reset', self.user))
+        self.assertEqual(notification.subject, 'Reset your CleanPay password')
+        self.assertIn(self.user.password_reset_tokens.get().token, notification.body)
+
+        self.assertEqual(deliver('email', EmailProvider('email'), 10), {'sent': 1})
+        self.assertEqual(mail.outbox[0].to, ['aline@example.com'])
+        self.assertEqual(mail.outbox[0].body, notification.body)
+
+    def test_unknown_email_queues_nothing(self):
+        response = self.request_reset('nobody@example.com')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Notification.objects.exists())
+
+
+class ReminderTestCase(TestCase):
+    """Shared fixtures: customers of one company, on one of two routes."""
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Green Ltd', email='green@example.com')
+        self.area = ServiceArea.objects.create(name='Kacyiru', code='KCY', company=self.company)
+        self.route = Route.objects.create(service_area=self.area, name='Route A', code='RA', sequence_number=1)
+        self.other_route = Route.objects.create(service_area=self.area, name='Route B', code='RB', sequence_number=2)
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+
+    def customer(self, name, balance=0, route=None, **fields):
+        fields = {'email': f'{name.lower()}@example.com', 'phone': '0788000001', 'company': self.company, **fields}
+        return Customer.objects.create(
+            first_name=name, last_name='M', prepaid_balance=balance, route=route or self.route, **fields
+        )
+
+    def queued_for(self, template):
+        return set(Notification.objects.filter(template=template).values_list('customer__first_name', flat=True))
+
+
+class LowBalanceWarningTests(ReminderTestCase):
+
+    def test_customers_below_the_threshold_are_warned_once(self):
+        empty = self.customer('Empty', balance=0)
+        self.customer('Low', balance=2)
+        self.customer('Enough', balance=3)
+
+        self.assertEqual(send_low_balance_warnings(threshold=3), 2)
+        self.assertEqual(send_low_balance_warnings(threshold=3), 0)
+
+        self.assertEqual(self.queued_for('low_balance'), {'Empty', 'Low'})
+        notification = Notification.objects.get(customer=empty)
+        self.assertEqual((notification.channel, notification.recipient), ('sms', '0788000001'))
+        self.assertEqual(notification.company, self.company)
+        self.assertTrue(notification.body.startswith('Green Ltd: Hello Empty, you have 0 waste collections left.'))
+
+    def test_customer_without_phone_is_emailed(self):
+        self.customer('Aline', phone='')
+
+        send_low_balance_warnings(threshold=3)
+
+        notification = Notification.objects.get()
+        self.assertEqual((notification.channel, notification.recipient), ('email', 'aline@example.com'))
+
+    def test_inactive_and_unreachable_customers_are_skipped(self):
+        self.customer('Archived', status='archived')
+        self.customer('Suspended', status='suspended')
+        self.customer('Deleted', deleted_at=timezone.now())
+        self.customer('Unreachable', phone='', email='')
+        self.customer('Active')
+
+        self.assertEqual(send_low_balance_warnings(threshold=3), 1)
+        self.assertEqual(self.queued_for('low_balance'), {'Active'})
+
+    def test_warning_is_repeated_after_the_dedupe_window(self):
+        customer = self.customer('Aline')
+        send_low_balance_warnings(threshold=3)
+        window = DEDUPE_WINDOWS['low_balance']
+
+        Notification.objects.update(created_at=timezone.now() - window + timedelta(hours=1))
+        self.assertEqual(send_low_balance_warnings(threshold=3), 0)
+
+        Notification.objects.update(created_at=timezone.now() - window - timedelta(hours=1))
+        self.assertEqual(send_low_balance_warnings(threshold=3), 1)
+        self.assertEqual(Notification.objects.filter(customer=customer).count(), 2)
+
+    def test_other_templates_do_not_count_towards_the_window(self):
+        customer = self.customer('Aline')
+        enqueue('sms', customer.phone, 'collection_reminder', {'customer': {}}, customer=customer)
+
+        self.assertFalse(recipients('collection_reminder').exists())
+        self.assertEqual(list(recipients('low_balance')), [customer])
+
+    def test_customers_are_walked_in_batches(self):
+        for n in range(5):
+            self.customer(f'Customer{n}')
+        progress = []
+
+        queued = send_low_balance_warnings(threshold=3, batch_size=2, progress=lambda template, count: progress.append(count))
+
+        self.assertEqual(queued, 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(Notification.objects.values('customer').distinct().count(), 5)
+
+
+class CollectionReminderTests(ReminderTestCase):
+
+    def test_customers_on_routes_collected_on_the_date_are_reminded_once(self):
+        Schedule.objects.create(route=self.route, scheduled_date=self.tomorrow)
+        Schedule.objects.create(route=self.other_route, scheduled_date=self.tomorrow + timedelta(days=1))
+        self.customer('Aline', balance=5)
+        self.customer('Other', balance=5, route=self.other_route)
+        self.customer('Archived', status='archived')
+
+        self.assertEqual(send_collection_reminders(), 1)
+        self.assertEqual(send_collection_reminders(), 0)
+
+        self.assertEqual(self.queued_for('collection_reminder'), {'Aline'})
+        self.assertIn(f'collected on {dateformat.format(self.tomorrow, "D j M")}', Notification.objects.get().body)
+        self.assertEqual(send_collection_reminders(self.tomorrow + timedelta(days=1)), 1)
+        self.assertEqual(self.queued_for('collection_reminder'), {'Aline', 'Other'})
+
+    def test_only_scheduled_collections_are_announced(self):
+        Schedule.objects.create(route=self.route, scheduled_date=self.tomorrow, status='cancelled')
+        self.customer('Aline')
+
+        self.assertEqual(send_collection_reminders(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_reminders_can_be_limited_to_one_company(self):
+        other_company = Company.objects.create(name='Blue Ltd', email='blue@example.com')
+        other_area = ServiceArea.objects.create(name='Remera', code='RMR', company=other_company)
+        other_route = Route.objects.create(service_area=other_area, name='Route C', code='RC', sequence_number=1)
+        Schedule.objects.create(route=self.route, scheduled_date=self.tomorrow)
+        Schedule.objects.create(route=other_route, scheduled_date=self.tomorrow)
+        self.customer('Aline')
+        self.customer('Blue', route=other_route, company=other_company)
+
+        self.assertEqual(send_collection_reminders(company=other_company), 1)
+        self.assertEqual(self.queued_for('collection_reminder'), {'Blue'})
+        self.assertEqual(send_collection_reminders(), 1)
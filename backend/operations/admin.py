@@ -4,7 +4,7 @@ Operations Admin Configuration
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ServiceArea, Route, Collector, Schedule
+from .models import ServiceArea, Route, Collector, Schedule, CollectionEvent
 
 
 @admin.register(ServiceArea)
@@ -63,7 +63,7 @@ class RouteAdmin(admin.ModelAdmin):
     list_filter = ['status', 'frequency', 'service_area']
     search_fields = ['name', 'code', 'service_area__name']
     readonly_fields = ['id', 'created_by', 'created_at', 'updated_at', 
-                       'customers_count', 'collection_schedule_display']
+                       'customers_count', 'collection_schedule_display', 'stop_sequence']
     
     fieldsets = (
         ('Basic Information', {
@@ -73,7 +73,7 @@ class RouteAdmin(admin.ModelAdmin):
             'fields': ('service_area', 'default_collector', 'sequence_number')
         }),
         ('Route Details', {
-            'fields': ('estimated_distance_km', 'estimated_duration_minutes', 'path_geojson'),
+            'fields': ('estimated_distance_km', 'estimated_duration_minutes', 'path_geojson', 'stop_sequence'),
             'classes': ('collapse',)
         }),
         ('Collection Schedule', {
@@ -89,6 +89,9 @@ class RouteAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_customers_count()
+    
     def customers_count(self, obj):
         return obj.customers_count
     customers_count.short_description = 'Customers'
@@ -246,3 +249,17 @@ class ScheduleAdmin(admin.ModelAdmin):
         count = queryset.update(status='missed')
         self.message_user(request, f'{count} schedules marked as missed.')
     mark_missed.short_description = 'Mark selected schedules as missed'
+
+
+@admin.register(CollectionEvent)
+class CollectionEventAdmin(admin.ModelAdmin):
+    list_display = ['customer', 'schedule', 'collector', 'method', 'outcome', 'occurred_at', 'distance_m']
+    list_filter = ['method', 'outcome', 'occurred_at']
+    search_fields = ['customer__first_name', 'customer__last_name', 'customer__card_number']
+    raw_id_fields = ['customer', 'schedule', 'collector']
+    readonly_fields = ['id', 'created_at']
+    date_hierarchy = 'occurred_at'
+    
+    def has_change_permission(self, request, obj=None):
+        # The ledger is append-only
+        return False
@@ -0,0 +1,154 @@
+"""
+Collector Assignment Engine
+Assigns collectors to scheduled collections while respecting collector
+status, service area membership, overlapping time windows and a daily
+capacity per collector.
+
+All inputs are loaded with a handful of queries into in-memory indexes and
+the assignment itself is a greedy pass: the most constrained schedules are
+placed first, each on the least loaded collector that can take it.
+"""
+
+from collections import defaultdict
+from datetime import time
+
+from django.db import transaction
+
+from .models import Collector, Schedule
+
+
+DEFAULT_DAILY_CAPACITY = 4
+
+# Statuses that occupy a collector's time slot
+BOOKED_STATUSES = ['scheduled', 'in_progress', 'completed']
+
+
+def time_window(start, end):
+    """Schedules without times block the whole part of the day they leave open."""
+    return (start or time.min, end or time.max)
+
+
+def overlaps(window, booked):
+    """Check whether a (start, end) window overlaps any booked window."""
+    start, end = window
+    return any(start < b_end and b_start < end for b_start, b_end in booked)
+
+
+def plan_assignments(schedules, daily_capacity=DEFAULT_DAILY_CAPACITY, keep_existing=True):
+    """
+    Compute collector assignments for the 'scheduled' rows of a queryset.
+
+    Schedules outside the queryset that are already booked on the same days
+    are treated as fixed. Returns a list of dicts with the schedule ID, the
+    previous and planned collector and an outcome of 'kept', 'assigned' or
+    'unassigned'.
+    """
+    candidates = schedules.filter(status='scheduled')
+    rows = list(candidates.order_by().values(
+        'id', 'scheduled_date', 'scheduled_time_start', 'scheduled_time_end',
+        'collector_id', 'route__service_area_id', 'route__default_collector_id',
+    ))
+    if not rows:
+        return []
+
+    # Index: service area -> active collectors allowed to work there
+    area_ids = {row['route__service_area_id'] for row in rows}
+    area_collectors = defaultdict(list)
+    memberships = Collector.service_areas.through.objects.filter(
+        servicearea_id__in=area_ids,
+        collector__status='active'
+    ).values_list('servicearea_id', 'collector_id')
+    for area_id, collector_id in memberships:
+        area_collectors[area_id].append(collector_id)
+    collector_ids = {cid for cids in area_collectors.values() for cid in cids}
+
+    # Index: (collector, date) -> booked windows from schedules we are not moving
+    dates = {row['scheduled_date'] for row in rows}
+    bookings = defaultdict(list)
+    week_load = defaultdict(int)
+    fixed = Schedule.objects.filter(
+        collector_id__in=collector_ids,
+        scheduled_date__in=dates,
+        status__in=BOOKED_STATUSES
+    ).exclude(pk__in=candidates.values('pk')).values_list(
+        'collector_id', 'scheduled_date', 'scheduled_time_start', 'scheduled_time_end'
+    )
+    for collector_id, day, start, end in fixed:
+        bookings[(collector_id, day)].append(time_window(start, end))
+        week_load[collector_id] += 1
+
+    def fits(collector_id, day, window):
+        booked = bookings[(collector_id, day)]
+        return len(booked) < daily_capacity and not overlaps(window, booked)
+
+    # Most constrained first: earliest day, fewest eligible collectors, earliest start
+    rows.sort(key=lambda row: (
+        row['scheduled_date'],
+        len(area_collectors[row['route__service_area_id']]),
+        row['scheduled_time_start'] or time.min,
+    ))
+
+    plan = []
+    for row in rows:
+        day = row['scheduled_date']
+        window = time_window(row['scheduled_time_start'], row['scheduled_time_end'])
+        options = [
+            cid for cid in area_collectors[row['route__service_area_id']]
+            if fits(cid, day, window)
+        ]
+
+        chosen = None
+        if keep_existing and row['collector_id'] in options:
+            chosen = row['collector_id']
+        elif options:
+            chosen = min(options, key=lambda cid: (
+                len(bookings[(cid, day)]),
+                week_load[cid],
+                cid != row['route__default_collector_id'],
+                str(cid),
+            ))
+
+        if chosen is not None:
+            bookings[(chosen, day)].append(window)
+            week_load[chosen] += 1
+
+        if chosen is None:
+            outcome = 'unassigned'
+        elif chosen == row['collector_id']:
+            outcome = 'kept'
+        else:
+            outcome = 'assigned'
+
+        plan.append({
+            'id': row['id'],
+            'scheduled_date': day,
+            'previous_collector': row['collector_id'],
+            'collector': chosen,
+            'outcome': outcome,
+        })
+
+    return plan
+
+
+def apply_assignments(plan, unassign=False):
+    """
+    Write a plan with one UPDATE per target collector. Returns rows changed.
+
+    Unassigned entries keep their current collector unless `unassign` is
+    set, in which case their collector is cleared.
+    """
+    by_collector = defaultdict(list)
+    for entry in plan:
+        if entry['collector'] is None and not unassign:
+            continue
+        if entry['collector'] != entry['previous_collector']:
+            by_collector[entry['collector']].append(entry['id'])
+
+    changed = 0
+    with transaction.atomic():
+        for collector_id, schedule_ids in by_collector.items():
+            changed += Schedule.objects.filter(
+                id__in=schedule_ids,
+                status='scheduled'
+            ).update(collector_id=collector_id)
+    return changed
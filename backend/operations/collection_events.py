@@ -0,0 +1,114 @@
+"""
+Collection Event Ledger
+Records per-customer collection events in batches and keeps the derived
+values in step within the same transaction:
+
+- Schedule.customers_collected / customers_missed are recounted from events
+- each 'collected' event debits one collection from the customer's prepaid
+  balance through the balance ledger, as far as the balance covers it
+"""
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from customers.balance import debit_collections
+from customers.models import Customer
+from .models import CollectionEvent, Schedule
+
+
+BATCH_SIZE = 1000
+
+
+def event_count(outcome):
+    """Subquery counting a schedule's events with the given outcome."""
+    return Coalesce(Subquery(
+        CollectionEvent.objects.filter(
+            schedule=OuterRef('pk'),
+            outcome=outcome
+        ).order_by().values('schedule').annotate(n=Count('id')).values('n')[:1]
+    ), 0)
+
+
+def refresh_schedule_counters(schedule_ids):
+    """Recount customers_collected/missed on schedules in one UPDATE."""
+    return Schedule.objects.filter(id__in=schedule_ids).update(
+        customers_collected=event_count('collected'),
+        customers_missed=event_count('missed'),
+    )
+
+
+def record_collection_events(events):
+    """
+    Insert unsaved CollectionEvent instances and update derived values.
+
+    The affected schedules are locked first, so concurrent batches for the
+    same schedule are serialized and an event for a (schedule, customer)
+    pair that already has one is skipped rather than failing the batch.
+    Returns (inserted events, IDs of customers whose balance could not
+    cover a collection).
+    """
+    if not events:
+        return [], []
+    schedule_ids = {event.schedule_id for event in events}
+
+    with transaction.atomic():
+        list(Schedule.objects.select_for_update().filter(id__in=schedule_ids).values_list('id', flat=True))
+
+        existing = set(CollectionEvent.objects.filter(
+            schedule_id__in=schedule_ids,
+            customer_id__in={event.customer_id for event in events},
+        ).values_list('schedule_id', 'customer_id'))
+
+        new_events = []
+        for event in events:
+            key = (event.schedule_id, event.customer_id)
+            if key not in existing:
+                existing.add(key)
+                new_events.append(event)
+        if not new_events:
+            return [], []
+
+        CollectionEvent.objects.bulk_create(new_events, batch_size=BATCH_SIZE)
+        refresh_schedule_counters(schedule_ids)
+        unpaid = debit_collections(
+            (event.customer_id, str(event.id)) for event in new_events if event.outcome == 'collected'
+        )
+
+    return new_events, sorted({customer_id for customer_id, _ in unpaid}, key=str)
+
+
+def record_missed_for_schedule(schedule, collector=None):
+    """
+    Record 'missed' events for the route's active customers that have no
+    event on this schedule yet.
+    """
+    seen = CollectionEvent.objects.filter(schedule=schedule).values('customer_id')
+    missing = Customer.objects.filter(
+        route_id=schedule.route_id,
+        status='active',
+        deleted_at__isnull=True
+    ).exclude(id__in=seen).values_list('id', flat=True)
+    return record_collection_events([
+        CollectionEvent(
+            schedule_id=schedule.id,
+            customer_id=customer_id,
+            collector=collector,
+            method='manual',
+            outcome='missed',
+        )
+        for customer_id in missing
+    ])
+
+
+def close_schedule_events(schedule, collector=None):
+    """
+    On completion, record 'missed' for the route's remaining customers and
+    reload the schedule's counters. Only applies to schedules that already
+    have events; returns whether the counters now come from the ledger.
+    """
+    if not schedule.collection_events.exists():
+        return False
+    record_missed_for_schedule(schedule, collector)
+    schedule.refresh_from_db(fields=['customers_collected', 'customers_missed'])
+    return True
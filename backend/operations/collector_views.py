@@ -12,12 +12,21 @@ from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import Schedule, Route, Collector, ServiceArea
+from .models import Schedule, Route, Collector, ServiceArea, CollectionEvent
+from .collection_events import close_schedule_events, record_collection_events
+from .geofence import MAX_FIXES_PER_BATCH, record_fixes
+from .serializers import CollectionEventBatchSerializer
+from .sequencing import order_by_sequence
 from customers.models import Customer
+from accounts.permissions import role_name
+from accounts.tokens import user_claim
 
 
 def get_collector_for_user(user):
     """Get the collector profile for a user, if any."""
+    # The token claim only hints at a profile; loading it below checks it
+    if not user_claim(user, 'collector_id'):
+        return None
     if hasattr(user, 'collector_profile'):
         return user.collector_profile
     return None
@@ -30,17 +39,12 @@ class CollectorPortalPermission(IsAuthenticated):
         if not super().has_permission(request, view):
             return False
         
-        # Check if user has collector_profile
-        collector = get_collector_for_user(request.user)
-        if collector:
+        # Check if user has collector_profile (hinted by the token claims)
+        if get_collector_for_user(request.user) is not None:
             return True
         
         # Also allow if user role is 'collector' (even without profile for now)
-        role_name = None
-        if hasattr(request.user, 'role') and request.user.role:
-            role_name = getattr(request.user.role, 'name', None) or request.user.role
-        
-        return role_name == 'collector'
+        return role_name(request.user) == 'collector'
 
 
 class CollectorPortalDashboardView(APIView):
@@ -234,21 +238,23 @@ class CollectorPortalScheduleDetailView(APIView):
                 'error': 'Schedule not found.',
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Get customers on this route
+        # Get customers on this route, in the route's optimized stop order
         customers = Customer.objects.filter(
             route=schedule.route,
             status='active'
         ).values('id', 'first_name', 'last_name', 'phone', 'billing_address', 'company_name')
+        customers = order_by_sequence(customers, schedule.route.stop_sequence)
         
         customer_data = [{
             'id': str(c['id']),
+            'stop_number': stop_number,
             'name': f"{c['first_name']} {c['last_name']}",
             'company_name': c['company_name'] or '',
             'phone': c['phone'] or '',
             'address': c['billing_address'].get('street', '') if c['billing_address'] else '',
             'latitude': c['billing_address'].get('latitude') if c['billing_address'] else None,
             'longitude': c['billing_address'].get('longitude') if c['billing_address'] else None,
-        } for c in customers]
+        } for stop_number, c in enumerate(customers, start=1)]
         
         return Response({
             'id': str(schedule.id),
@@ -343,15 +349,16 @@ class CollectorPortalCompleteScheduleView(APIView):
                 'error': f'Cannot complete schedule with status: {schedule.status}',
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update with provided data
-        customers_collected = request.data.get('customers_collected', 0)
-        customers_missed = request.data.get('customers_missed', 0)
         notes = request.data.get('notes', '')
         
         schedule.status = 'completed'
         schedule.actual_end_time = timezone.now()
-        schedule.customers_collected = customers_collected
-        schedule.customers_missed = customers_missed
+        
+        # Counts come from recorded collection events when there are any,
+        # otherwise from the provided data
+        if not close_schedule_events(schedule, collector):
+            schedule.customers_collected = request.data.get('customers_collected', 0)
+            schedule.customers_missed = request.data.get('customers_missed', 0)
         if notes:
             schedule.notes = notes
         schedule.save()
@@ -365,6 +372,84 @@ class CollectorPortalCompleteScheduleView(APIView):
             'id': str(schedule.id),
             'status': schedule.status,
             'actual_end_time': schedule.actual_end_time,
+            'customers_collected': schedule.customers_collected,
+            'customers_missed': schedule.customers_missed,
+        })
+
+
+class CollectorPortalRecordCollectionsView(APIView):
+    """
+    Record per-customer collections for an in-progress schedule.
+    
+    Accepts a batch under 'events', each identifying the customer by
+    customer_id or card_number (NFC scans), with optional method,
+    outcome and occurred_at. Customers that already have an event on the
+    schedule are skipped.
+    """
+    
+    permission_classes = [CollectorPortalPermission]
+    
+    def post(self, request, schedule_id):
+        collector = get_collector_for_user(request.user)
+        
+        if not collector:
+            return Response({
+                'error': 'No collector profile linked.',
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            schedule = Schedule.objects.get(id=schedule_id, collector=collector)
+        except Schedule.DoesNotExist:
+            return Response({
+                'error': 'Schedule not found.',
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if schedule.status != 'in_progress':
+            return Response({
+                'error': f'Cannot record collections for schedule with status: {schedule.status}',
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = CollectionEventBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entries = serializer.validated_data['events']
+        
+        # Resolve customers on this route in one query
+        customers = Customer.objects.filter(
+            Q(id__in=[e['customer_id'] for e in entries if e.get('customer_id')]) |
+            Q(card_number__in=[e['card_number'] for e in entries if e.get('card_number')]),
+            route_id=schedule.route_id
+        ).values_list('id', 'card_number')
+        by_id = {customer_id: customer_id for customer_id, _ in customers}
+        by_card = {card: customer_id for customer_id, card in customers if card}
+        
+        now = timezone.now()
+        events = []
+        unknown = []
+        for index, entry in enumerate(entries):
+            customer_id = by_id.get(entry.get('customer_id')) or by_card.get(entry.get('card_number'))
+            if customer_id is None:
+                unknown.append(index)
+                continue
+            events.append(CollectionEvent(
+                schedule_id=schedule.id,
+                customer_id=customer_id,
+                collector=collector,
+                method=entry['method'],
+                outcome=entry['outcome'],
+                occurred_at=entry.get('occurred_at') or now,
+            ))
+        
+        recorded, unpaid = record_collection_events(events)
+        schedule.refresh_from_db(fields=['customers_collected', 'customers_missed'])
+        
+        return Response({
+            'message': f'{len(recorded)} collections recorded.',
+            'recorded': len(recorded),
+            'skipped': len(events) - len(recorded),
+            'unknown_customers': unknown,
+            'insufficient_balance': [str(customer_id) for customer_id in unpaid],
+            'customers_collected': schedule.customers_collected,
+            'customers_missed': schedule.customers_missed,
         })
 
 
@@ -387,7 +472,7 @@ class CollectorPortalRoutesView(APIView):
         routes = Route.objects.filter(
             default_collector=collector,
             status='active'
-        ).select_related('service_area')
+        ).select_related('service_area').with_customers_count()
         
         route_data = [{
             'id': str(r.id),
@@ -415,7 +500,14 @@ class CollectorPortalRoutesView(APIView):
 
 
 class CollectorPortalUpdateLocationView(APIView):
-    """Update collector's current location."""
+    """
+    Update collector's current location.
+    
+    Accepts a single fix (latitude, longitude) or a batch under 'fixes',
+    each with latitude, longitude and optional accuracy (metres) and
+    timestamp. Fixes are matched against the customers on the collector's
+    in-progress routes to confirm collections automatically.
+    """
     
     permission_classes = [CollectorPortalPermission]
     
@@ -427,22 +519,42 @@ class CollectorPortalUpdateLocationView(APIView):
                 'error': 'No collector profile linked.',
             }, status=status.HTTP_403_FORBIDDEN)
         
-        latitude = request.data.get('latitude')
-        longitude = request.data.get('longitude')
-        
-        if not latitude or not longitude:
+        fixes = request.data.get('fixes')
+        if fixes is None:
+            latitude = request.data.get('latitude')
+            longitude = request.data.get('longitude')
+            
+            if not latitude or not longitude:
+                return Response({
+                    'error': 'latitude and longitude are required.',
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            fixes = [{
+                'latitude': latitude,
+                'longitude': longitude,
+                'accuracy': request.data.get('accuracy'),
+                'timestamp': request.data.get('timestamp'),
+            }]
+        
+        if not isinstance(fixes, list) or not fixes:
+            return Response({
+                'error': 'fixes must be a non-empty list.',
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(fixes) > MAX_FIXES_PER_BATCH:
+            return Response({
+                'error': f'At most {MAX_FIXES_PER_BATCH} fixes can be sent at once.',
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(fix, dict) for fix in fixes):
             return Response({
-                'error': 'latitude and longitude are required.',
+                'error': 'Each fix must be an object with latitude and longitude.',
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # TODO: Store location in a separate LocationHistory model
-        # For now, just acknowledge the update
+        summary = record_fixes(collector, fixes)
         
         return Response({
             'message': 'Location updated successfully.',
-            'latitude': latitude,
-            'longitude': longitude,
             'timestamp': timezone.now(),
+            **summary,
         })
 
 
@@ -0,0 +1,184 @@
+"""
+Route Estimation
+Derives Route.estimated_distance_km and estimated_duration_minutes from
+the route's ordered stops, its path GeoJSON and a service-time model fitted
+to the company's completed schedules.
+
+Duration model (minutes):
+    overhead + minutes_per_stop * stops + minutes_per_km * distance_km
+
+Schedules do not record how far each run went, only the route's current
+distance is known, so the fit uses just the stops: overhead and
+minutes_per_stop are fitted by least squares, with the travel between
+stops folded into minutes_per_stop, and minutes_per_km is 0. Until a
+company has MIN_SAMPLES runs, DEFAULT_MODEL estimates travel from the
+distance at an assumed speed.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+
+from customers.models import Customer
+from .models import Route, Schedule
+from .sequencing import customer_coordinates, haversine_km, order_by_sequence, route_origin
+
+
+# Fallback model used until a company has enough completed schedules
+DEFAULT_MODEL = {
+    'overhead_minutes': 15.0,
+    'minutes_per_stop': 3.0,
+    'minutes_per_km': 4.0,  # ~15 km/h collection vehicle speed
+    'samples': 0,
+}
+MIN_SAMPLES = 10
+MAX_DURATION_MINUTES = 16 * 60
+
+
+def path_length_km(coordinates):
+    """Length of a [[lon, lat], ...] polyline in kilometers."""
+    if len(coordinates) < 2:
+        return 0.0
+    points = np.asarray(coordinates, dtype=float)
+    lons, lats = points[:, 0], points[:, 1]
+    return float(haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum())
+
+
+def geojson_length_km(geojson):
+    """Length of a GeoJSON LineString/MultiLineString (bare or in a Feature)."""
+    if not isinstance(geojson, dict):
+        return None
+    if geojson.get('type') == 'Feature':
+        geojson = geojson.get('geometry') or {}
+    try:
+        if geojson.get('type') == 'LineString':
+            return path_length_km(geojson['coordinates'])
+        if geojson.get('type') == 'MultiLineString':
+            return sum(path_length_km(line) for line in geojson['coordinates'])
+    except (KeyError, TypeError, ValueError, IndexError):
+        return None
+    return None
+
+
+def stops_length_km(origin, stops):
+    """Length of the path origin -> stops in order, in kilometers."""
+    points = ([origin] if origin else []) + stops
+    if len(points) < 2:
+        return 0.0
+    lats = np.array([p[0] for p in points])
+    lons = np.array([p[1] for p in points])
+    return float(haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum())
+
+
+def fit_duration_model(samples):
+    """
+    Fit the duration model to (stops, minutes) samples.
+    Falls back to DEFAULT_MODEL if there is too little data or the fit
+    produces negative coefficients.
+    """
+    if len(samples) < MIN_SAMPLES:
+        return dict(DEFAULT_MODEL, samples=len(samples))
+
+    data = np.asarray(samples, dtype=float)
+    features = np.column_stack([np.ones(len(data)), data[:, 0]])
+    coefficients, *_ = np.linalg.lstsq(features, data[:, 1], rcond=None)
+    if np.any(coefficients < 0) or not np.all(np.isfinite(coefficients)):
+        return dict(DEFAULT_MODEL, samples=len(samples))
+
+    overhead, per_stop = coefficients
+    return {
+        'overhead_minutes': float(overhead),
+        'minutes_per_stop': float(per_stop),
+        'minutes_per_km': 0.0,
+        'samples': len(samples),
+    }
+
+
+def predict_minutes(model, stops, distance_km):
+    if stops == 0 and distance_km == 0:
+        return 0
+    return int(round(
+        model['overhead_minutes'] +
+        model['minutes_per_stop'] * stops +
+        model['minutes_per_km'] * distance_km
+    ))
+
+
+def refresh_route_estimates(routes, save=True):
+    """
+    Recompute distance and duration for a queryset of routes in batch.
+
+    Uses three queries (routes, customers, completed schedules) plus one
+    bulk update. One duration model is fitted per company. Returns a list
+    of per-route results.
+    """
+    routes = list(routes.select_related('service_area').order_by())
+    if not routes:
+        return []
+    route_ids = [route.id for route in routes]
+
+    # Active customer coordinates per route
+    coordinates = defaultdict(list)
+    customers = Customer.objects.filter(
+        route_id__in=route_ids,
+        status='active',
+        deleted_at__isnull=True
+    ).values('id', 'route_id', 'billing_address')
+    for row in customers:
+        coordinates[row['route_id']].append(row)
+
+    # Distance per route: the drawn path if there is one, else the ordered stops
+    distances = {}
+    stop_counts = {}
+    for route in routes:
+        rows = order_by_sequence(coordinates[route.id], route.stop_sequence)
+        stops = [c for c in (customer_coordinates(row['billing_address']) for row in rows) if c]
+        from_path = geojson_length_km(route.path_geojson)
+        distances[route.id] = from_path if from_path else stops_length_km(route_origin(route), stops)
+        stop_counts[route.id] = len(rows)
+
+    # Historical samples: completed schedules with both actual times
+    samples = defaultdict(list)
+    history = Schedule.objects.filter(
+        route_id__in=route_ids,
+        status='completed',
+        actual_start_time__isnull=False,
+        actual_end_time__isnull=False,
+    ).values_list(
+        'route__service_area__company_id',
+        'actual_start_time', 'actual_end_time',
+        'customers_collected', 'customers_missed', 'customers_scheduled',
+    )
+    for company_id, started, ended, collected, missed, scheduled in history:
+        minutes = (ended - started).total_seconds() / 60
+        if not 0 < minutes <= MAX_DURATION_MINUTES:
+            continue
+        stops = (collected + missed) or scheduled
+        samples[company_id].append((stops, minutes))
+
+    models_by_company = {company_id: fit_duration_model(rows) for company_id, rows in samples.items()}
+
+    results = []
+    for route in routes:
+        company_id = route.service_area.company_id if route.service_area else None
+        model = models_by_company.get(company_id, DEFAULT_MODEL)
+        distance = distances[route.id]
+        route.estimated_distance_km = Decimal(str(round(distance, 2)))
+        route.estimated_duration_minutes = predict_minutes(model, stop_counts[route.id], distance)
+        results.append({
+            'id': str(route.id),
+            'code': route.code,
+            'stops': stop_counts[route.id],
+            'estimated_distance_km': float(route.estimated_distance_km),
+            'estimated_duration_minutes': route.estimated_duration_minutes,
+            'model_samples': model['samples'],
+        })
+
+    if save:
+        Route.objects.bulk_update(
+            routes,
+            ['estimated_distance_km', 'estimated_duration_minutes'],
+            batch_size=500
+        )
+    return results
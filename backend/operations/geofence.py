@@ -0,0 +1,296 @@
+"""
+Geofence Collection Confirmation
+Turns batches of collector location fixes into per-customer collection
+events for the collector's in-progress schedules.
+
+Each route gets a small spatial index of its customers' coordinates,
+projected to metres around the route and bucketed into a grid with cells
+one geofence radius wide, so a fix is only compared with the stops in the
+3x3 cells around it. Indexes are cached per process and dropped when a
+customer on the route moves or changes route.
+
+A customer counts as collected once the collector has stayed within
+GEOFENCE_RADIUS_M of them for MIN_DWELL_SECONDS, over consecutive fixes
+no more than MAX_FIX_GAP_SECONDS apart: a fix outside the fence, or a gap
+in the fixes, starts the dwell again. Dwells still open at the end of a
+batch are kept in the cache for the next one. Batches lock their
+schedules, so concurrent batches cannot overwrite each other's dwells.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from customers.models import Customer
+from .collection_events import record_collection_events
+from .models import CollectionEvent, Collector, Schedule
+
+
+GEOFENCE_RADIUS_M = 30
+MIN_DWELL_SECONDS = 20
+
+# Fixes further apart than this do not make a continuous dwell
+MAX_FIX_GAP_SECONDS = 60
+
+# Fixes less accurate than this are ignored
+MAX_ACCURACY_M = 50
+
+MAX_FIXES_PER_BATCH = 500
+
+# Open dwells are forgotten after this long
+PENDING_TTL_SECONDS = 15 * 60
+
+# Cached route indexes are rebuilt after this long even without changes
+FENCE_TTL_SECONDS = 10 * 60
+
+METERS_PER_DEGREE = 111320.0
+
+_lock = threading.Lock()
+_fences = {}
+
+
+class RouteGeofence:
+    """Grid index of a route's customer locations in local metres."""
+
+    def __init__(self, customer_ids, lats, lons):
+        self.customer_ids = list(customer_ids)
+        self.positions = {customer_id: i for i, customer_id in enumerate(self.customer_ids)}
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        self.origin = (lats.mean(), lons.mean()) if len(lats) else (0.0, 0.0)
+        self.xs, self.ys = self.project(lats, lons)
+
+        self.grid = defaultdict(list)
+        for i, cell in enumerate(zip(*self.cells(self.xs, self.ys))):
+            self.grid[cell].append(i)
+        self.grid = {cell: np.array(members) for cell, members in self.grid.items()}
+
+    def project(self, lats, lons):
+        lat0, lon0 = self.origin
+        xs = (np.asarray(lons, dtype=float) - lon0) * np.cos(np.radians(lat0)) * METERS_PER_DEGREE
+        ys = (np.asarray(lats, dtype=float) - lat0) * METERS_PER_DEGREE
+        return xs, ys
+
+    def cells(self, xs, ys):
+        return (
+            np.floor(xs / GEOFENCE_RADIUS_M).astype(np.int64).tolist(),
+            np.floor(ys / GEOFENCE_RADIUS_M).astype(np.int64).tolist(),
+        )
+
+    def match(self, lats, lons):
+        """
+        Nearest stop within the radius for each fix. Returns (indexes,
+        distances) arrays, with index -1 where no stop is close enough.
+        """
+        xs, ys = self.project(lats, lons)
+        nearest = np.full(len(xs), -1)
+        distances = np.full(len(xs), np.inf)
+        if not self.grid:
+            return nearest, distances
+
+        for i, (cx, cy) in enumerate(zip(*self.cells(xs, ys))):
+            candidates = [
+                self.grid[cell]
+                for cell in ((cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+                if cell in self.grid
+            ]
+            if not candidates:
+                continue
+            candidates = np.concatenate(candidates)
+            d = np.hypot(self.xs[candidates] - xs[i], self.ys[candidates] - ys[i])
+            best = d.argmin()
+            if d[best] <= GEOFENCE_RADIUS_M:
+                nearest[i] = candidates[best]
+                distances[i] = d[best]
+        return nearest, distances
+
+
+def get_geofence(route_id):
+    """The cached geofence for a route, built on first use."""
+    now = time.monotonic()
+    with _lock:
+        entry = _fences.get(route_id)
+        if entry and now - entry[0] < FENCE_TTL_SECONDS:
+            return entry[1]
+
+    rows = list(Customer.objects.filter(
+        route_id=route_id,
+        status='active',
+        deleted_at__isnull=True,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).values_list('id', 'latitude', 'longitude'))
+    fence = RouteGeofence(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        [row[2] for row in rows],
+    )
+    with _lock:
+        _fences[route_id] = (now, fence)
+    return fence
+
+
+def invalidate_geofence(route_id):
+    with _lock:
+        _fences.pop(route_id, None)
+
+
+def parse_fixes(raw_fixes):
+    """
+    Validate raw fixes ({latitude, longitude, accuracy?, timestamp?}).
+    Returns (fixes sorted by time, rejected count).
+    """
+    now = timezone.now()
+    fixes = []
+    rejected = 0
+    for raw in raw_fixes:
+        try:
+            latitude = float(raw['latitude'])
+            longitude = float(raw['longitude'])
+            accuracy = float(raw['accuracy']) if raw.get('accuracy') is not None else None
+        except (KeyError, TypeError, ValueError):
+            rejected += 1
+            continue
+        timestamp = parse_datetime(str(raw['timestamp'])) if raw.get('timestamp') else now
+        if (
+            timestamp is None or
+            not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or
+            (accuracy is not None and accuracy > MAX_ACCURACY_M)
+        ):
+            rejected += 1
+            continue
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        fixes.append((timestamp, latitude, longitude))
+
+    fixes.sort(key=lambda fix: fix[0])
+    return fixes, rejected
+
+
+def pending_key(schedule_id):
+    return f'geofence:dwells:{schedule_id}'
+
+
+def match_schedule(schedule_id, route_id, fixes, already_collected):
+    """
+    Match fixes against one route. Returns {customer_id: (occurred_at,
+    distance_m)} for customers whose dwell time is now met.
+
+    A dwell starts at a fix whose nearest stop is the customer and lasts
+    while the following fixes stay within the customer's radius.
+    """
+    fence = get_geofence(route_id)
+    lats = [f[1] for f in fixes]
+    lons = [f[2] for f in fixes]
+    nearest, distances = fence.match(lats, lons)
+    xs, ys = fence.project(lats, lons)
+
+    key = pending_key(schedule_id)
+    done = set(already_collected)
+    # {customer_id: (first, last, closest)} of dwells still open
+    dwells = {
+        cid: dwell for cid, dwell in (cache.get(key) or {}).items()
+        if cid not in done and cid in fence.positions
+    }
+
+    visited = {}
+    for i, (timestamp, _, _) in enumerate(fixes):
+        for customer_id, (first, last, closest) in list(dwells.items()):
+            j = fence.positions[customer_id]
+            distance = float(np.hypot(fence.xs[j] - xs[i], fence.ys[j] - ys[i]))
+            if distance > GEOFENCE_RADIUS_M or (timestamp - last).total_seconds() > MAX_FIX_GAP_SECONDS:
+                del dwells[customer_id]
+            else:
+                dwells[customer_id] = (first, timestamp, min(closest, distance))
+
+        if nearest[i] >= 0:
+            customer_id = fence.customer_ids[nearest[i]]
+            if customer_id not in done and customer_id not in visited and customer_id not in dwells:
+                dwells[customer_id] = (timestamp, timestamp, float(distances[i]))
+
+        for customer_id, (first, last, closest) in list(dwells.items()):
+            if (last - first).total_seconds() >= MIN_DWELL_SECONDS:
+                visited[customer_id] = (first, closest)
+                del dwells[customer_id]
+
+    cache.set(key, dwells, PENDING_TTL_SECONDS)
+    return visited
+
+
+def record_fixes(collector, raw_fixes):
+    """
+    Process a batch of location fixes from a collector.
+
+    Stores the latest position on the collector and records geofence
+    collection events for its in-progress schedules. Returns a summary dict.
+    """
+    fixes, rejected = parse_fixes(raw_fixes)
+    summary = {'accepted': len(fixes), 'rejected': rejected, 'visits_recorded': 0, 'schedules': []}
+    if not fixes:
+        return summary
+
+    last_fix = fixes[-1]
+    Collector.objects.filter(id=collector.id).update(
+        last_latitude=last_fix[1],
+        last_longitude=last_fix[2],
+        last_location_at=last_fix[0],
+    )
+
+    with transaction.atomic():
+        # Locked until the open dwells are saved, so a concurrent batch for
+        # the same schedules waits instead of overwriting them
+        schedules = list(Schedule.objects.select_for_update().filter(
+            collector=collector,
+            status='in_progress'
+        ).values_list('id', 'route_id', 'actual_start_time'))
+        if not schedules:
+            return summary
+        summary['visits_recorded'] = record_schedule_fixes(collector, schedules, fixes)
+
+    schedule_ids = [s[0] for s in schedules]
+    summary['schedules'] = [
+        {'id': str(schedule_id), 'customers_collected': customers_collected}
+        for schedule_id, customers_collected in Schedule.objects.filter(
+            id__in=schedule_ids
+        ).values_list('id', 'customers_collected')
+    ]
+    return summary
+
+
+def record_schedule_fixes(collector, schedules, fixes):
+    """Record the geofence events the fixes confirm. Returns how many were new."""
+    collected = defaultdict(set)
+    for schedule_id, customer_id in CollectionEvent.objects.filter(
+        schedule_id__in=[s[0] for s in schedules]
+    ).values_list('schedule_id', 'customer_id'):
+        collected[schedule_id].add(customer_id)
+
+    events = []
+    for schedule_id, route_id, started_at in schedules:
+        # Fixes from before the collection started cannot confirm it
+        window = [fix for fix in fixes if started_at is None or fix[0] >= started_at]
+        if not window:
+            continue
+        visited = match_schedule(schedule_id, route_id, window, collected[schedule_id])
+        events.extend(
+            CollectionEvent(
+                schedule_id=schedule_id,
+                customer_id=customer_id,
+                collector=collector,
+                method='geofence',
+                outcome='collected',
+                occurred_at=occurred_at,
+                distance_m=round(float(distance), 1),
+            )
+            for customer_id, (occurred_at, distance) in visited.items()
+        )
+
+    recorded, _ = record_collection_events(events)
+    return len(recorded)
@@ -0,0 +1,50 @@
+"""
+Management command to assign customers to service areas from coordinates.
+
+Matches each customer's billing address latitude/longitude against the
+service area boundaries and fills in Customer.service_area and route.
+Useful after bulk imports:
+
+    python manage.py assign_service_areas --company <company-id>
+"""
+
+from django.core.management.base import BaseCommand
+
+from customers.models import Customer
+from operations.spatial import assign_customers
+
+
+class Command(BaseCommand):
+    help = 'Assign customers to service areas and routes from their coordinates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            help='Only assign customers of this company (default: all companies)',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Replace existing service area and route assignments',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the outcome without saving anything',
+        )
+
+    def handle(self, *args, **options):
+        customers = Customer.objects.filter(deleted_at__isnull=True)
+        if options['company']:
+            customers = customers.filter(company_id=options['company'])
+
+        counts = assign_customers(customers, overwrite=options['overwrite'], save=not options['dry_run'])
+
+        summary = (
+            f"{counts['assigned']} assigned, {counts['unchanged']} unchanged, "
+            f"{counts['outside']} outside every area, {counts['unlocated']} without coordinates"
+        )
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: {summary}')
+            return
+        self.stdout.write(self.style.SUCCESS(f'✓ {summary}'))
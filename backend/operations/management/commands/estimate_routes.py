@@ -0,0 +1,47 @@
+"""
+Management command to refresh route distance and duration estimates.
+
+Recomputes Route.estimated_distance_km and estimated_duration_minutes from
+each route's ordered stops, path GeoJSON and the company's completed
+schedules. Intended to run periodically (e.g. nightly from cron):
+
+    python manage.py estimate_routes --company <company-id>
+"""
+
+from django.core.management.base import BaseCommand
+
+from operations.estimation import refresh_route_estimates
+from operations.models import Route
+
+
+class Command(BaseCommand):
+    help = 'Recompute estimated distance and duration for routes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            help='Only refresh routes of this company (default: all companies)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the estimates without saving them',
+        )
+
+    def handle(self, *args, **options):
+        routes = Route.objects.all()
+        if options['company']:
+            routes = routes.filter(service_area__company_id=options['company'])
+
+        results = refresh_route_estimates(routes, save=not options['dry_run'])
+
+        if options['dry_run']:
+            for row in results:
+                self.stdout.write(
+                    f"  {row['code']}: {row['stops']} stops, "
+                    f"{row['estimated_distance_km']} km, {row['estimated_duration_minutes']} min"
+                )
+            self.stdout.write(f'{len(results)} routes estimated (not saved)')
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Refreshed estimates for {len(results)} routes'))
@@ -0,0 +1,98 @@
+"""
+Management command to move overdue schedules to 'missed'.
+
+A schedule is overdue when it is still 'scheduled' after its scheduled date.
+Intended to run periodically (e.g. nightly from cron):
+
+    python manage.py sweep_overdue_schedules --grace-days 1
+
+Rows are claimed in batches along the (scheduled_date, status) index with
+SELECT ... FOR UPDATE SKIP LOCKED, so several sweepers can run at once
+without double-processing or blocking each other.
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import AuditLog
+from operations.models import Schedule
+
+
+class Command(BaseCommand):
+    help = 'Mark schedules still scheduled after their date as missed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=0,
+            help='Only sweep schedules older than this many days before today (default: 0)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of schedules updated per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many schedules would be swept without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now().date() - timedelta(days=options['grace_days'])
+        batch_size = options['batch_size']
+
+        overdue = Schedule.objects.filter(
+            scheduled_date__lt=cutoff,
+            status='scheduled'
+        ).order_by('scheduled_date')
+
+        if options['dry_run']:
+            self.stdout.write(f'{overdue.count()} overdue schedules before {cutoff} would be marked missed')
+            return
+
+        total = 0
+        while True:
+            swept = self.sweep_batch(overdue, batch_size)
+            if not swept:
+                break
+            total += swept
+            self.stdout.write(f'  marked {swept} schedules missed')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Swept {total} overdue schedules before {cutoff}'))
+
+    def sweep_batch(self, overdue, batch_size):
+        """Claim, update and audit one batch. Returns the number swept."""
+        now = timezone.now()
+
+        with transaction.atomic():
+            ids = list(
+                overdue.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return 0
+
+            # The claimed rows are locked, so they are still 'scheduled'
+            Schedule.objects.filter(id__in=ids).update(
+                status='missed',
+                customers_missed=F('customers_scheduled') - F('customers_collected'),
+                updated_at=now,
+            )
+
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    action='schedule_mark_missed',
+                    entity_type='schedule',
+                    entity_id=schedule_id,
+                    old_values={'status': 'scheduled'},
+                    new_values={'status': 'missed', 'reason': 'overdue_sweep'},
+                )
+                for schedule_id in ids
+            ])
+
+        return len(ids)
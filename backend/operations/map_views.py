@@ -0,0 +1,208 @@
+"""
+Map Views
+Viewport-filtered geometry for the operator map: customers, routes and
+service areas inside a bounding box, returned as a compact GeoJSON
+FeatureCollection.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db.models import Avg, Count, F
+from django.db.models.functions import Floor
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from customers.models import Customer
+from .models import Route, ServiceArea
+from .spatial import get_index
+
+
+LAYERS = ('customers', 'routes', 'service_areas')
+
+# Customers are clustered below this zoom level, or when too many are in view
+CLUSTER_MAX_ZOOM = 16
+MAX_POINTS = 2000
+
+# Approximate cluster size on screen, in pixels of a 256px web map tile
+CLUSTER_RADIUS_PX = 60
+
+COORDINATE_PRECISION = 6
+
+
+def parse_bbox(value):
+    """Parse 'min_lon,min_lat,max_lon,max_lat'. Raises ValueError."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat within valid ranges')
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def point_feature(lon, lat, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [round(lon, COORDINATE_PRECISION), round(lat, COORDINATE_PRECISION)],
+        },
+        'properties': properties,
+    }
+
+
+def cluster_size_degrees(zoom):
+    """Width of a clustering cell at a zoom level, in degrees of longitude."""
+    return CLUSTER_RADIUS_PX * 360 / (256 * 2 ** zoom)
+
+
+def customer_features(customers, zoom):
+    """Customer points, or grid clusters when zoomed out or too dense."""
+    if zoom >= CLUSTER_MAX_ZOOM:
+        rows = list(customers.values_list(
+            'id', 'first_name', 'last_name', 'status', 'route_id', 'longitude', 'latitude'
+        )[:MAX_POINTS + 1])
+        if len(rows) <= MAX_POINTS:
+            features = [
+                point_feature(lon, lat, {
+                    'layer': 'customers',
+                    'id': str(customer_id),
+                    'name': f'{first_name} {last_name}',
+                    'status': customer_status,
+                    'route': str(route_id) if route_id else None,
+                })
+                for customer_id, first_name, last_name, customer_status, route_id, lon, lat in rows
+            ]
+            return features, False
+
+    # Cells are aligned to a global grid so clusters stay put while panning
+    cell = cluster_size_degrees(zoom)
+    clusters = customers.annotate(
+        cell_x=Floor(F('longitude') / cell),
+        cell_y=Floor(F('latitude') / cell),
+    ).values('cell_x', 'cell_y').annotate(
+        count=Count('id'),
+        lon=Avg('longitude'),
+        lat=Avg('latitude'),
+    ).order_by()
+    features = [
+        point_feature(row['lon'], row['lat'], {
+            'layer': 'customers',
+            'cluster': True,
+            'count': row['count'],
+        })
+        for row in clusters
+    ]
+    return features, True
+
+
+class MapFeaturesView(APIView):
+    """
+    Geometry inside a map viewport.
+
+    Query params:
+    - bbox: min_lon,min_lat,max_lon,max_lat (required)
+    - zoom: map zoom level 0-22 (default 12)
+    - layers: comma-separated subset of customers,routes,service_areas (default all)
+    - company: company ID (defaults to the user's company)
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            bbox = parse_bbox(request.query_params.get('bbox'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            zoom = min(max(int(request.query_params.get('zoom', 12)), 0), 22)
+        except ValueError:
+            return Response(
+                {'error': 'zoom must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        layers = request.query_params.get('layers')
+        layers = [layer.strip() for layer in layers.split(',')] if layers else list(LAYERS)
+        unknown = set(layers) - set(LAYERS)
+        if unknown:
+            return Response(
+                {'error': f"Unknown layers: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        company_id = request.query_params.get('company') or request.user.company_id
+        if not company_id:
+            return Response(
+                {'error': 'company is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        min_lon, min_lat, max_lon, max_lat = bbox
+        features = []
+        clustered = False
+
+        try:
+            if 'service_areas' in layers or 'routes' in layers:
+                area_ids, route_ids = get_index().in_bbox(company_id, bbox)
+
+            if 'service_areas' in layers and area_ids:
+                areas = ServiceArea.objects.filter(id__in=area_ids).values('id', 'name', 'code', 'boundary_geojson')
+                for area in areas:
+                    geometry = area['boundary_geojson']
+                    if geometry.get('type') == 'Feature':
+                        geometry = geometry.get('geometry')
+                    features.append({
+                        'type': 'Feature',
+                        'geometry': geometry,
+                        'properties': {
+                            'layer': 'service_areas',
+                            'id': str(area['id']),
+                            'name': area['name'],
+                            'code': area['code'],
+                        },
+                    })
+
+            if 'routes' in layers and route_ids:
+                routes = Route.objects.filter(id__in=route_ids).values('id', 'name', 'code', 'path_geojson')
+                for route in routes:
+                    geometry = route['path_geojson']
+                    if geometry.get('type') == 'Feature':
+                        geometry = geometry.get('geometry')
+                    features.append({
+                        'type': 'Feature',
+                        'geometry': geometry,
+                        'properties': {
+                            'layer': 'routes',
+                            'id': str(route['id']),
+                            'name': route['name'],
+                            'code': route['code'],
+                        },
+                    })
+
+            if 'customers' in layers:
+                customers = Customer.objects.filter(
+                    company_id=company_id,
+                    deleted_at__isnull=True,
+                    latitude__gte=min_lat,
+                    latitude__lte=max_lat,
+                    longitude__gte=min_lon,
+                    longitude__lte=max_lon,
+                )
+                points, clustered = customer_features(customers, zoom)
+                features.extend(points)
+        except (ValueError, ValidationError):
+            return Response(
+                {'error': 'company must be a valid company ID'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'type': 'FeatureCollection',
+            'bbox': list(bbox),
+            'zoom': zoom,
+            'clustered': clustered,
+            'features': features,
+        })
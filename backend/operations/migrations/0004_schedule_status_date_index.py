@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0003_collector_company_servicearea_company'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['status', 'scheduled_date'], name='operations__status_8fd9ad_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0004_schedule_status_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='stop_sequence',
+            field=models.JSONField(blank=True, default=list, help_text='Customer IDs in visiting order'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:05
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_customer_coordinates'),
+        ('operations', '0005_route_stop_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collector',
+            name='last_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='collector',
+            name='last_location_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='collector',
+            name='last_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CollectionEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('method', models.CharField(choices=[('manual', 'Manual'), ('geofence', 'Geofence')], default='manual', max_length=20)),
+                ('outcome', models.CharField(choices=[('collected', 'Collected'), ('missed', 'Missed')], default='collected', max_length=20)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the collection happened')),
+                ('distance_m', models.FloatField(blank=True, help_text='Distance between the collector and the customer when matched by geofence', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('collector', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='collection_events', to='operations.collector')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collection_events', to='customers.customer')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collection_events', to='operations.schedule')),
+            ],
+            options={
+                'verbose_name': 'Collection Event',
+                'verbose_name_plural': 'Collection Events',
+                'ordering': ['-occurred_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='collectionevent',
+            constraint=models.UniqueConstraint(fields=('schedule', 'customer'), name='unique_collection_event_per_schedule'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_customer_coordinates'),
+        ('operations', '0006_collection_events'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='collectionevent',
+            name='collector',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='collection_events', to='operations.collector'),
+        ),
+        migrations.AlterField(
+            model_name='collectionevent',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='collection_events', to='customers.customer'),
+        ),
+        migrations.AlterField(
+            model_name='collectionevent',
+            name='method',
+            field=models.CharField(choices=[('manual', 'Manual'), ('nfc', 'NFC'), ('geofence', 'Geofence')], default='manual', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='collectionevent',
+            name='schedule',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='collection_events', to='operations.schedule'),
+        ),
+        migrations.AddIndex(
+            model_name='collectionevent',
+            index=models.Index(fields=['customer', 'occurred_at'], name='collection_event_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collectionevent',
+            index=models.Index(fields=['collector', 'occurred_at'], name='collection_event_collector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collectionevent',
+            index=models.Index(condition=models.Q(('outcome', 'missed')), fields=['occurred_at'], name='collection_event_missed_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0007_collection_event_ledger'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='schedule',
+            name='operations__status_8fd9ad_idx',
+        ),
+    ]
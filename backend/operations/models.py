@@ -9,6 +9,8 @@ from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 from django.utils import timezone
 
+from accounts.tracking import TrackChangesMixin
+
 User = get_user_model()
 
 
@@ -106,7 +108,17 @@ class ServiceArea(models.Model):
         return self.collectors.filter(status='active').count()
 
 
-class Route(models.Model):
+class RouteQuerySet(models.QuerySet):
+    
+    def with_customers_count(self):
+        """Annotate customers_count, so listing routes does not count per route."""
+        return self.annotate(active_customers_count=models.Count(
+            'customers',
+            filter=models.Q(customers__status='active', customers__deleted_at__isnull=True)
+        ))
+
+
+class Route(TrackChangesMixin, models.Model):
     """
     Collection Route - Specific path within a service area for waste collection.
     """
@@ -158,6 +170,13 @@ class Route(models.Model):
         help_text="GeoJSON LineString defining route path"
     )
     
+    # Optimized visiting order, maintained by operations.sequencing
+    stop_sequence = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Customer IDs in visiting order"
+    )
+    
     # Schedule
     frequency = models.CharField(
         max_length=20,
@@ -206,6 +225,8 @@ class Route(models.Model):
         related_name='created_routes'
     )
     
+    objects = RouteQuerySet.as_manager()
+    
     class Meta:
         ordering = ['service_area', 'sequence_number', 'name']
         unique_together = [['service_area', 'sequence_number']]
@@ -222,10 +243,10 @@ class Route(models.Model):
     
     @property
     def customers_count(self):
-        """Count of customers assigned to this route"""
-        # TODO: Add route field to Customer model to enable customer-route assignment
-        # For now, return 0 as customers are not yet linked to routes
-        return 0
+        """Count of active customers assigned to this route"""
+        if hasattr(self, 'active_customers_count'):
+            return self.active_customers_count
+        return self.customers.filter(status='active', deleted_at__isnull=True).count()
     
     @property
     def collection_schedule_display(self):
@@ -236,7 +257,7 @@ class Route(models.Model):
         return self.get_frequency_display()
 
 
-class Collector(models.Model):
+class Collector(TrackChangesMixin, models.Model):
     """
     Collector - Staff member who performs waste collection.
     """
@@ -254,6 +275,9 @@ class Collector(models.Model):
         ('temporary', 'Temporary'),
     ]
     
+    # Location fixes are not audited
+    AUDIT_EXCLUDE = ('last_latitude', 'last_longitude', 'last_location_at')
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     # Company relationship (multi-tenant support)
@@ -343,6 +367,11 @@ class Collector(models.Model):
         help_text="Total number of collections completed"
     )
     
+    # Last reported position from the collector app
+    last_latitude = models.FloatField(null=True, blank=True)
+    last_longitude = models.FloatField(null=True, blank=True)
+    last_location_at = models.DateTimeField(null=True, blank=True)
+    
     # Metadata
     notes = models.TextField(blank=True, help_text="Internal notes about the collector")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -383,7 +412,7 @@ class Collector(models.Model):
         return self.default_routes.filter(status='active').count()
 
 
-class Schedule(models.Model):
+class Schedule(TrackChangesMixin, models.Model):
     """
     Collection Schedule - Specific scheduled collection for a route.
     """
@@ -395,6 +424,14 @@ class Schedule(models.Model):
         ('missed', 'Missed'),
     ]
     
+    # Status transitions: action -> (allowed source statuses, target status)
+    TRANSITIONS = {
+        'start': (('scheduled',), 'in_progress'),
+        'complete': (('in_progress',), 'completed'),
+        'cancel': (('scheduled', 'in_progress'), 'cancelled'),
+        'mark_missed': (('scheduled', 'in_progress'), 'missed'),
+    }
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     route = models.ForeignKey(
         Route,
@@ -518,3 +555,82 @@ class Schedule(models.Model):
             self.status == 'scheduled' and
             self.scheduled_date < timezone.now().date()
         )
+
+
+class CollectionEvent(models.Model):
+    """
+    Collection Event - A single customer's collection on a schedule.
+    
+    Append-only: schedule counters and customer prepaid balances are derived
+    from these rows when they are recorded (see operations.collection_events),
+    so events are never edited afterwards.
+    """
+    METHOD_CHOICES = [
+        ('manual', 'Manual'),
+        ('nfc', 'NFC'),
+        ('geofence', 'Geofence'),
+    ]
+    
+    OUTCOME_CHOICES = [
+        ('collected', 'Collected'),
+        ('missed', 'Missed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    schedule = models.ForeignKey(
+        Schedule,
+        on_delete=models.CASCADE,
+        related_name='collection_events',
+        db_index=False
+    )
+    customer = models.ForeignKey(
+        'customers.Customer',
+        on_delete=models.CASCADE,
+        related_name='collection_events',
+        db_index=False
+    )
+    collector = models.ForeignKey(
+        Collector,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='collection_events',
+        db_index=False
+    )
+    
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, default='manual')
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, default='collected')
+    occurred_at = models.DateTimeField(default=timezone.now, help_text="When the collection happened")
+    distance_m = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Distance between the collector and the customer when matched by geofence"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-occurred_at']
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'customer'], name='unique_collection_event_per_schedule'),
+        ]
+        # The foreign keys are covered by these, so they get no indexes of their own
+        indexes = [
+            models.Index(fields=['customer', 'occurred_at'], name='collection_event_customer_idx'),
+            models.Index(fields=['collector', 'occurred_at'], name='collection_event_collector_idx'),
+            models.Index(
+                fields=['occurred_at'],
+                condition=models.Q(outcome='missed'),
+                name='collection_event_missed_idx'
+            ),
+        ]
+        verbose_name = 'Collection Event'
+        verbose_name_plural = 'Collection Events'
+    
+    def __str__(self):
+        return f"{self.customer_id} - {self.outcome} ({self.method})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Collection events are append-only and cannot be changed.')
+        super().save(*args, **kwargs)
@@ -0,0 +1,115 @@
+"""
+Collector Reassignment
+Moves a collector's routes and future schedules to one or more replacements.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Route, Schedule
+
+
+def reassignable_schedules(collector, from_date):
+    """Future schedules of a collector that can still be handed over."""
+    return Schedule.objects.filter(
+        collector=collector,
+        scheduled_date__gte=from_date,
+        status='scheduled'
+    )
+
+
+def plan_reassignment(collector, replacements, from_date, include_routes=True):
+    """
+    Build a route -> replacement plan without writing anything.
+
+    Routes are kept whole so each replacement takes over complete routes.
+    Largest routes (by future schedules) go first to whichever replacement
+    currently has the fewest upcoming schedules. Uses three queries.
+    """
+    route_loads = dict(
+        reassignable_schedules(collector, from_date).order_by().values(
+            'route_id'
+        ).annotate(n=Count('id')).values_list('route_id', 'n')
+    )
+
+    routes = Route.objects.filter(
+        Q(id__in=list(route_loads)) |
+        (Q(default_collector=collector) if include_routes else Q(pk__in=[]))
+    ).values('id', 'name', 'code', 'default_collector_id')
+    routes = {r['id']: r for r in routes}
+
+    replacement_loads = dict(
+        Schedule.objects.filter(
+            collector__in=replacements,
+            scheduled_date__gte=from_date,
+            status='scheduled'
+        ).order_by().values('collector_id').annotate(n=Count('id')).values_list('collector_id', 'n')
+    )
+    loads = {r.id: replacement_loads.get(r.id, 0) for r in replacements}
+
+    assignments = {}
+    for route_id in sorted(routes, key=lambda rid: (-route_loads.get(rid, 0), routes[rid]['code'])):
+        target = min(loads, key=lambda cid: (loads[cid], str(cid)))
+        assignments[route_id] = target
+        loads[target] += route_loads.get(route_id, 0)
+
+    return {
+        'routes': routes,
+        'route_loads': route_loads,
+        'assignments': assignments,
+        'include_routes': include_routes,
+    }
+
+
+def apply_reassignment(collector, plan, from_date):
+    """
+    Apply a plan with one UPDATE per replacement for routes and for schedules.
+    Returns (routes_moved, schedules_moved).
+    """
+    by_target = {}
+    for route_id, target in plan['assignments'].items():
+        by_target.setdefault(target, []).append(route_id)
+
+    routes_moved = 0
+    schedules_moved = 0
+    with transaction.atomic():
+        for target, route_ids in by_target.items():
+            if plan['include_routes']:
+                routes_moved += Route.objects.filter(
+                    id__in=route_ids,
+                    default_collector=collector
+                ).update(default_collector_id=target)
+            schedules_moved += reassignable_schedules(collector, from_date).filter(
+                route_id__in=route_ids
+            ).update(collector_id=target)
+
+    return routes_moved, schedules_moved
+
+
+def summarize_plan(collector, plan, replacements):
+    """Response-ready preview of a reassignment plan."""
+    names = {r.id: r.full_name for r in replacements}
+    summary = {
+        str(r.id): {'collector_name': r.full_name, 'routes': 0, 'schedules': 0}
+        for r in replacements
+    }
+    route_data = []
+    for route_id, target in plan['assignments'].items():
+        route = plan['routes'][route_id]
+        schedules = plan['route_loads'].get(route_id, 0)
+        moves_route = plan['include_routes'] and route['default_collector_id'] == collector.id
+        summary[str(target)]['routes'] += 1 if moves_route else 0
+        summary[str(target)]['schedules'] += schedules
+        route_data.append({
+            'route_id': str(route_id),
+            'route_name': route['name'],
+            'route_code': route['code'],
+            'moves_default_collector': moves_route,
+            'schedules': schedules,
+            'to_collector': str(target),
+            'to_collector_name': names[target],
+        })
+    return {
+        'routes': route_data,
+        'replacements': summary,
+    }
@@ -0,0 +1,315 @@
+"""
+Route Stop Sequencing
+Computes a near-optimal visiting order for the customers on a route.
+
+The tour starts at the service area's coordinates (when known) and ends at
+whichever stop is last. It is built with nearest-neighbour, then improved
+with 2-opt and Or-opt moves evaluated in bulk on a NumPy haversine distance
+matrix. The resulting order is stored on Route.stop_sequence as a list of
+customer IDs and maintained incrementally as customers join or leave.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from customers.models import Customer
+from .models import Route
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Improvements smaller than this (km) are treated as noise
+IMPROVEMENT_EPSILON = 1e-9
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to many, in kilometers."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat) / 2) ** 2 +
+        np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(lats, lons):
+    """Pairwise great-circle distances between points, in kilometers."""
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+    dlat = lats[:, None] - lats[None, :]
+    dlon = lons[:, None] - lons[None, :]
+    a = (
+        np.sin(dlat / 2) ** 2 +
+        np.cos(lats)[:, None] * np.cos(lats)[None, :] * np.sin(dlon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def customer_coordinates(billing_address):
+    """Extract (lat, lon) floats from a customer's billing address, or None."""
+    if not billing_address:
+        return None
+    try:
+        lat = float(billing_address.get('latitude'))
+        lon = float(billing_address.get('longitude'))
+    except (TypeError, ValueError):
+        return None
+    return lat, lon
+
+
+def route_origin(route):
+    """Starting point of a route: its service area's coordinates, if set."""
+    area = route.service_area
+    if area and area.latitude is not None and area.longitude is not None:
+        return float(area.latitude), float(area.longitude)
+    return None
+
+
+def path_length(dist, tour):
+    """Total length of a tour given as matrix indices."""
+    tour = np.asarray(tour)
+    return float(dist[tour[:-1], tour[1:]].sum())
+
+
+def nearest_neighbour(dist, start):
+    """Greedy tour from `start` visiting every other node once."""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    tour = [start]
+    current = start
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[current])
+        current = int(row.argmin())
+        visited[current] = True
+        tour.append(current)
+    return tour
+
+
+def two_opt(dist, tour):
+    """
+    Improve a tour in place by reversing segments. The first and last
+    positions are fixed; each pass scans every segment start and applies the
+    best reversal found for it.
+    """
+    m = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, m - 2):
+            t = np.asarray(tour)
+            a, b = t[i - 1], t[i]
+            c, e = t[i + 1:m - 1], t[i + 2:m]
+            gain = dist[a, b] + dist[c, e] - dist[a, c] - dist[b, e]
+            k = int(gain.argmax())
+            if gain[k] > IMPROVEMENT_EPSILON:
+                j = i + 1 + k
+                tour[i:j + 1] = tour[i:j + 1][::-1]
+                improved = True
+    return tour
+
+
+def or_opt(dist, tour, max_segment=3):
+    """
+    Improve a tour in place by moving short segments (optionally reversed)
+    between two other stops. The first and last positions are fixed.
+    """
+    m = len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length < m:
+                t = np.asarray(tour)
+                p, s0, s1, q = t[i - 1], t[i], t[i + length - 1], t[i + length]
+                removal_gain = dist[p, s0] + dist[s1, q] - dist[p, q]
+
+                # Candidate edges (t[k], t[k+1]) that do not touch the segment
+                ks = np.concatenate([np.arange(0, i - 1), np.arange(i + length, m - 1)])
+                if len(ks) == 0:
+                    i += 1
+                    continue
+                left, right = t[ks], t[ks + 1]
+                base = dist[left, right]
+                forward = dist[left, s0] + dist[s1, right] - base
+                backward = dist[left, s1] + dist[s0, right] - base
+                best_forward, best_backward = forward.argmin(), backward.argmin()
+                reverse = backward[best_backward] < forward[best_forward]
+                best = best_backward if reverse else best_forward
+                cost = (backward if reverse else forward)[best]
+
+                if removal_gain - cost > IMPROVEMENT_EPSILON:
+                    segment = tour[i:i + length]
+                    if reverse:
+                        segment = segment[::-1]
+                    k = int(ks[best])
+                    rest = tour[:i] + tour[i + length:]
+                    insert_at = k + 1 if k < i else k + 1 - length
+                    tour[:] = rest[:insert_at] + segment + rest[insert_at:]
+                    improved = True
+                else:
+                    i += 1
+    return tour
+
+
+def solve_open_path(lats, lons, origin=None):
+    """
+    Order points into a short open path.
+
+    If `origin` is given the path starts there; otherwise it may start at
+    any point. Returns (order, length_km) where order indexes into lats/lons.
+    """
+    n = len(lats)
+    if n == 0:
+        return [], 0.0
+    if n == 1:
+        start_km = float(haversine_km(origin[0], origin[1], lats[0], lons[0])) if origin else 0.0
+        return [0], start_km
+
+    # Node layout: [points..., origin?, end]. The end node is 0 km from
+    # everything so the path can finish at any stop; without an origin it
+    # also serves as a free start.
+    points_lat = list(lats) + ([origin[0]] if origin else [])
+    points_lon = list(lons) + ([origin[1]] if origin else [])
+    size = len(points_lat) + 1
+    dist = np.zeros((size, size))
+    dist[:-1, :-1] = haversine_matrix(points_lat, points_lon)
+    end = size - 1
+
+    if origin:
+        tour = nearest_neighbour(dist[:-1, :-1], n)
+    else:
+        # Free start: begin from the point farthest from the centroid
+        spread = haversine_km(np.mean(lats), np.mean(lons), np.asarray(lats), np.asarray(lons))
+        tour = [end] + nearest_neighbour(dist[:n, :n], int(spread.argmax()))
+    tour.append(end)
+
+    two_opt(dist, tour)
+    or_opt(dist, tour)
+    two_opt(dist, tour)
+
+    length = path_length(dist, tour)
+    order = [node for node in tour if node < n]
+    return order, length
+
+
+def optimize_route_sequence(route, save=True):
+    """
+    Recompute and store the full stop order for a route's active customers.
+    Customers without coordinates are appended after the optimized stops.
+    Returns (sequence, length_km).
+    """
+    customers = list(
+        Customer.objects.filter(route=route, status='active', deleted_at__isnull=True)
+        .order_by('last_name', 'first_name')
+        .values_list('id', 'billing_address')
+    )
+    located, unlocated = [], []
+    for customer_id, address in customers:
+        coords = customer_coordinates(address)
+        (located if coords else unlocated).append((customer_id, coords))
+
+    order, length = solve_open_path(
+        [coords[0] for _, coords in located],
+        [coords[1] for _, coords in located],
+        origin=route_origin(route),
+    )
+    sequence = [str(located[i][0]) for i in order] + [str(cid) for cid, _ in unlocated]
+
+    if save:
+        Route.objects.filter(id=route.id).update(stop_sequence=sequence)
+        route.stop_sequence = sequence
+    return sequence, length
+
+
+def insert_stop(route_id, customer_id, coords):
+    """
+    Add a customer to a route's stored sequence at the cheapest position.
+    Only the new stop's distances to the existing stops are computed.
+    """
+    with transaction.atomic():
+        route = Route.objects.select_for_update().select_related('service_area').get(id=route_id)
+        sequence = [cid for cid in route.stop_sequence if cid != str(customer_id)]
+        position = len(sequence)
+
+        if coords and sequence:
+            known = dict(
+                (str(cid), customer_coordinates(address))
+                for cid, address in Customer.objects.filter(id__in=sequence).values_list('id', 'billing_address')
+            )
+            located = [i for i, cid in enumerate(sequence) if known.get(cid)]
+            if located:
+                points = [known[sequence[i]] for i in located]
+                origin = route_origin(route)
+                if origin:
+                    points = [origin] + points
+                lats = np.array([p[0] for p in points])
+                lons = np.array([p[1] for p in points])
+                to_new = haversine_km(coords[0], coords[1], lats, lons)
+                between = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]) if len(points) > 1 else np.array([])
+                # Insert after point j (between j and j+1), or after the last point
+                costs = np.append(to_new[:-1] + to_new[1:] - between, to_new[-1])
+                if not origin:
+                    costs = np.insert(costs, 0, to_new[0])
+                # costs[0] places the stop first; costs[b] places it after located[b - 1]
+                best = int(costs.argmin())
+                position = 0 if best == 0 else located[best - 1] + 1
+
+        sequence.insert(position, str(customer_id))
+        Route.objects.filter(id=route.id).update(stop_sequence=sequence)
+    return sequence
+
+
+def remove_stop(route_id, customer_id):
+    """Remove a customer from a route's stored sequence."""
+    with transaction.atomic():
+        route = Route.objects.select_for_update().filter(id=route_id).first()
+        if route is None:
+            return []
+        sequence = [cid for cid in route.stop_sequence if cid != str(customer_id)]
+        if len(sequence) != len(route.stop_sequence):
+            Route.objects.filter(id=route.id).update(stop_sequence=sequence)
+    return sequence
+
+
+def move_stops(moves):
+    """
+    Apply route changes made in bulk to the stored sequences. `moves` are
+    (customer_id, old_route_id, new_route_id) tuples, with None for no
+    route. Customers leave their old route's sequence and are appended to
+    the new one's, with one locked update per route; optimize_route_sequence
+    reorders a route. Returns the IDs of the routes changed.
+    """
+    removed = defaultdict(set)
+    added = defaultdict(list)
+    for customer_id, old_route_id, new_route_id in moves:
+        if old_route_id:
+            removed[old_route_id].add(str(customer_id))
+        if new_route_id:
+            added[new_route_id].append(str(customer_id))
+
+    changed = set()
+    with transaction.atomic():
+        routes = Route.objects.select_for_update().filter(id__in=set(removed) | set(added))
+        for route_id, sequence in routes.values_list('id', 'stop_sequence'):
+            moved = removed[route_id] | set(added[route_id])
+            new_sequence = [cid for cid in sequence if cid not in moved] + added[route_id]
+            if new_sequence != sequence:
+                Route.objects.filter(id=route_id).update(stop_sequence=new_sequence)
+                changed.add(route_id)
+    return changed
+
+
+def order_by_sequence(rows, sequence):
+    """
+    Sort customer rows (dicts with an 'id') by a stored stop sequence.
+    Customers missing from the sequence, e.g. assigned by a bulk update,
+    keep their relative order at the end.
+    """
+    positions = {cid: i for i, cid in enumerate(sequence or [])}
+    last = len(positions)
+    return sorted(rows, key=lambda row: positions.get(str(row['id']), last))
@@ -4,7 +4,7 @@ Handles serialization for service areas, routes, collectors, and schedules.
 """
 
 from rest_framework import serializers
-from .models import ServiceArea, Route, Collector, Schedule
+from .models import ServiceArea, Route, Collector, Schedule, CollectionEvent
 
 
 class ServiceAreaListSerializer(serializers.ModelSerializer):
@@ -260,6 +260,80 @@ class ScheduleCreateUpdateSerializer(serializers.ModelSerializer):
         return data
 
 
+class ScheduleBulkFilterSerializer(serializers.Serializer):
+    """Filter selecting schedules for a bulk transition"""
+    status = serializers.ChoiceField(choices=Schedule.STATUS_CHOICES, required=False)
+    route = serializers.UUIDField(required=False)
+    collector = serializers.UUIDField(required=False)
+    service_area = serializers.UUIDField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        if not data:
+            raise serializers.ValidationError('At least one filter field is required.')
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({'date_from': 'Must be on or before date_to.'})
+        return data
+
+
+class ScheduleBulkTransitionSerializer(serializers.Serializer):
+    """Payload for applying one status transition to many schedules"""
+    MAX_IDS = 1000
+    
+    action = serializers.ChoiceField(choices=list(Schedule.TRANSITIONS))
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=False,
+        max_length=MAX_IDS
+    )
+    filter = ScheduleBulkFilterSerializer(required=False)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate(self, data):
+        if bool(data.get('ids')) == bool(data.get('filter')):
+            raise serializers.ValidationError('Provide exactly one of "ids" or "filter".')
+        return data
+
+
+class CollectionEventSerializer(serializers.ModelSerializer):
+    """Read-only serializer for collection events"""
+    customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
+    collector_name = serializers.CharField(source='collector.full_name', read_only=True, default=None)
+    scheduled_date = serializers.DateField(source='schedule.scheduled_date', read_only=True)
+    
+    class Meta:
+        model = CollectionEvent
+        fields = [
+            'id', 'schedule', 'scheduled_date', 'customer', 'customer_name',
+            'collector', 'collector_name', 'method', 'outcome',
+            'occurred_at', 'distance_m', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class CollectionEventInputSerializer(serializers.Serializer):
+    """One collection reported by a collector, identified by customer ID or card number"""
+    customer_id = serializers.UUIDField(required=False)
+    card_number = serializers.CharField(required=False, max_length=8)
+    method = serializers.ChoiceField(choices=[('manual', 'Manual'), ('nfc', 'NFC')], default='manual')
+    outcome = serializers.ChoiceField(choices=CollectionEvent.OUTCOME_CHOICES, default='collected')
+    occurred_at = serializers.DateTimeField(required=False)
+    
+    def validate(self, data):
+        if bool(data.get('customer_id')) == bool(data.get('card_number')):
+            raise serializers.ValidationError('Provide exactly one of "customer_id" or "card_number".')
+        return data
+
+
+class CollectionEventBatchSerializer(serializers.Serializer):
+    """Batch of collections reported for one schedule"""
+    MAX_EVENTS = 500
+    
+    events = CollectionEventInputSerializer(many=True, allow_empty=False, max_length=MAX_EVENTS)
+
+
 class ServiceAreaStatsSerializer(serializers.Serializer):
     """Statistics for service areas"""
     total_areas = serializers.IntegerField()
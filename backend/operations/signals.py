@@ -0,0 +1,87 @@
+"""
+Operations Signals
+Keeps each route's stored stop sequence in step with its customers, places
+new customers in a service area from their coordinates and drops the
+spatial index when areas or routes change.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from customers.models import Customer
+from .geofence import invalidate_geofence
+from .models import Route, ServiceArea
+from .sequencing import customer_coordinates, insert_stop, remove_stop
+from .spatial import invalidate_index, locate
+
+
+def sequencing_key(customer):
+    """
+    (route_id, coordinates) for a customer that belongs in a stop sequence,
+    or None if it should not be visited. Deferred fields are not loaded.
+    """
+    fields = customer.__dict__
+    if 'route_id' not in fields or 'status' not in fields or 'deleted_at' not in fields:
+        return None
+    if not fields['route_id'] or fields['status'] != 'active' or fields['deleted_at'] is not None:
+        return None
+    return fields['route_id'], customer_coordinates(fields.get('billing_address'))
+
+
+@receiver(pre_save, sender=Customer)
+def locate_new_customer(sender, instance, raw=False, **kwargs):
+    """Fill in the service area and route of new customers with coordinates."""
+    if raw or not instance._state.adding or instance.service_area_id:
+        return
+    coords = customer_coordinates(instance.billing_address)
+    if coords:
+        area_id, route_id = locate(coords[0], coords[1], instance.company_id)
+        if area_id:
+            instance.service_area_id = area_id
+            if not instance.route_id:
+                instance.route_id = route_id
+
+
+@receiver(post_init, sender=Customer)
+def remember_sequencing_key(sender, instance, **kwargs):
+    instance._sequencing_key = sequencing_key(instance)
+
+
+@receiver(post_save, sender=Customer)
+def update_route_sequence(sender, instance, created, **kwargs):
+    old_key = None if created else getattr(instance, '_sequencing_key', None)
+    new_key = sequencing_key(instance)
+    instance._sequencing_key = new_key
+    if old_key == new_key:
+        return
+
+    customer_id = instance.id
+
+    def apply():
+        if old_key and (not new_key or old_key[0] != new_key[0]):
+            remove_stop(old_key[0], customer_id)
+        if new_key:
+            insert_stop(new_key[0], customer_id, new_key[1])
+        for key in (old_key, new_key):
+            if key:
+                invalidate_geofence(key[0])
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Customer)
+def remove_from_route_sequence(sender, instance, **kwargs):
+    key = getattr(instance, '_sequencing_key', None)
+    if key:
+        customer_id = instance.id
+        transaction.on_commit(lambda: remove_stop(key[0], customer_id))
+        transaction.on_commit(lambda: invalidate_geofence(key[0]))
+
+
+@receiver(post_save, sender=ServiceArea)
+@receiver(post_delete, sender=ServiceArea)
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def drop_spatial_index(sender, **kwargs):
+    invalidate_index()
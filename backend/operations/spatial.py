@@ -0,0 +1,371 @@
+"""
+Service Area Spatial Index
+Point-in-polygon lookup of service areas (and the nearest route within
+them) without PostGIS.
+
+Active service-area polygons from ServiceArea.boundary_geojson are loaded
+into a uniform grid: each cell lists the polygons whose bounding box
+touches it, so a lookup only tests a handful of candidates. Tests are
+vectorized with NumPy, which lets bulk assignment handle thousands of
+points per second.
+
+The index is cached per process. It is dropped immediately when a service
+area or route is saved in this process (see signals.py); other processes
+notice edits by re-checking a cheap fingerprint query at most every
+INDEX_CHECK_SECONDS.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max
+
+from customers.models import Customer
+from .geofence import invalidate_geofence
+from .models import Route, ServiceArea
+from .sequencing import customer_coordinates, move_stops
+
+
+INDEX_CHECK_SECONDS = 30
+
+# Grid cells are sized from the polygons but kept within these bounds (degrees)
+MIN_CELL_DEGREES = 0.002
+MAX_CELL_DEGREES = 0.5
+
+# Approximate length of one degree of latitude
+KM_PER_DEGREE = 111.32
+
+_lock = threading.Lock()
+_index = None
+_fingerprint = None
+_checked_at = 0.0
+
+
+def geojson_polygons(geojson):
+    """
+    Extract polygons (lists of [lon, lat] rings) from a GeoJSON Polygon,
+    MultiPolygon, Feature or FeatureCollection. Invalid input yields nothing.
+    """
+    if not isinstance(geojson, dict):
+        return []
+    kind = geojson.get('type')
+    try:
+        if kind == 'FeatureCollection':
+            return [p for feature in geojson.get('features') or [] for p in geojson_polygons(feature)]
+        if kind == 'Feature':
+            return geojson_polygons(geojson.get('geometry'))
+        if kind == 'Polygon':
+            polygons = [geojson['coordinates']]
+        elif kind == 'MultiPolygon':
+            polygons = geojson['coordinates']
+        else:
+            return []
+        result = []
+        for rings in polygons:
+            arrays = [np.asarray(ring, dtype=float)[:, :2] for ring in rings if len(ring) >= 3]
+            if arrays:
+                result.append(arrays)
+        return result
+    except (KeyError, TypeError, ValueError, IndexError):
+        return []
+
+
+def geojson_lines(geojson):
+    """Extract [lon, lat] point arrays from a GeoJSON LineString/MultiLineString."""
+    if not isinstance(geojson, dict):
+        return []
+    if geojson.get('type') == 'Feature':
+        geojson = geojson.get('geometry') or {}
+    try:
+        if geojson.get('type') == 'LineString':
+            lines = [geojson['coordinates']]
+        elif geojson.get('type') == 'MultiLineString':
+            lines = geojson['coordinates']
+        else:
+            return []
+        return [np.asarray(line, dtype=float)[:, :2] for line in lines if len(line) >= 2]
+    except (KeyError, TypeError, ValueError, IndexError, AttributeError):
+        return []
+
+
+def points_in_polygon(rings, xs, ys):
+    """
+    Even-odd test of many points against one polygon (outer ring plus holes).
+    Returns a boolean array.
+    """
+    inside = np.zeros(len(xs), dtype=bool)
+    px, py = xs[:, None], ys[:, None]
+    for ring in rings:
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at = (x2 - x1) * (py - y1) / (y2 - y1) + x1
+        inside ^= (crosses & (px < x_at)).sum(axis=1) % 2 == 1
+    return inside
+
+
+def distance_to_lines_km(lines, xs, ys):
+    """Distance from each point to the nearest segment of any line, in km."""
+    best = np.full(len(xs), np.inf)
+    scale = np.cos(np.radians(ys.mean())) if len(ys) else 1.0
+    px, py = (xs * scale)[:, None], ys[:, None]
+    for line in lines:
+        ax, ay = line[:-1, 0] * scale, line[:-1, 1]
+        bx, by = line[1:, 0] * scale, line[1:, 1]
+        dx, dy = bx - ax, by - ay
+        length = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(length > 0, ((px - ax) * dx + (py - ay) * dy) / length, 0.0)
+        t = np.clip(t, 0, 1)
+        distance = np.hypot(px - (ax + t * dx), py - (ay + t * dy)).min(axis=1)
+        best = np.minimum(best, distance)
+    return best * KM_PER_DEGREE
+
+
+class SpatialIndex:
+    """Grid index over service-area polygons and their routes' paths."""
+
+    def __init__(self, areas, routes):
+        # Each entry: (area_id, company_id, rings, (min_x, min_y, max_x, max_y), size)
+        self.polygons = []
+        for area_id, company_id, geojson in areas:
+            for rings in geojson_polygons(geojson):
+                outer = rings[0]
+                x, y = outer[:, 0], outer[:, 1]
+                size = abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+                bbox = (x.min(), y.min(), x.max(), y.max())
+                self.polygons.append((area_id, str(company_id), rings, bbox, size))
+
+        # Smallest polygons first, so nested areas win over the ones around them
+        self.polygons.sort(key=lambda p: (p[4], str(p[0])))
+
+        spans = [max(b[2] - b[0], b[3] - b[1]) for _, _, _, b, _ in self.polygons]
+        median = float(np.median(spans)) if spans else MAX_CELL_DEGREES
+        self.cell = min(max(median / 2, MIN_CELL_DEGREES), MAX_CELL_DEGREES)
+
+        self.grid = defaultdict(list)
+        for position, (_, _, _, bbox, _) in enumerate(self.polygons):
+            x0, y0 = self.cell_of(bbox[0], bbox[1])
+            x1, y1 = self.cell_of(bbox[2], bbox[3])
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self.grid[(cx, cy)].append(position)
+
+        # Routes per area: [(route_id, lines)]; lines is empty if no path is drawn
+        self.routes = defaultdict(list)
+        self.route_bounds = {}
+        for route_id, area_id, company_id, path in routes:
+            lines = geojson_lines(path)
+            self.routes[area_id].append((route_id, lines))
+            if lines:
+                points = np.concatenate(lines)
+                bbox = (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max())
+                self.route_bounds[route_id] = (str(company_id), bbox)
+
+    def in_bbox(self, company_id, bbox):
+        """
+        IDs of a company's areas and drawn routes whose bounding boxes
+        intersect bbox (min_lon, min_lat, max_lon, max_lat).
+        """
+        def intersects(other):
+            return other[0] <= bbox[2] and other[2] >= bbox[0] and other[1] <= bbox[3] and other[3] >= bbox[1]
+
+        company_id = str(company_id)
+        areas = {area_id for area_id, company, _, box, _ in self.polygons if company == company_id and intersects(box)}
+        routes = {route_id for route_id, (company, box) in self.route_bounds.items() if company == company_id and intersects(box)}
+        return areas, routes
+
+    def cell_of(self, x, y):
+        return int(np.floor(x / self.cell)), int(np.floor(y / self.cell))
+
+    def locate_many(self, lats, lons, company_ids=None):
+        """
+        Service area ID for each point (None when outside every polygon).
+        If company_ids is given, a point only matches areas of its company.
+        """
+        xs = np.asarray(lons, dtype=float)
+        ys = np.asarray(lats, dtype=float)
+        result = np.full(len(xs), None, dtype=object)
+        if not len(xs) or not self.polygons:
+            return result
+        companies = np.array([str(c) for c in company_ids], dtype=object) if company_ids is not None else None
+
+        cells_x = np.floor(xs / self.cell).astype(np.int64)
+        cells_y = np.floor(ys / self.cell).astype(np.int64)
+        keys, inverse = np.unique(np.stack([cells_x, cells_y], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+        for k, (cx, cy) in enumerate(keys):
+            candidates = self.grid.get((int(cx), int(cy)))
+            if not candidates:
+                continue
+            members = order[bounds[k]:bounds[k + 1]]
+            for position in candidates:
+                area_id, company_id, rings, bbox, _ = self.polygons[position]
+                open_ = members[result[members] == None]  # noqa: E711
+                if not len(open_):
+                    break
+                if companies is not None:
+                    open_ = open_[companies[open_] == company_id]
+                    if not len(open_):
+                        continue
+                px, py = xs[open_], ys[open_]
+                box = (px >= bbox[0]) & (px <= bbox[2]) & (py >= bbox[1]) & (py <= bbox[3])
+                if not box.any():
+                    continue
+                open_ = open_[box]
+                hits = points_in_polygon(rings, xs[open_], ys[open_])
+                result[open_[hits]] = area_id
+        return result
+
+    def routes_for(self, area_ids, lats, lons):
+        """
+        Route ID for each located point: the route in its area whose drawn
+        path is nearest, or the area's only route when none are drawn.
+        """
+        xs = np.asarray(lons, dtype=float)
+        ys = np.asarray(lats, dtype=float)
+        area_ids = np.asarray(area_ids, dtype=object)
+        result = np.full(len(xs), None, dtype=object)
+        for area_id in {a for a in area_ids if a is not None}:
+            routes = self.routes.get(area_id, [])
+            members = np.nonzero(area_ids == area_id)[0]
+            drawn = [(route_id, lines) for route_id, lines in routes if lines]
+            if drawn:
+                distances = np.stack([distance_to_lines_km(lines, xs[members], ys[members]) for _, lines in drawn])
+                result[members] = np.array([route_id for route_id, _ in drawn], dtype=object)[distances.argmin(axis=0)]
+            elif len(routes) == 1:
+                result[members] = routes[0][0]
+        return result
+
+
+def fingerprint():
+    """Cheap summary of the indexed tables that changes when they are edited."""
+    areas = ServiceArea.objects.aggregate(n=Count('id'), changed=Max('updated_at'))
+    routes = Route.objects.aggregate(n=Count('id'), changed=Max('updated_at'))
+    return (areas['n'], areas['changed'], routes['n'], routes['changed'])
+
+
+def build_index():
+    areas = ServiceArea.objects.filter(
+        status='active',
+        boundary_geojson__isnull=False
+    ).values_list('id', 'company_id', 'boundary_geojson')
+    routes = Route.objects.filter(
+        status='active',
+        service_area__status='active'
+    ).values_list('id', 'service_area_id', 'service_area__company_id', 'path_geojson')
+    return SpatialIndex(list(areas), list(routes))
+
+
+def get_index():
+    """The process-wide index, rebuilt when missing or stale."""
+    global _index, _fingerprint, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _index is not None and now - _checked_at < INDEX_CHECK_SECONDS:
+            return _index
+        current = fingerprint()
+        if _index is None or current != _fingerprint:
+            _index = build_index()
+            _fingerprint = current
+        _checked_at = now
+        return _index
+
+
+def invalidate_index():
+    """Drop the cached index so the next lookup rebuilds it."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def locate(latitude, longitude, company_id=None):
+    """(service_area_id, route_id) for a single point, either may be None."""
+    index = get_index()
+    areas = index.locate_many([latitude], [longitude], None if company_id is None else [company_id])
+    routes = index.routes_for(areas, [latitude], [longitude])
+    return areas[0], routes[0]
+
+
+def assign_customers(customers, overwrite=False, save=True, batch_size=2000):
+    """
+    Set service_area and route on customers from their billing address
+    coordinates, processing the queryset in batches.
+
+    Without `overwrite` only missing values are filled in. Routes are only
+    set for customers whose service area is the located one. Active
+    customers that change route are moved between the routes' stop
+    sequences, and the routes' geofences are rebuilt. Returns counts
+    by outcome: 'assigned', 'unchanged', 'outside' (no matching polygon) and
+    'unlocated' (no coordinates).
+    """
+    index = get_index()
+    counts = {'assigned': 0, 'unchanged': 0, 'outside': 0, 'unlocated': 0}
+
+    rows = customers.order_by().values_list(
+        'id', 'company_id', 'billing_address', 'service_area_id', 'route_id', 'status'
+    ).iterator(chunk_size=batch_size)
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            assign_batch(index, batch, overwrite, save, counts)
+            batch = []
+    if batch:
+        assign_batch(index, batch, overwrite, save, counts)
+    return counts
+
+
+def assign_batch(index, rows, overwrite, save, counts):
+    located = []
+    for row in rows:
+        coords = customer_coordinates(row[2])
+        if coords:
+            located.append((row, coords))
+        else:
+            counts['unlocated'] += 1
+    if not located:
+        return
+
+    lats = [coords[0] for _, coords in located]
+    lons = [coords[1] for _, coords in located]
+    areas = index.locate_many(lats, lons, [row[1] for row, _ in located])
+    routes = index.routes_for(areas, lats, lons)
+
+    changed = []
+    moves = []
+    for (row, _), area_id, route_id in zip(located, areas, routes):
+        customer_id, _, _, current_area, current_route, status = row
+        if area_id is None:
+            counts['outside'] += 1
+            continue
+
+        new_area = area_id if overwrite or current_area is None else current_area
+        new_route = current_route
+        if new_area == area_id and route_id is not None and (overwrite or current_route is None):
+            new_route = route_id
+
+        if (new_area, new_route) == (current_area, current_route):
+            counts['unchanged'] += 1
+        else:
+            counts['assigned'] += 1
+            changed.append(Customer(id=customer_id, service_area_id=new_area, route_id=new_route))
+            # Only active customers are in stop sequences (see signals.py)
+            if new_route != current_route and status == 'active':
+                moves.append((customer_id, current_route, new_route))
+
+    if save and changed:
+        Customer.objects.bulk_update(changed, ['service_area', 'route'], batch_size=500)
+        if moves:
+            move_stops(moves)
+            for route_id in {route for _, old, new in moves for route in (old, new) if route}:
+                transaction.on_commit(partial(invalidate_geofence, route_id))
@@ -1,3 +1,281 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.company_models import Company
+from accounts.models import User
+from customers.models import Customer
+from customers.balance import credit
+from .assignment import apply_assignments, plan_assignments
+from .collection_events import record_collection_events
+from .estimation import DEFAULT_MODEL, MIN_SAMPLES, fit_duration_model
+from .geofence import get_geofence, record_fixes
+from .models import CollectionEvent, Collector, Route, Schedule, ServiceArea
+from .serializers import ScheduleBulkTransitionSerializer
+from .spatial import assign_customers, invalidate_index
+
+
+class OperationsTestCase(TestCase):
+    """Shared fixtures: an authenticated client and one route."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ops@example.com', 'pw12345!', first_name='Ops', last_name='User')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.area = ServiceArea.objects.create(name='Kacyiru', code='KCY')
+        self.route = Route.objects.create(service_area=self.area, name='Route A', code='RA')
+
+
+class OverdueSchedulesTests(OperationsTestCase):
+
+    def test_overdue_returns_a_list_oldest_first(self):
+        today = timezone.now().date()
+        for days in (3, 5):
+            Schedule.objects.create(route=self.route, scheduled_date=today - timedelta(days=days))
+        Schedule.objects.create(route=self.route, scheduled_date=today + timedelta(days=1))
+
+        response = self.client.get('/api/v1/operations/schedules/overdue/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(
+            [row['scheduled_date'] for row in response.data],
+            [str(today - timedelta(days=5)), str(today - timedelta(days=3))]
+        )
+
+    def test_sweep_marks_overdue_schedules_missed(self):
+        today = timezone.now().date()
+        overdue = Schedule.objects.create(
+            route=self.route, scheduled_date=today - timedelta(days=2), customers_scheduled=10, customers_collected=4
+        )
+        upcoming = Schedule.objects.create(route=self.route, scheduled_date=today)
+
+        call_command('sweep_overdue_schedules', stdout=StringIO())
+
+        overdue.refresh_from_db()
+        upcoming.refresh_from_db()
+        self.assertEqual(overdue.status, 'missed')
+        self.assertEqual(overdue.customers_missed, 6)
+        self.assertEqual(upcoming.status, 'scheduled')
+
+
+class BulkTransitionTests(OperationsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.now().date()
+        for days in range(3):
+            Schedule.objects.create(route=self.route, scheduled_date=today + timedelta(days=days))
+
+    def cancel_route_schedules(self):
+        return self.client.post('/api/v1/operations/schedules/bulk_transition/', {
+            'action': 'cancel', 'filter': {'route': str(self.route.id)}, 'reason': 'Road closed'
+        }, format='json')
+
+    @mock.patch.object(ScheduleBulkTransitionSerializer, 'MAX_IDS', 2)
+    def test_filter_matching_more_than_the_cap_is_rejected(self):
+        response = self.cancel_route_schedules()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Schedule.objects.filter(status='cancelled').exists())
+
+    @mock.patch.object(ScheduleBulkTransitionSerializer, 'MAX_IDS', 3)
+    def test_filter_within_the_cap_is_applied(self):
+        response = self.cancel_route_schedules()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 3)
+
+
+class CollectionEventLedgerTests(OperationsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.schedule = Schedule.objects.create(route=self.route, scheduled_date=timezone.now().date())
+        self.customer = Customer.objects.create(
+            first_name='Aline', last_name='M', email='aline@example.com', route=self.route
+        )
+        credit(self.customer.id, 1, reference='pay-1')
+
+    def collected(self):
+        return CollectionEvent(schedule=self.schedule, customer=self.customer, outcome='collected')
+
+    def test_repeated_event_is_recorded_and_debited_once(self):
+        recorded, unpaid = record_collection_events([self.collected()])
+        again, _ = record_collection_events([self.collected(), self.collected()])
+
+        self.assertEqual((len(recorded), unpaid, again), (1, [], []))
+        self.schedule.refresh_from_db()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.schedule.customers_collected, 1)
+        self.assertEqual(self.customer.prepaid_balance, 0)
+
+    def test_collection_beyond_the_balance_is_reported_unpaid(self):
+        other = Schedule.objects.create(route=self.route, scheduled_date=timezone.now().date() + timedelta(days=1))
+        record_collection_events([self.collected()])
+
+        _, unpaid = record_collection_events([
+            CollectionEvent(schedule=other, customer=self.customer, outcome='collected')
+        ])
+
+        self.assertEqual(unpaid, [self.customer.id])
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.prepaid_balance, 0)
+
+
+class AutoAssignTests(OperationsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.collector = Collector.objects.create(
+            employee_id='C1', first_name='Jean', last_name='K', phone='0788000001', status='inactive'
+        )
+        self.collector.service_areas.add(self.area)
+        self.schedule = Schedule.objects.create(
+            route=self.route, collector=self.collector, scheduled_date=timezone.now().date() + timedelta(days=1)
+        )
+
+    def test_schedule_without_candidates_keeps_its_collector(self):
+        plan = plan_assignments(Schedule.objects.filter(pk=self.schedule.pk), keep_existing=False)
+
+        self.assertEqual(plan[0]['outcome'], 'unassigned')
+        self.assertEqual(apply_assignments(plan), 0)
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.collector, self.collector)
+
+    def test_unassign_clears_the_collector_when_asked(self):
+        plan = plan_assignments(Schedule.objects.filter(pk=self.schedule.pk), keep_existing=False)
+
+        self.assertEqual(apply_assignments(plan, unassign=True), 1)
+        self.schedule.refresh_from_db()
+        self.assertIsNone(self.schedule.collector)
+
+
+class RouteCustomersCountTests(OperationsTestCase):
+
+    def add_customer(self, route, **kwargs):
+        n = Customer.objects.count()
+        return Customer.objects.create(
+            first_name='Customer', last_name=str(n), email=f'customer{n}@example.com', route=route, **kwargs
+        )
+
+    def test_list_counts_customers_without_a_query_per_route(self):
+        self.add_customer(self.route)
+        self.add_customer(self.route)
+        self.add_customer(self.route, status='inactive')
+        with CaptureQueriesContext(connection) as one_route:
+            response = self.client.get('/api/v1/operations/routes/')
+        self.assertEqual(response.data['results'][0]['customers_count'], 2)
+
+        for number, code in enumerate(('RB', 'RC'), start=2):
+            self.add_customer(Route.objects.create(service_area=self.area, name=code, code=code, sequence_number=number))
+        with CaptureQueriesContext(connection) as three_routes:
+            self.client.get('/api/v1/operations/routes/')
+        self.assertEqual(len(three_routes), len(one_route))
+
+
+class GeofenceDwellTests(OperationsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.collector = Collector.objects.create(
+            employee_id='C1', first_name='Jean', last_name='K', phone='0788000001'
+        )
+        self.customer = Customer.objects.create(
+            first_name='Aline', last_name='M', email='aline@example.com', route=self.route,
+            billing_address={'latitude': -1.95, 'longitude': 30.06}
+        )
+        self.schedule = Schedule.objects.create(
+            route=self.route, collector=self.collector, scheduled_date=timezone.now().date(), status='in_progress'
+        )
+        self.start = timezone.now() - timedelta(minutes=5)
+
+    def fix(self, seconds, latitude=-1.95):
+        return {'latitude': latitude, 'longitude': 30.06, 'timestamp': (self.start + timedelta(seconds=seconds)).isoformat()}
+
+    def test_continuous_dwell_records_a_visit(self):
+        summary = record_fixes(self.collector, [self.fix(0), self.fix(10), self.fix(25)])
+
+        self.assertEqual(summary['visits_recorded'], 1)
+
+    def test_dwell_carries_over_between_batches(self):
+        record_fixes(self.collector, [self.fix(0), self.fix(10)])
+        summary = record_fixes(self.collector, [self.fix(25)])
+
+        self.assertEqual(summary['visits_recorded'], 1)
+
+    def test_leaving_the_fence_restarts_the_dwell(self):
+        # About 1 km north in the middle
+        summary = record_fixes(self.collector, [self.fix(0), self.fix(10, latitude=-1.94), self.fix(25)])
+
+        self.assertEqual(summary['visits_recorded'], 0)
+
+    def test_gap_between_fixes_restarts_the_dwell(self):
+        summary = record_fixes(self.collector, [self.fix(0), self.fix(120)])
+
+        self.assertEqual(summary['visits_recorded'], 0)
+
+
+class DurationModelTests(TestCase):
+
+    def test_fit_recovers_overhead_and_minutes_per_stop(self):
+        samples = [(stops, 12 + 2.5 * stops) for stops in range(20, 20 + MIN_SAMPLES)]
+
+        model = fit_duration_model(samples)
+
+        self.assertAlmostEqual(model['overhead_minutes'], 12)
+        self.assertAlmostEqual(model['minutes_per_stop'], 2.5)
+        self.assertEqual(model['minutes_per_km'], 0)
+
+    def test_too_few_samples_use_the_default_model(self):
+        model = fit_duration_model([(10, 40)])
+
+        self.assertEqual(model['minutes_per_km'], DEFAULT_MODEL['minutes_per_km'])
+        self.assertEqual(model['samples'], 1)
+
+
+class AssignCustomersTests(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name='Green Ltd', email='green@example.com')
+        area = ServiceArea.objects.create(
+            name='Kacyiru', code='KCY', company=company,
+            boundary_geojson={'type': 'Polygon', 'coordinates': [[
+                [30.0, -2.0], [30.1, -2.0], [30.1, -1.9], [30.0, -1.9], [30.0, -2.0]
+            ]]}
+        )
+        self.west, self.east = (
+            Route.objects.create(
+                service_area=area, name=code, code=code, sequence_number=number,
+                path_geojson={'type': 'LineString', 'coordinates': [[lon, -1.99], [lon, -1.91]]}
+            )
+            for number, (code, lon) in enumerate((('W', 30.01), ('E', 30.09)), start=1)
+        )
+        self.customer = Customer.objects.create(
+            first_name='Aline', last_name='M', email='aline@example.com', company=company,
+            service_area=area, route=self.west, billing_address={'latitude': -1.95, 'longitude': 30.085}
+        )
+        Route.objects.filter(id=self.west.id).update(stop_sequence=[str(self.customer.id)])
+        invalidate_index()
+
+    def test_moved_customers_follow_into_sequences_and_geofences(self):
+        self.assertEqual(get_geofence(self.east.id).customer_ids, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = assign_customers(Customer.objects.filter(pk=self.customer.pk), overwrite=True)
 
-# Create your tests here.
+        self.assertEqual(counts['assigned'], 1)
+        self.west.refresh_from_db()
+        self.east.refresh_from_db()
+        self.assertEqual(self.west.stop_sequence, [])
+        self.assertEqual(self.east.stop_sequence, [str(self.customer.id)])
+        self.assertEqual(get_geofence(self.east.id).customer_ids, [self.customer.id])
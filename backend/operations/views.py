@@ -8,11 +8,22 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q, Sum
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Q, Sum
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 
-from .models import ServiceArea, Route, Collector, Schedule
+from accounts.audit import get_client_ip
+from accounts.models import AuditLog
+from customers.models import Customer
+from .models import ServiceArea, Route, Collector, Schedule, CollectionEvent
+from .assignment import DEFAULT_DAILY_CAPACITY, plan_assignments, apply_assignments
+from .sequencing import optimize_route_sequence
+from .estimation import refresh_route_estimates
+from .spatial import assign_customers, locate
+from .reassignment import plan_reassignment, apply_reassignment, summarize_plan
+from .collection_events import close_schedule_events
 from .serializers import (
     ServiceAreaListSerializer,
     ServiceAreaDetailSerializer,
@@ -27,9 +38,105 @@ from .serializers import (
     ScheduleListSerializer,
     ScheduleDetailSerializer,
     ScheduleCreateUpdateSerializer,
+    ScheduleBulkTransitionSerializer,
+    CollectionEventSerializer,
 )
 
 
+BULK_UPDATE_BATCH_SIZE = 500
+
+# Most overdue schedules returned by ScheduleViewSet.overdue
+OVERDUE_LIMIT = 500
+
+
+def parse_date_window(request):
+    """
+    Parse optional ?from=&to= query params (YYYY-MM-DD) into dates.
+    Raises ValueError with a user-facing message on bad input.
+    """
+    def _parse(name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+    
+    start = _parse('from')
+    end = _parse('to')
+    if start and end and start > end:
+        raise ValueError('from must be on or before to')
+    return start, end
+
+
+def day_start(day):
+    """Timezone-aware start of a date, for index-friendly datetime ranges."""
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def performance_aggregates(prefix='', start=None, end=None):
+    """
+    Build conditional aggregate expressions for collector performance.
+    
+    `prefix` is the lookup path to Schedule ('' when aggregating a Schedule
+    queryset, 'schedules__' when annotating Collectors). The date window is
+    folded into every aggregate's filter so collectors with no schedules in
+    the window still appear with zeros.
+    """
+    window = Q()
+    if start:
+        window &= Q(**{f'{prefix}scheduled_date__gte': start})
+    if end:
+        window &= Q(**{f'{prefix}scheduled_date__lte': end})
+    
+    month_start = timezone.now().date().replace(day=1)
+    completed = window & Q(**{f'{prefix}status': 'completed'})
+    timed = completed & Q(**{
+        f'{prefix}actual_start_time__isnull': False,
+        f'{prefix}actual_end_time__isnull': False,
+    })
+    
+    return {
+        'total_schedules': Count(f'{prefix}id', filter=window),
+        'completed_schedules': Count(f'{prefix}id', filter=completed),
+        'missed_schedules': Count(f'{prefix}id', filter=window & Q(**{f'{prefix}status': 'missed'})),
+        'cancelled_schedules': Count(f'{prefix}id', filter=window & Q(**{f'{prefix}status': 'cancelled'})),
+        'collections_this_month': Count(
+            f'{prefix}id',
+            filter=completed & Q(**{f'{prefix}scheduled_date__gte': month_start})
+        ),
+        'avg_duration': Avg(
+            ExpressionWrapper(
+                F(f'{prefix}actual_end_time') - F(f'{prefix}actual_start_time'),
+                output_field=DurationField()
+            ),
+            filter=timed
+        ),
+        'customers_collected': Sum(f'{prefix}customers_collected', filter=window),
+        'customers_missed': Sum(f'{prefix}customers_missed', filter=window),
+    }
+
+
+def format_performance_row(row):
+    """Turn a performance aggregate row into response-ready statistics."""
+    total = row['total_schedules']
+    completed = row['completed_schedules']
+    avg_duration = row['avg_duration']
+    
+    return {
+        'total_schedules': total,
+        'completed_schedules': completed,
+        'missed_schedules': row['missed_schedules'],
+        'cancelled_schedules': row['cancelled_schedules'],
+        'completion_rate': round((completed / total) * 100, 2) if total else 0,
+        'collections_this_month': row['collections_this_month'],
+        'avg_duration_minutes': round(avg_duration.total_seconds() / 60, 2) if avg_duration else None,
+        'customers_collected': row['customers_collected'] or 0,
+        'customers_missed': row['customers_missed'] or 0,
+    }
+
+
 class ServiceAreaViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Service Area management.
@@ -38,6 +145,7 @@ class ServiceAreaViewSet(viewsets.ModelViewSet):
     - List with filtering, searching, ordering
     - Statistics endpoint
     - Activation/deactivation actions
+    - Point lookup and customer assignment from boundaries
     """
     queryset = ServiceArea.objects.all()
     permission_classes = [IsAuthenticated]
@@ -91,6 +199,79 @@ class ServiceAreaViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(service_area)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def locate(self, request):
+        """
+        Find the service area and route containing a point.
+        
+        Query params: lat, lon, company (optional)
+        """
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lon'])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {'error': 'lat and lon query parameters are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        area_id, route_id = locate(latitude, longitude, request.query_params.get('company'))
+        if area_id is None:
+            return Response(
+                {'error': 'No service area covers this point'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'service_area': str(area_id),
+            'route': str(route_id) if route_id else None,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def assign_customers(self, request):
+        """
+        Assign customers to service areas and routes from their coordinates.
+        
+        Body:
+        - company: company ID (defaults to the user's company)
+        - customer_ids: limit to these customers (optional, e.g. an import)
+        - overwrite: replace existing assignments (default false)
+        - dry_run: only count the outcomes (default false)
+        """
+        company_id = request.data.get('company') or request.user.company_id
+        if not company_id:
+            return Response(
+                {'error': 'company is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        overwrite = request.data.get('overwrite', False) in (True, 'true', 'True', '1', 1)
+        dry_run = request.data.get('dry_run', False) in (True, 'true', 'True', '1', 1)
+        
+        try:
+            customers = Customer.objects.filter(company_id=company_id, deleted_at__isnull=True)
+            customer_ids = request.data.get('customer_ids')
+            if customer_ids is not None:
+                if not isinstance(customer_ids, list):
+                    return Response(
+                        {'error': 'customer_ids must be a list'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                customers = customers.filter(id__in=customer_ids)
+            counts = assign_customers(customers, overwrite=overwrite, save=not dry_run)
+        except (ValueError, ValidationError):
+            return Response(
+                {'error': 'company and customer_ids must be valid IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'company': str(company_id),
+            'dry_run': dry_run,
+            'overwrite': overwrite,
+            **counts,
+        })
+    
     @action(detail=True, methods=['get'])
     def routes(self, request, pk=None):
         """Get all routes in this service area"""
@@ -125,6 +306,9 @@ class RouteViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'code', 'sequence_number', 'created_at']
     ordering = ['service_area', 'sequence_number']
     
+    def get_queryset(self):
+        return super().get_queryset().with_customers_count()
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return RouteListSerializer
@@ -159,6 +343,70 @@ class RouteViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    @action(detail=True, methods=['post'])
+    def optimize_stops(self, request, pk=None):
+        """
+        Recompute the visiting order of this route's active customers.
+        
+        The order is stored on the route and kept up to date incrementally
+        as customers join or leave; use this after bulk changes.
+        """
+        route = self.get_object()
+        sequence, length_km = optimize_route_sequence(route)
+        
+        customers = {
+            str(c['id']): c for c in Customer.objects.filter(id__in=sequence).values(
+                'id', 'first_name', 'last_name', 'billing_address'
+            )
+        }
+        stops = [{
+            'stop_number': stop_number,
+            'customer_id': customer_id,
+            'name': f"{customers[customer_id]['first_name']} {customers[customer_id]['last_name']}",
+            'latitude': (customers[customer_id]['billing_address'] or {}).get('latitude'),
+            'longitude': (customers[customer_id]['billing_address'] or {}).get('longitude'),
+        } for stop_number, customer_id in enumerate(sequence, start=1)]
+        
+        return Response({
+            'route': str(route.id),
+            'stops_count': len(stops),
+            'path_length_km': round(length_km, 3),
+            'stops': stops,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def refresh_estimates(self, request):
+        """
+        Recompute estimated distance and duration for all routes of a company.
+        
+        Body:
+        - company: company ID (defaults to the user's company)
+        - dry_run: return the estimates without saving them (default false)
+        """
+        company_id = request.data.get('company') or request.user.company_id
+        if not company_id:
+            return Response(
+                {'error': 'company is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = request.data.get('dry_run', False) in (True, 'true', 'True', '1', 1)
+        try:
+            routes = Route.objects.filter(service_area__company_id=company_id)
+            results = refresh_route_estimates(routes, save=not dry_run)
+        except (ValueError, ValidationError):
+            return Response(
+                {'error': 'company must be a valid company ID'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'company': str(company_id),
+            'dry_run': dry_run,
+            'routes_count': len(results),
+            'routes': results,
+        })
+    
     @action(detail=True, methods=['get'])
     def schedules(self, request, pk=None):
         """Get all schedules for this route"""
@@ -169,7 +417,12 @@ class RouteViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def generate_schedule(self, request, pk=None):
-        """Generate schedules for this route for a date range"""
+        """
+        Generate schedules for this route for a date range.
+        
+        Pass auto_assign=true to pick a valid collector for each new schedule
+        instead of inheriting the route's default collector.
+        """
         route = self.get_object()
         start_date = request.data.get('start_date')
         end_date = request.data.get('end_date')
@@ -186,6 +439,7 @@ class RouteViewSet(viewsets.ModelViewSet):
         end = datetime.strptime(end_date, '%Y-%m-%d').date()
         
         # Generate schedules based on collection_days
+        customers_scheduled = route.customers_count
         schedules_created = []
         current_date = start
         
@@ -201,13 +455,23 @@ class RouteViewSet(viewsets.ModelViewSet):
                         scheduled_date=current_date,
                         scheduled_time_start=route.collection_time_start,
                         scheduled_time_end=route.collection_time_end,
-                        customers_scheduled=route.customers_count,
+                        customers_scheduled=customers_scheduled,
                         created_by=request.user
                     )
                     schedules_created.append(schedule)
             
             current_date += timedelta(days=1)
         
+        # Optionally replace the inherited default collector with a valid one
+        if schedules_created and request.data.get('auto_assign') in (True, 'true', 'True', '1', 1):
+            created_ids = [schedule.id for schedule in schedules_created]
+            apply_assignments(plan_assignments(Schedule.objects.filter(id__in=created_ids)))
+            schedules_created = list(
+                Schedule.objects.filter(id__in=created_ids).select_related(
+                    'route', 'collector', 'route__service_area'
+                ).order_by('scheduled_date')
+            )
+        
         serializer = ScheduleListSerializer(schedules_created, many=True)
         return Response({
             'message': f'Created {len(schedules_created)} schedules',
@@ -276,6 +540,106 @@ class CollectorViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(collector)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'])
+    def reassign(self, request, pk=None):
+        """
+        Move this collector's routes and future schedules to replacements.
+        
+        Body:
+        - replacement_ids: list of collector IDs to take over the work (required)
+        - from_date: first schedule date to move (YYYY-MM-DD, default today)
+        - include_routes: also change Route.default_collector (default true)
+        - dry_run: return the plan without applying it (default false)
+        
+        Routes are moved whole and balanced across replacements by upcoming
+        schedules. Changes are applied with set-based updates in one transaction.
+        """
+        collector = self.get_object()
+        replacement_ids = request.data.get('replacement_ids') or []
+        include_routes = request.data.get('include_routes', True) not in (False, 'false', 'False', '0', 0)
+        dry_run = request.data.get('dry_run', False) in (True, 'true', 'True', '1', 1)
+        
+        if not isinstance(replacement_ids, list) or not replacement_ids:
+            return Response(
+                {'error': 'replacement_ids must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from_date = timezone.now().date()
+        if request.data.get('from_date'):
+            try:
+                from_date = datetime.strptime(request.data['from_date'], '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'from_date must be a date in YYYY-MM-DD format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        try:
+            replacements = list(Collector.objects.filter(id__in=replacement_ids))
+        except (ValueError, ValidationError):
+            return Response(
+                {'error': 'replacement_ids must contain valid collector IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(replacements) != len(set(map(str, replacement_ids))):
+            return Response(
+                {'error': 'One or more replacement collectors not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        for replacement in replacements:
+            if replacement.id == collector.id:
+                return Response(
+                    {'error': 'A collector cannot replace themselves'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not replacement.is_available:
+                return Response(
+                    {'error': f'{replacement.full_name} is not available ({replacement.status})'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if collector.company_id and replacement.company_id != collector.company_id:
+                return Response(
+                    {'error': f'{replacement.full_name} belongs to a different company'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        plan = plan_reassignment(collector, replacements, from_date, include_routes=include_routes)
+        preview = summarize_plan(collector, plan, replacements)
+        
+        if dry_run:
+            return Response({
+                'dry_run': True,
+                'from_date': from_date,
+                **preview,
+            })
+        
+        with transaction.atomic():
+            routes_moved, schedules_moved = apply_reassignment(collector, plan, from_date)
+            AuditLog.objects.create(
+                user=request.user,
+                action='reassign_collector',
+                entity_type='collector',
+                entity_id=collector.id,
+                old_values={'collector': str(collector.id)},
+                new_values={
+                    'from_date': from_date.isoformat(),
+                    'routes': {r['route_id']: r['to_collector'] for r in preview['routes']},
+                },
+                ip_address=get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            )
+        
+        return Response({
+            'dry_run': False,
+            'from_date': from_date,
+            'routes_moved': routes_moved,
+            'schedules_moved': schedules_moved,
+            **preview,
+        })
+    
     @action(detail=True, methods=['get'])
     def routes(self, request, pk=None):
         """Get all routes assigned to this collector"""
@@ -297,38 +661,86 @@ class CollectorViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def performance(self, request, pk=None):
-        """Get performance statistics for this collector"""
-        collector = self.get_object()
+        """
+        Get performance statistics for this collector.
         
-        # Calculate statistics
-        total_schedules = collector.schedules.count()
-        completed = collector.schedules.filter(status='completed').count()
-        missed = collector.schedules.filter(status='missed').count()
+        Accepts optional ?from=YYYY-MM-DD&to=YYYY-MM-DD to restrict the
+        schedules considered. All metrics come from a single aggregate query.
+        """
+        collector = self.get_object()
         
-        # Calculate collection rate
-        if total_schedules > 0:
-            completion_rate = (completed / total_schedules) * 100
-        else:
-            completion_rate = 0
+        try:
+            start, end = parse_date_window(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get this month's collections
-        month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        this_month = collector.schedules.filter(
-            scheduled_date__gte=month_start.date(),
-            status='completed'
-        ).count()
+        row = Schedule.objects.filter(collector=collector).aggregate(
+            **performance_aggregates(start=start, end=end)
+        )
         
         stats = {
             'total_collections': collector.total_collections,
-            'total_schedules': total_schedules,
-            'completed_schedules': completed,
-            'missed_schedules': missed,
-            'completion_rate': round(completion_rate, 2),
             'rating': float(collector.rating),
-            'collections_this_month': this_month,
+            'from': start,
+            'to': end,
         }
+        stats.update(format_performance_row(row))
         
         return Response(stats)
+    
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """
+        Get performance statistics for every collector in a company.
+        
+        Query params:
+        - company: company ID (defaults to the requesting user's company)
+        - from / to: optional date window (YYYY-MM-DD)
+        
+        Returns one row per collector, computed in a single grouped query
+        and ordered by completed schedules then completion rate.
+        """
+        try:
+            start, end = parse_date_window(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        company_id = request.query_params.get('company') or request.user.company_id
+        if not company_id:
+            return Response(
+                {'error': 'company is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = Collector.objects.filter(company_id=company_id).order_by().values(
+            'id', 'employee_id', 'first_name', 'last_name',
+            'status', 'rating', 'total_collections',
+        ).annotate(
+            **performance_aggregates(prefix='schedules__', start=start, end=end)
+        )
+        
+        results = []
+        for row in rows:
+            entry = {
+                'id': str(row['id']),
+                'employee_id': row['employee_id'],
+                'full_name': f"{row['first_name']} {row['last_name']}",
+                'status': row['status'],
+                'rating': float(row['rating']),
+                'total_collections': row['total_collections'],
+            }
+            entry.update(format_performance_row(row))
+            results.append(entry)
+        
+        results.sort(key=lambda r: (r['completed_schedules'], r['completion_rate']), reverse=True)
+        
+        return Response({
+            'company': str(company_id),
+            'from': start,
+            'to': end,
+            'count': len(results),
+            'results': results,
+        })
 
 
 class ScheduleViewSet(viewsets.ModelViewSet):
@@ -381,12 +793,17 @@ class ScheduleViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def overdue(self, request):
-        """Get overdue schedules"""
+        """
+        Get overdue schedules, oldest first (at most OVERDUE_LIMIT).
+        
+        The sweep_overdue_schedules command moves stale rows to 'missed', so
+        this is a short range scan on the (scheduled_date, status) index.
+        """
         today = timezone.now().date()
         schedules = self.queryset.filter(
             scheduled_date__lt=today,
             status='scheduled'
-        )
+        ).order_by('scheduled_date', 'scheduled_time_start')[:OVERDUE_LIMIT]
         serializer = ScheduleListSerializer(schedules, many=True)
         return Response(serializer.data)
     
@@ -407,14 +824,16 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         schedule.status = 'completed'
         schedule.actual_end_time = timezone.now()
         
-        # Update statistics if provided
-        customers_collected = request.data.get('customers_collected')
-        customers_missed = request.data.get('customers_missed')
-        
-        if customers_collected is not None:
-            schedule.customers_collected = customers_collected
-        if customers_missed is not None:
-            schedule.customers_missed = customers_missed
+        # Statistics come from collection events when there are any,
+        # otherwise from the provided data
+        if not close_schedule_events(schedule, schedule.collector):
+            customers_collected = request.data.get('customers_collected')
+            customers_missed = request.data.get('customers_missed')
+            
+            if customers_collected is not None:
+                schedule.customers_collected = customers_collected
+            if customers_missed is not None:
+                schedule.customers_missed = customers_missed
         
         schedule.save()
         
@@ -444,3 +863,307 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         schedule.save()
         serializer = self.get_serializer(schedule)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_transition(self, request):
+        """
+        Apply one status transition to many schedules at once.
+        
+        Body:
+        - action: start | complete | cancel | mark_missed
+        - ids: list of schedule IDs, or
+        - filter: {status, route, collector, service_area, date_from, date_to}
+        - reason: cancellation reason (cancel only)
+        
+        At most MAX_IDS schedules can be transitioned at once; a filter that
+        matches more is rejected with 400 and nothing is changed.
+        
+        Eligible rows are moved with set-based UPDATE ... WHERE status IN (...)
+        statements and audit entries are written with one bulk insert.
+        Returns an outcome per schedule: updated, invalid_transition or not_found.
+        """
+        serializer = ScheduleBulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        transition = data['action']
+        allowed_from, target = Schedule.TRANSITIONS[transition]
+        now = timezone.now()
+        
+        if data.get('ids'):
+            candidates = Schedule.objects.filter(id__in=data['ids'])
+        else:
+            candidates = self.filter_bulk_candidates(data['filter'])
+        
+        updates = {'status': target, 'updated_at': now}
+        if transition == 'start':
+            updates['actual_start_time'] = now
+        elif transition == 'complete':
+            updates['actual_end_time'] = now
+        elif transition == 'cancel':
+            updates['cancellation_reason'] = data['reason']
+        
+        limit = ScheduleBulkTransitionSerializer.MAX_IDS
+        with transaction.atomic():
+            # Lock the candidate rows so reported outcomes match what was written
+            rows = list(
+                candidates.select_for_update(of=('self',)).order_by().values_list(
+                    'id', 'status', 'collector_id', 'customers_collected'
+                )[:limit + 1]
+            )
+            if len(rows) > limit:
+                return Response(
+                    {'error': f'filter matches more than {limit} schedules; narrow it down'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            eligible = [row for row in rows if row[1] in allowed_from]
+            eligible_ids = [row[0] for row in eligible]
+            
+            updated = 0
+            for i in range(0, len(eligible_ids), BULK_UPDATE_BATCH_SIZE):
+                updated += Schedule.objects.filter(
+                    id__in=eligible_ids[i:i + BULK_UPDATE_BATCH_SIZE],
+                    status__in=allowed_from
+                ).update(**updates)
+            
+            if transition == 'complete':
+                # Mirror the single-schedule action: credit collected customers to collectors
+                totals = {}
+                for _, _, collector_id, collected in eligible:
+                    if collector_id:
+                        totals[collector_id] = totals.get(collector_id, 0) + collected
+                for collector_id, collected in totals.items():
+                    Collector.objects.filter(id=collector_id).update(
+                        total_collections=F('total_collections') + collected
+                    )
+            
+            ip_address = get_client_ip(request)
+            user_agent = request.META.get('HTTP_USER_AGENT', '')
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    user=request.user,
+                    action=f'schedule_{transition}',
+                    entity_type='schedule',
+                    entity_id=schedule_id,
+                    old_values={'status': old_status},
+                    new_values={'status': target},
+                    ip_address=ip_address,
+                    user_agent=user_agent,
+                )
+                for schedule_id, old_status, _, _ in eligible
+            ], batch_size=BULK_UPDATE_BATCH_SIZE)
+        
+        results = [{
+            'id': str(schedule_id),
+            'outcome': 'updated' if old_status in allowed_from else 'invalid_transition',
+            'previous_status': old_status,
+        } for schedule_id, old_status, _, _ in rows]
+        
+        if data.get('ids'):
+            found = {row[0] for row in rows}
+            results.extend({
+                'id': str(schedule_id),
+                'outcome': 'not_found',
+                'previous_status': None,
+            } for schedule_id in dict.fromkeys(data['ids']) if schedule_id not in found)
+        
+        return Response({
+            'action': transition,
+            'status': target,
+            'requested': len(results),
+            'updated': updated,
+            'results': results,
+        })
+    
+    def filter_bulk_candidates(self, filters):
+        """Build the schedule queryset selected by a bulk transition filter"""
+        schedules = Schedule.objects.all()
+        if 'status' in filters:
+            schedules = schedules.filter(status=filters['status'])
+        if 'route' in filters:
+            schedules = schedules.filter(route_id=filters['route'])
+        if 'collector' in filters:
+            schedules = schedules.filter(collector_id=filters['collector'])
+        if 'service_area' in filters:
+            schedules = schedules.filter(route__service_area_id=filters['service_area'])
+        if 'date_from' in filters:
+            schedules = schedules.filter(scheduled_date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            schedules = schedules.filter(scheduled_date__lte=filters['date_to'])
+        return schedules
+    
+    @action(detail=False, methods=['post'])
+    def auto_assign(self, request):
+        """
+        Assign collectors to scheduled collections in a date range.
+        
+        Body:
+        - date_from / date_to: range to assign (YYYY-MM-DD, default the next 7 days)
+        - company: company ID (defaults to the requesting user's company)
+        - service_area: optional service area ID to restrict the run
+        - daily_capacity: max schedules per collector per day (default 4)
+        - keep_existing: keep current collectors that are still valid (default true)
+        - unassign: clear the collector of schedules no collector can take
+          (default false: they keep their current collector)
+        - dry_run: return the plan without applying it (default false)
+        
+        Only active collectors who cover the route's service area and have no
+        overlapping booking that day are considered.
+        """
+        today = timezone.now().date()
+        try:
+            date_from = datetime.strptime(request.data.get('date_from') or today.isoformat(), '%Y-%m-%d').date()
+            date_to = datetime.strptime(
+                request.data.get('date_to') or (date_from + timedelta(days=6)).isoformat(), '%Y-%m-%d'
+            ).date()
+            daily_capacity = int(request.data.get('daily_capacity', DEFAULT_DAILY_CAPACITY))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'date_from/date_to must be YYYY-MM-DD and daily_capacity an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if date_from > date_to or (date_to - date_from).days > 31:
+            return Response(
+                {'error': 'date_from must be on or before date_to and the range at most 31 days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if daily_capacity < 1:
+            return Response(
+                {'error': 'daily_capacity must be at least 1'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        company_id = request.data.get('company') or request.user.company_id
+        if not company_id:
+            return Response(
+                {'error': 'company is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        schedules = Schedule.objects.filter(
+            route__service_area__company_id=company_id,
+            scheduled_date__gte=date_from,
+            scheduled_date__lte=date_to,
+        )
+        if request.data.get('service_area'):
+            schedules = schedules.filter(route__service_area_id=request.data['service_area'])
+        
+        keep_existing = request.data.get('keep_existing', True) not in (False, 'false', 'False', '0', 0)
+        unassign = request.data.get('unassign', False) in (True, 'true', 'True', '1', 1)
+        dry_run = request.data.get('dry_run', False) in (True, 'true', 'True', '1', 1)
+        
+        try:
+            plan = plan_assignments(schedules, daily_capacity=daily_capacity, keep_existing=keep_existing)
+        except (ValueError, ValidationError):
+            return Response(
+                {'error': 'company and service_area must be valid IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        changed = 0 if dry_run else apply_assignments(plan, unassign=unassign)
+        
+        outcomes = {'kept': 0, 'assigned': 0, 'unassigned': 0}
+        for entry in plan:
+            outcomes[entry['outcome']] += 1
+        
+        return Response({
+            'dry_run': dry_run,
+            'date_from': date_from,
+            'date_to': date_to,
+            'daily_capacity': daily_capacity,
+            'summary': outcomes,
+            'changed': changed,
+            'results': [{
+                'id': str(entry['id']),
+                'scheduled_date': entry['scheduled_date'],
+                'previous_collector': str(entry['previous_collector']) if entry['previous_collector'] else None,
+                'collector': str(entry['collector']) if entry['collector'] else None,
+                'outcome': entry['outcome'],
+            } for entry in plan],
+        })
+
+
+class CollectionEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for the collection event ledger (read-only).
+    
+    Provides:
+    - List with filtering by customer, schedule, collector, method, outcome
+      and an optional ?from=&to= date window on occurred_at
+    - Missed-collection report per customer
+    """
+    queryset = CollectionEvent.objects.select_related('customer', 'collector', 'schedule').all()
+    serializer_class = CollectionEventSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['customer', 'schedule', 'collector', 'method', 'outcome']
+    ordering_fields = ['occurred_at']
+    ordering = ['-occurred_at']
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.company_id:
+            queryset = queryset.filter(customer__company_id=self.request.user.company_id)
+        return queryset
+    
+    def list(self, request, *args, **kwargs):
+        try:
+            start, end = parse_date_window(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        if start:
+            queryset = queryset.filter(occurred_at__gte=day_start(start))
+        if end:
+            queryset = queryset.filter(occurred_at__lt=day_start(end + timedelta(days=1)))
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def missed_report(self, request):
+        """
+        Customers with missed collections in a window (default: last 30 days),
+        most missed first. Served by the partial index on missed events.
+        """
+        try:
+            start, end = parse_date_window(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        end = end or timezone.now().date()
+        start = start or end - timedelta(days=30)
+        
+        rows = self.get_queryset().filter(
+            outcome='missed',
+            occurred_at__gte=day_start(start),
+            occurred_at__lt=day_start(end + timedelta(days=1))
+        ).order_by().values(
+            'customer_id', 'customer__first_name', 'customer__last_name', 'customer__card_number'
+        ).annotate(
+            missed=Count('id'),
+            last_missed_at=Max('occurred_at')
+        ).order_by('-missed', '-last_missed_at')
+        
+        page = self.paginate_queryset(rows)
+        data = [{
+            'customer': str(row['customer_id']),
+            'customer_name': f"{row['customer__first_name']} {row['customer__last_name']}",
+            'card_number': row['customer__card_number'],
+            'missed': row['missed'],
+            'last_missed_at': row['last_missed_at'],
+        } for row in (page if page is not None else rows)]
+        
+        if page is not None:
+            response = self.get_paginated_response(data)
+            response.data['from'] = start
+            response.data['to'] = end
+            return response
+        return Response({'from': start, 'to': end, 'results': data})
+
@@ -1,3 +1,34 @@
+"""
+Payments Admin Configuration
+"""
+
 from django.contrib import admin
+from .models import PaymentTransaction, PaymentCallback
+
+
+@admin.register(PaymentTransaction)
+class PaymentTransactionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'customer', 'provider', 'msisdn', 'collections', 'amount', 'status', 'attempts', 'created_at']
+    list_filter = ['provider', 'status', 'created_at']
+    search_fields = ['id', 'msisdn', 'provider_reference', 'customer__first_name', 'customer__last_name']
+    raw_id_fields = ['company', 'customer', 'requested_by']
+    readonly_fields = ['id', 'status', 'provider_reference', 'attempts', 'next_attempt_at', 'last_error',
+                       'submitted_at', 'completed_at', 'created_at', 'updated_at']
+    date_hierarchy = 'created_at'
+    
+    def has_change_permission(self, request, obj=None):
+        # Status only changes through payments.processing
+        return False
+
 
-# Register your models here.
+@admin.register(PaymentCallback)
+class PaymentCallbackAdmin(admin.ModelAdmin):
+    list_display = ['provider', 'provider_transaction_id', 'payment_id', 'status', 'result', 'received_at', 'processed_at']
+    list_filter = ['provider', 'status', 'result', 'received_at']
+    search_fields = ['provider_transaction_id', 'payment_id']
+    readonly_fields = ['id', 'received_at']
+    date_hierarchy = 'received_at'
+    
+    def has_change_permission(self, request, obj=None):
+        # Callbacks are stored as received; use replay_callbacks to reprocess
+        return False
@@ -0,0 +1,127 @@
+"""
+Payment Callback Ingestion
+Stores provider callbacks on arrival and applies them in batches.
+
+The callback endpoint only parses enough of the payload to deduplicate it
+and inserts it with ON CONFLICT DO NOTHING against the unique
+(provider, provider transaction ID, status) constraint, so duplicate and
+retried callbacks cost one INSERT and never raise or block.
+
+The payment worker then claims unprocessed callbacks with SKIP LOCKED and
+applies each batch in one transaction: payments are locked once, in ID
+order, the strongest status reported for each payment is applied through
+the transaction state machine, and all top-up credits go to the ledger in
+a single credit_many() call, so each customer row is locked at most once
+per batch however many callbacks mention it.
+"""
+
+import uuid
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from customers.balance import credit_many
+from .gateways import get_gateway
+from .models import PaymentCallback, PaymentTransaction
+
+
+# When one batch has several callbacks for a payment, the strongest wins
+STATUS_PRECEDENCE = {'failed': 1, 'successful': 2}
+
+
+def ingest_callback(provider, payload):
+    """
+    Store a callback payload for later processing. Duplicates are dropped
+    by the database. Raises ValueError for payloads that cannot be parsed.
+    """
+    payment_id, result = get_gateway(provider).parse_callback(payload)
+    PaymentCallback.objects.bulk_create([
+        PaymentCallback(
+            provider=provider,
+            provider_transaction_id=result.provider_reference or payment_id,
+            payment_id=payment_id,
+            status=result.status,
+            payload=payload,
+        )
+    ], ignore_conflicts=True)
+
+
+def process_callbacks(batch_size=500):
+    """
+    Apply one batch of unprocessed callbacks to their transactions.
+    Returns a Counter of callback results.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        callbacks = list(
+            PaymentCallback.objects.select_for_update(skip_locked=True).filter(
+                processed_at__isnull=True
+            ).order_by('id')[:batch_size]
+        )
+        if not callbacks:
+            return Counter()
+
+        results = {}
+        chosen = {}
+        for callback in callbacks:
+            try:
+                payment_id, result = get_gateway(callback.provider).parse_callback(callback.payload)
+            except ValueError:
+                results[callback.id] = 'invalid'
+                continue
+            payment_id = uuid.UUID(payment_id)
+            current = chosen.get(payment_id)
+            if current and STATUS_PRECEDENCE[result.status] <= STATUS_PRECEDENCE[current[1].status]:
+                results[callback.id] = 'ignored'
+                continue
+            if current:
+                results[current[0].id] = 'ignored'
+            chosen[payment_id] = (callback, result)
+
+        payments = PaymentTransaction.objects.select_for_update().filter(
+            id__in=list(chosen)
+        ).order_by('id').in_bulk()
+
+        changed = []
+        credits = []
+        for payment_id, (callback, result) in chosen.items():
+            payment = payments.get(payment_id)
+            if payment is None or payment.provider != callback.provider:
+                results[callback.id] = 'unknown_transaction'
+                continue
+            if result.status not in PaymentTransaction.TRANSITIONS[payment.status]:
+                # Already settled by the worker or an earlier callback
+                results[callback.id] = 'ignored'
+                continue
+
+            payment.status = result.status
+            payment.provider_reference = result.provider_reference or payment.provider_reference
+            payment.last_error = result.message
+            payment.next_attempt_at = None
+            payment.completed_at = now
+            payment.updated_at = now
+            changed.append(payment)
+            results[callback.id] = 'applied'
+            if result.status == 'successful':
+                credits.append((
+                    payment.customer_id,
+                    payment.collections,
+                    str(payment.id),
+                    f'{payment.get_provider_display()} {payment.provider_reference}'.strip(),
+                ))
+
+        PaymentTransaction.objects.bulk_update(
+            changed,
+            ['status', 'provider_reference', 'last_error', 'next_attempt_at', 'completed_at', 'updated_at'],
+            batch_size=500
+        )
+        credit_many(credits, kind='top_up')
+
+        by_result = defaultdict(list)
+        for callback_id, result in results.items():
+            by_result[result].append(callback_id)
+        for result, callback_ids in by_result.items():
+            PaymentCallback.objects.filter(id__in=callback_ids).update(processed_at=now, result=result)
+
+    return Counter({result: len(callback_ids) for result, callback_ids in by_result.items()})
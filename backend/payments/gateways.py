@@ -0,0 +1,192 @@
+"""
+Mobile Money Gateways
+Provider adapters used by the payment worker.
+
+A gateway turns a PaymentTransaction into a request-to-pay and reports the
+provider's view of its status. Gateways are configured per provider in
+settings.PAYMENT_GATEWAYS:
+
+    PAYMENT_GATEWAYS = {
+        'mtn': {
+            'BACKEND': 'payments.gateways.SimulatedGateway',
+            'OPTIONS': {'latency': 0.2},
+            'CALLBACK_TOKEN': '...',
+        },
+    }
+
+A provider without a BACKEND has no gateway: get_gateway() raises
+ImproperlyConfigured, unless settings.PAYMENT_GATEWAY_SIMULATOR (on by
+default in DEBUG) makes it fall back to SimulatedGateway.
+
+Gateway methods are called from worker threads and must not touch the
+database.
+"""
+
+import hashlib
+import hmac
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class GatewayError(Exception):
+    """A gateway call failed. Retryable errors are tried again later."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class GatewayResult:
+    """Provider answer for a transaction: a PaymentTransaction status plus details."""
+
+    def __init__(self, status, provider_reference='', message=''):
+        self.status = status
+        self.provider_reference = provider_reference
+        self.message = message
+
+    def __repr__(self):
+        return f'GatewayResult({self.status!r}, {self.provider_reference!r})'
+
+
+class MobileMoneyGateway:
+    """Base class for provider adapters."""
+
+    def __init__(self, provider, callback_token='', **options):
+        self.provider = provider
+        self.callback_token = callback_token
+
+    def request_to_pay(self, transaction):
+        """
+        Ask the provider to charge transaction.msisdn. Returns a GatewayResult,
+        usually 'submitted' while the customer approves on their phone.
+        """
+        raise NotImplementedError
+
+    def get_status(self, transaction):
+        """Poll the provider for a submitted transaction. Returns a GatewayResult."""
+        raise NotImplementedError
+
+    def verify_callback(self, request):
+        """Check a callback request came from the provider."""
+        if not self.callback_token:
+            return False
+        supplied = request.headers.get('X-Callback-Token', '')
+        return hmac.compare_digest(supplied, self.callback_token)
+
+    def parse_callback(self, data):
+        """
+        Read a callback payload. Returns (transaction ID, GatewayResult);
+        raises ValueError for payloads that cannot be understood.
+        """
+        try:
+            reference = str(uuid.UUID(str(data['reference'])))
+            outcome = str(data['status']).lower()
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Callback must include a valid reference and status')
+        statuses = {'successful': 'successful', 'success': 'successful', 'failed': 'failed', 'rejected': 'failed'}
+        if outcome not in statuses:
+            raise ValueError(f'Unknown callback status: {outcome}')
+        return reference, GatewayResult(
+            statuses[outcome],
+            provider_reference=str(data.get('provider_transaction_id') or ''),
+            message=str(data.get('reason') or ''),
+        )
+
+
+class SimulatedGateway(MobileMoneyGateway):
+    """
+    Local stand-in for a mobile money provider, for development and load
+    tests. Each call sleeps for `latency` seconds; a share of calls fail
+    transiently, and a share of payments are declined by the "customer".
+    Outcomes are derived from the transaction ID, so retries and polls of
+    the same transaction always agree.
+    """
+
+    def __init__(self, provider, callback_token='', latency=0.2, error_rate=0.02,
+                 decline_rate=0.05, approval_seconds=0, seed=None, **options):
+        super().__init__(provider, callback_token, **options)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.approval_seconds = approval_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _roll(self, transaction, salt):
+        digest = hashlib.sha256(f'{transaction.id}:{salt}'.encode()).digest()
+        return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+    def _call(self):
+        time.sleep(self.latency)
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            raise GatewayError(f'{self.provider} simulator: service temporarily unavailable')
+
+    def _outcome(self, transaction, reference):
+        if self._roll(transaction, 'decline') < self.decline_rate:
+            return GatewayResult('failed', reference, 'Payer declined the request')
+        return GatewayResult('successful', reference)
+
+    def request_to_pay(self, transaction):
+        self._call()
+        reference = f'SIM-{self.provider.upper()}-{transaction.id.hex[:12]}'
+        if not self.approval_seconds:
+            # The payer approves instantly
+            return self._outcome(transaction, reference)
+        return GatewayResult('submitted', provider_reference=reference)
+
+    def get_status(self, transaction):
+        self._call()
+        submitted_at = transaction.submitted_at
+        if submitted_at and (timezone.now() - submitted_at).total_seconds() < self.approval_seconds:
+            return GatewayResult('submitted', transaction.provider_reference)
+        return self._outcome(transaction, transaction.provider_reference)
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+SIMULATOR_BACKEND = 'payments.gateways.SimulatedGateway'
+
+
+def get_gateway(provider):
+    """
+    The configured gateway for a provider. Raises ImproperlyConfigured if
+    it has none and the simulator is not enabled.
+    """
+    with _gateways_lock:
+        if provider not in _gateways:
+            config = getattr(settings, 'PAYMENT_GATEWAYS', {}).get(provider, {})
+            backend = config.get('BACKEND')
+            if not backend:
+                if not getattr(settings, 'PAYMENT_GATEWAY_SIMULATOR', False):
+                    raise ImproperlyConfigured(f'No payment gateway is configured for {provider}')
+                backend = SIMULATOR_BACKEND
+            backend = import_string(backend)
+            _gateways[provider] = backend(
+                provider,
+                callback_token=config.get('CALLBACK_TOKEN', ''),
+                **config.get('OPTIONS', {})
+            )
+        return _gateways[provider]
+
+
+def reset_gateways():
+    """Drop configured gateway instances (after changing settings)."""
+    with _gateways_lock:
+        _gateways.clear()
+
+
+def set_gateway(provider, gateway):
+    """Use a specific gateway instance for a provider (simulations and benchmarks)."""
+    with _gateways_lock:
+        _gateways[provider] = gateway
@@ -0,0 +1,173 @@
+"""
+Management command to load-test the top-up pipeline against the simulator.
+
+Queues --count top-ups for a company's customers the way the portal does,
+then drains them with the payment worker against a SimulatedGateway with
+the given latency, and reports request-side latency and sustained worker
+throughput:
+
+    python manage.py benchmark_payments --count 2000 --latency 0.3 --concurrency 64
+
+With --via-callbacks the simulated payers approve slowly, so requests stay
+'submitted' and are settled by provider callbacks instead, delivered
+shuffled and with duplicates, to measure callback ingestion and batch
+application.
+
+Everything is rolled back afterwards unless --keep is given.
+"""
+
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min, Sum
+
+from customers.models import BalanceEntry, Customer
+from payments.callbacks import ingest_callback, process_callbacks
+from payments.gateways import SimulatedGateway, reset_gateways, set_gateway
+from payments.models import PaymentTransaction
+from payments.processing import OPEN_STATUSES, create_top_up, process_due
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark mobile money top-up throughput with the simulated gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help='Company whose customers are charged (default: first with customers)')
+        parser.add_argument('--count', type=int, default=1000, help='Top-ups to queue (default: 1000)')
+        parser.add_argument('--latency', type=float, default=0.2, help='Simulated gateway latency in seconds (default: 0.2)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of gateway calls that fail transiently (default: 0)')
+        parser.add_argument('--decline-rate', type=float, default=0.05, help='Share of payments declined (default: 0.05)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Worker batch size (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=64, help='Gateway calls in flight (default: 64)')
+        parser.add_argument('--via-callbacks', action='store_true', help='Settle payments through provider callbacks')
+        parser.add_argument('--duplicate-rate', type=float, default=0.3, help='Share of callbacks delivered twice (default: 0.3)')
+        parser.add_argument('--keep', action='store_true', help='Keep the transactions and balance credits')
+
+    def handle(self, *args, **options):
+        customers = Customer.objects.select_related('company').filter(
+            company__isnull=False,
+            deleted_at__isnull=True
+        ).exclude(phone='')
+        if options['company']:
+            customers = customers.filter(company_id=options['company'])
+        customers = list(customers[:500])
+        if not customers:
+            raise CommandError('No customers with a phone number to charge')
+
+        for provider in ('mtn', 'airtel'):
+            set_gateway(provider, SimulatedGateway(
+                provider,
+                latency=options['latency'],
+                error_rate=options['error_rate'],
+                decline_rate=options['decline_rate'],
+                approval_seconds=3600 if options['via_callbacks'] else 0,
+                seed=0,
+            ))
+
+        try:
+            with transaction.atomic():
+                self.run(customers, options)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write('Rolled back benchmark data')
+        finally:
+            reset_gateways()
+
+    def run(self, customers, options):
+        count = options['count']
+
+        # Request side: what a portal top-up costs the web thread
+        timings = []
+        ids = []
+        for i in range(count):
+            started = time.perf_counter()
+            payment = create_top_up(customers[i % len(customers)], 1 + i % 5, ('mtn', 'airtel')[i % 2])
+            timings.append(time.perf_counter() - started)
+            ids.append(payment.id)
+        timings.sort()
+        self.stdout.write(
+            f'Queued {count} top-ups: p50 {timings[len(timings) // 2] * 1000:.2f} ms, '
+            f'p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms per request'
+        )
+
+        # Worker side: drain the queue, including retries
+        payments = PaymentTransaction.objects.filter(id__in=ids)
+        outcomes = Counter()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            while True:
+                batch = process_due(options['batch_size'], executor)
+                outcomes.update(batch)
+                if batch:
+                    continue
+                next_due = payments.filter(status='pending').aggregate(at=Min('next_attempt_at'))['at']
+                if next_due is None and not options['via_callbacks']:
+                    next_due = payments.filter(status='submitted').aggregate(at=Min('next_attempt_at'))['at']
+                if next_due is None:
+                    break
+                time.sleep(0.2)
+        elapsed = time.perf_counter() - started
+
+        if options['via_callbacks']:
+            self.stdout.write(f'Worker: {count} requests-to-pay submitted in {elapsed:.2f}s ({count / elapsed:.0f}/s)')
+            self.settle_by_callbacks(payments, options)
+        else:
+            self.stdout.write(f'Worker: {count} top-ups settled in {elapsed:.2f}s ({count / elapsed:.0f}/s)')
+
+        statuses = Counter(payments.values_list('status', flat=True))
+        credited = BalanceEntry.objects.filter(kind='top_up', reference__in=[str(i) for i in ids]).aggregate(
+            total=Sum('amount')
+        )['total'] or 0
+        expected = payments.filter(status='successful').aggregate(total=Sum('collections'))['total'] or 0
+
+        self.stdout.write('  statuses: ' + ', '.join(f'{n} {s}' for s, n in sorted(statuses.items())))
+        self.stdout.write('  gateway outcomes: ' + ', '.join(f'{n} {o}' for o, n in sorted(outcomes.items())))
+        if credited != expected:
+            raise CommandError(f'Credited {credited} collections but {expected} were paid for')
+        self.stdout.write(self.style.SUCCESS(f'✓ {credited} collections credited, matching successful payments'))
+
+    def settle_by_callbacks(self, payments, options):
+        """Deliver shuffled, duplicated callbacks for submitted payments and apply them."""
+        callbacks = []
+        for payment in payments.filter(status='submitted'):
+            declined = SimulatedGateway(payment.provider, decline_rate=options['decline_rate'])._roll(payment, 'decline')
+            payload = {
+                'reference': str(payment.id),
+                'status': 'FAILED' if declined < options['decline_rate'] else 'SUCCESSFUL',
+                'provider_transaction_id': payment.provider_reference,
+            }
+            callbacks.append((payment.provider, payload))
+            if random.random() < options['duplicate_rate']:
+                callbacks.append((payment.provider, dict(payload)))
+        random.shuffle(callbacks)
+
+        started = time.perf_counter()
+        for provider, payload in callbacks:
+            ingest_callback(provider, payload)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Callbacks: {len(callbacks)} ingested in {elapsed:.2f}s '
+            f'({len(callbacks) / elapsed * 60:.0f}/min, {elapsed / len(callbacks) * 1000:.2f} ms each)'
+        )
+
+        results = Counter()
+        started = time.perf_counter()
+        while True:
+            batch = process_callbacks()
+            if not batch:
+                break
+            results.update(batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  applied in {elapsed:.2f}s ({sum(results.values()) / elapsed * 60:.0f}/min): '
+            + ', '.join(f'{n} {result}' for result, n in sorted(results.items()))
+        )
@@ -0,0 +1,79 @@
+"""
+Management command that runs the mobile money payment worker.
+
+Applies stored provider callbacks in batches, then claims due payment
+transactions, submits requests-to-pay and polls providers from a thread
+pool, and applies the results. Run one or more workers alongside the web
+processes:
+
+    python manage.py process_payments --concurrency 16
+
+Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED and lease them
+while the gateways are called, so several can run at once.
+"""
+
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from payments.callbacks import process_callbacks
+from payments.processing import process_due
+
+
+class Command(BaseCommand):
+    help = 'Process pending and submitted mobile money payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Transactions claimed per batch (default: 100)',
+        )
+        parser.add_argument(
+            '--callback-batch-size',
+            type=int,
+            default=500,
+            help='Callbacks applied per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Gateway calls in flight at once (default: 16)',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when nothing is due (default: 1)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process what is due now and exit',
+        )
+
+    def handle(self, *args, **options):
+        totals = Counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            try:
+                while True:
+                    outcomes = Counter({
+                        f'callbacks {result}': n
+                        for result, n in process_callbacks(options['callback_batch_size']).items()
+                    })
+                    outcomes.update(process_due(options['batch_size'], executor))
+                    if outcomes:
+                        totals.update(outcomes)
+                        self.stdout.write('  ' + ', '.join(f'{n} {outcome}' for outcome, n in sorted(outcomes.items())))
+                        continue
+                    if options['once']:
+                        break
+                    time.sleep(options['idle_sleep'])
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Processed {sum(totals.values())} payment updates'))
@@ -0,0 +1,75 @@
+"""
+Management command to reprocess stored payment callbacks.
+
+Marks the selected callbacks unprocessed again and applies them, e.g.
+after fixing a bug in a gateway adapter or to settle callbacks that
+arrived for unknown transactions:
+
+    python manage.py replay_callbacks --result unknown_transaction
+    python manage.py replay_callbacks --payment <transaction-id>
+
+Replaying is safe: transactions only move through allowed status changes
+and each top-up is credited to the ledger once.
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from payments.callbacks import process_callbacks
+from payments.models import PaymentCallback
+
+
+class Command(BaseCommand):
+    help = 'Reprocess stored mobile money callbacks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', help='Only callbacks from this provider')
+        parser.add_argument('--payment', help='Only callbacks for this payment transaction')
+        parser.add_argument(
+            '--result',
+            choices=[choice for choice, _ in PaymentCallback.RESULT_CHOICES],
+            help='Only callbacks that had this result',
+        )
+        parser.add_argument('--since', help='Only callbacks received at or after this ISO datetime')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Callbacks applied per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Only mark them unprocessed and leave them to the payment worker',
+        )
+
+    def handle(self, *args, **options):
+        callbacks = PaymentCallback.objects.filter(processed_at__isnull=False)
+        if options['provider']:
+            callbacks = callbacks.filter(provider=options['provider'])
+        if options['payment']:
+            callbacks = callbacks.filter(payment_id=options['payment'])
+        if options['result']:
+            callbacks = callbacks.filter(result=options['result'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('--since must be an ISO datetime')
+            callbacks = callbacks.filter(received_at__gte=since)
+
+        queued = callbacks.update(processed_at=None, result='')
+        if options['queue'] or not queued:
+            self.stdout.write(self.style.SUCCESS(f'✓ Queued {queued} callbacks for reprocessing'))
+            return
+
+        totals = Counter()
+        while True:
+            results = process_callbacks(options['batch_size'])
+            if not results:
+                break
+            totals.update(results)
+
+        summary = ', '.join(f'{n} {result}' for result, n in sorted(totals.items()))
+        self.stdout.write(self.style.SUCCESS(f'✓ Replayed {queued} callbacks ({summary})'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:17
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0003_user_company_name_alter_role_name_company_and_more'),
+        ('customers', '0005_balance_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentTransaction',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('provider', models.CharField(choices=[('mtn', 'MTN Mobile Money'), ('airtel', 'Airtel Money')], max_length=20)),
+                ('msisdn', models.CharField(help_text='Mobile money number charged', max_length=20)),
+                ('collections', models.PositiveIntegerField(help_text='Prepaid collections bought')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('currency', models.CharField(default='RWF', max_length=3)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('submitted', 'Submitted'), ('successful', 'Successful'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=20)),
+                ('provider_reference', models.CharField(blank=True, help_text='Transaction ID assigned by the provider', max_length=100)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Gateway calls that failed and were retried')),
+                ('next_attempt_at', models.DateTimeField(blank=True, help_text='When the worker should next submit or poll; null once final', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payment_transactions', to='accounts.company')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payment_transactions', to='customers.customer')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_transactions_requested', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Payment Transaction',
+                'verbose_name_plural': 'Payment Transactions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='payment_txn_due_idx'), models.Index(fields=['customer', '-created_at'], name='payment_txn_customer_idx'), models.Index(fields=['company', '-created_at'], name='payment_txn_company_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_payment_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('provider', models.CharField(choices=[('mtn', 'MTN Mobile Money'), ('airtel', 'Airtel Money')], max_length=20)),
+                ('provider_transaction_id', models.CharField(max_length=100)),
+                ('payment_id', models.UUIDField(blank=True, help_text='PaymentTransaction the callback refers to', null=True)),
+                ('status', models.CharField(blank=True, help_text='Status reported by the provider', max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.CharField(blank=True, choices=[('applied', 'Applied'), ('ignored', 'Ignored'), ('invalid', 'Invalid'), ('unknown_transaction', 'Unknown Transaction')], max_length=30)),
+            ],
+            options={
+                'verbose_name': 'Payment Callback',
+                'verbose_name_plural': 'Payment Callbacks',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='payment_callback_unprocessed'), models.Index(fields=['payment_id'], name='payment_callback_payment_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentcallback',
+            constraint=models.UniqueConstraint(fields=('provider', 'provider_transaction_id', 'status'), name='unique_payment_callback'),
+        ),
+    ]
@@ -1,3 +1,164 @@
+"""
+Payment Models
+Mobile money payment transactions for prepaid collection top-ups.
+"""
+
+import uuid
 from django.db import models
 
-# Create your models here.
+
+class PaymentTransaction(models.Model):
+    """
+    A request-to-pay sent to a mobile money provider.
+
+    Transactions are created 'pending' by the request thread and moved along
+    by the payment worker and provider callbacks only through the transitions
+    in TRANSITIONS. A 'successful' transaction credits the customer's
+    prepaid balance exactly once, referenced by the transaction ID.
+    """
+
+    PROVIDER_CHOICES = [
+        ('mtn', 'MTN Mobile Money'),
+        ('airtel', 'Airtel Money'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('submitted', 'Submitted'),
+        ('successful', 'Successful'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+
+    # Allowed status changes. An expired request can still be confirmed by a
+    # late provider callback, since the payer's money has then been taken.
+    TRANSITIONS = {
+        'pending': {'submitted', 'successful', 'failed'},
+        'submitted': {'successful', 'failed', 'expired'},
+        'successful': set(),
+        'failed': set(),
+        'expired': {'successful'},
+    }
+
+    TERMINAL_STATUSES = ('successful', 'failed', 'expired')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    company = models.ForeignKey(
+        'accounts.Company',
+        on_delete=models.PROTECT,
+        related_name='payment_transactions'
+    )
+    customer = models.ForeignKey(
+        'customers.Customer',
+        on_delete=models.PROTECT,
+        related_name='payment_transactions'
+    )
+
+    # Payment Details
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    msisdn = models.CharField(max_length=20, help_text="Mobile money number charged")
+    collections = models.PositiveIntegerField(help_text="Prepaid collections bought")
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, default='RWF')
+
+    # Processing State
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    provider_reference = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Transaction ID assigned by the provider"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, help_text="Gateway calls that failed and were retried")
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the worker should next submit or poll; null once final"
+    )
+    last_error = models.TextField(blank=True)
+
+    # Metadata
+    requested_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payment_transactions_requested'
+    )
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Worker claim: due pending/submitted transactions
+            models.Index(fields=['status', 'next_attempt_at'], name='payment_txn_due_idx'),
+            models.Index(fields=['customer', '-created_at'], name='payment_txn_customer_idx'),
+            models.Index(fields=['company', '-created_at'], name='payment_txn_company_idx'),
+        ]
+        verbose_name = 'Payment Transaction'
+        verbose_name_plural = 'Payment Transactions'
+
+    def __str__(self):
+        return f"{self.get_provider_display()} {self.amount} {self.currency} ({self.status})"
+
+    @property
+    def is_final(self):
+        return self.status in self.TERMINAL_STATUSES
+
+    @classmethod
+    def sources_for(cls, status):
+        """Statuses a transaction may move to `status` from."""
+        return [source for source, targets in cls.TRANSITIONS.items() if status in targets]
+
+
+class PaymentCallback(models.Model):
+    """
+    A status notification received from a provider, stored as received.
+
+    Callbacks are acknowledged as soon as they are stored and applied to
+    their transactions later in batches by the payment worker. Providers
+    retry and duplicate notifications, so each status reported for a
+    provider transaction ID is stored only once.
+    """
+
+    RESULT_CHOICES = [
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('invalid', 'Invalid'),
+        ('unknown_transaction', 'Unknown Transaction'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    provider = models.CharField(max_length=20, choices=PaymentTransaction.PROVIDER_CHOICES)
+    provider_transaction_id = models.CharField(max_length=100)
+    payment_id = models.UUIDField(null=True, blank=True, help_text="PaymentTransaction the callback refers to")
+    status = models.CharField(max_length=20, blank=True, help_text="Status reported by the provider")
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    result = models.CharField(max_length=30, choices=RESULT_CHOICES, blank=True)
+
+    class Meta:
+        ordering = ['-received_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['provider', 'provider_transaction_id', 'status'],
+                name='unique_payment_callback'
+            ),
+        ]
+        indexes = [
+            # Worker claim: callbacks not yet applied, oldest first
+            models.Index(
+                fields=['id'],
+                condition=models.Q(processed_at__isnull=True),
+                name='payment_callback_unprocessed'
+            ),
+            models.Index(fields=['payment_id'], name='payment_callback_payment_idx'),
+        ]
+        verbose_name = 'Payment Callback'
+        verbose_name_plural = 'Payment Callbacks'
+
+    def __str__(self):
+        return f"{self.provider} {self.provider_transaction_id} ({self.status})"
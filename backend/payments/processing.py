@@ -0,0 +1,233 @@
+"""
+Payment Processing
+Moves mobile money transactions through their lifecycle off the request path.
+
+Request threads only insert a 'pending' transaction (create_top_up). The
+payment worker (`manage.py process_payments`) claims due transactions in
+batches with SELECT ... FOR UPDATE SKIP LOCKED, calls the gateways from a
+thread pool so provider latency overlaps, and applies the results:
+
+    pending   --request_to_pay-->  submitted | successful | failed
+    submitted --callback / poll--> successful | failed | expired
+
+Every status change is a conditional UPDATE from an allowed source status,
+so the worker and provider callbacks can race on the same transaction and
+only one of them wins. The winner of a move to 'successful' credits the
+prepaid balance in the same database transaction.
+"""
+
+import random
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+from customers.balance import DuplicateBalanceEntry, credit
+from .gateways import GatewayError, get_gateway
+from .models import PaymentTransaction
+
+
+# Payment method names accepted from clients, by provider
+PROVIDER_ALIASES = {
+    'momo': 'mtn',
+    'mtn': 'mtn',
+    'mtn_momo': 'mtn',
+    'airtel': 'airtel',
+    'airtel_money': 'airtel',
+}
+
+MAX_COLLECTIONS_PER_TOP_UP = 500
+
+# Failed gateway calls are retried with exponential backoff
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 300
+
+# Submitted requests are polled when no callback has arrived, and expire
+# once the payer has had this long to approve them
+POLL_INTERVAL = timedelta(seconds=30)
+REQUEST_TIMEOUT = timedelta(minutes=10)
+
+# A claimed transaction is hidden from other workers for this long, so a
+# crashed worker's batch is picked up again afterwards
+CLAIM_LEASE = timedelta(minutes=2)
+
+OPEN_STATUSES = ('pending', 'submitted')
+
+
+def resolve_provider(payment_method):
+    """Provider code for a payment method name. Raises ValueError."""
+    provider = PROVIDER_ALIASES.get(str(payment_method or '').lower())
+    if not provider:
+        raise ValueError(f'Unsupported payment method: {payment_method}')
+    return provider
+
+
+def create_top_up(customer, collections, provider, msisdn='', requested_by=None):
+    """
+    Queue a top-up of `collections` prepaid collections for a customer.
+    Priced at the company's prepaid_collection_price. Raises ValueError,
+    also when the provider has no gateway configured.
+    """
+    try:
+        get_gateway(provider)
+    except ImproperlyConfigured:
+        raise ValueError(f'Mobile money payments are not available for {provider}')
+    if not customer.company_id:
+        raise ValueError('Customer is not linked to a company')
+    if not 0 < collections <= MAX_COLLECTIONS_PER_TOP_UP:
+        raise ValueError(f'collections must be between 1 and {MAX_COLLECTIONS_PER_TOP_UP}')
+    msisdn = (msisdn or customer.phone or '').replace(' ', '')
+    if not msisdn:
+        raise ValueError('A mobile money number is required')
+
+    price = customer.company.prepaid_collection_price
+    return PaymentTransaction.objects.create(
+        company_id=customer.company_id,
+        customer=customer,
+        provider=provider,
+        msisdn=msisdn,
+        collections=collections,
+        amount=Decimal(price) * collections,
+        requested_by=requested_by,
+        next_attempt_at=timezone.now(),
+    )
+
+
+def move_to(payment_id, status, **fields):
+    """Conditionally change a transaction's status. Returns whether it moved."""
+    return PaymentTransaction.objects.filter(
+        id=payment_id,
+        status__in=PaymentTransaction.sources_for(status)
+    ).update(status=status, updated_at=timezone.now(), **fields) == 1
+
+
+def apply_result(payment, result):
+    """
+    Apply a gateway result to a transaction, crediting the balance when it
+    succeeds. Returns whether the transaction changed; results that arrive
+    after another one already settled it are ignored.
+    """
+    now = timezone.now()
+    fields = {}
+    if result.provider_reference:
+        fields['provider_reference'] = result.provider_reference
+
+    if result.status == 'submitted':
+        return move_to(payment.id, 'submitted', submitted_at=now, next_attempt_at=now + POLL_INTERVAL, **fields)
+
+    with transaction.atomic():
+        moved = move_to(
+            payment.id,
+            result.status,
+            completed_at=now,
+            next_attempt_at=None,
+            last_error=result.message,
+            **fields
+        )
+        if moved and result.status == 'successful':
+            try:
+                credit(
+                    payment.customer_id,
+                    payment.collections,
+                    kind='top_up',
+                    reference=str(payment.id),
+                    note=f'{payment.get_provider_display()} {result.provider_reference or payment.provider_reference}'.strip(),
+                )
+            except DuplicateBalanceEntry:
+                pass
+    return moved
+
+
+def retry_delay(attempts):
+    """Backoff before attempt number `attempts + 1`, with jitter."""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def record_error(payment, error):
+    """Schedule a retry after a failed gateway call, or give up. Returns the outcome."""
+    now = timezone.now()
+    attempts = payment.attempts + 1
+    open_for = now - (payment.submitted_at or payment.created_at)
+
+    if payment.status == 'submitted' and open_for >= REQUEST_TIMEOUT:
+        move_to(payment.id, 'expired', completed_at=now, next_attempt_at=None, attempts=attempts, last_error=str(error))
+        return 'expired'
+    if payment.status == 'pending' and (not error.retryable or attempts >= MAX_ATTEMPTS):
+        move_to(payment.id, 'failed', completed_at=now, next_attempt_at=None, attempts=attempts, last_error=str(error))
+        return 'failed'
+
+    PaymentTransaction.objects.filter(id=payment.id, status=payment.status).update(
+        attempts=attempts,
+        next_attempt_at=now + retry_delay(attempts),
+        last_error=str(error),
+        updated_at=now,
+    )
+    return 'retry'
+
+
+def claim_due(batch_size, now=None):
+    """Lease up to `batch_size` due open transactions to this worker."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            PaymentTransaction.objects.select_for_update(skip_locked=True).filter(
+                status__in=OPEN_STATUSES,
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        PaymentTransaction.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(PaymentTransaction.objects.filter(id__in=ids))
+
+
+def call_gateway(payment):
+    """Submit or poll one transaction. Runs in worker threads, so no database access."""
+    gateway = get_gateway(payment.provider)
+    try:
+        if payment.status == 'pending':
+            return gateway.request_to_pay(payment)
+        return gateway.get_status(payment)
+    except GatewayError as e:
+        return e
+    except Exception as e:
+        # Bugs and network errors in an adapter must not stop the batch
+        return GatewayError(f'{type(e).__name__}: {e}')
+
+
+def handle_result(payment, result):
+    """Apply what the gateway said about a claimed transaction. Returns the outcome."""
+    if isinstance(result, GatewayError):
+        return record_error(payment, result)
+
+    if result.status == 'submitted' and payment.status == 'submitted':
+        # Still waiting for the payer
+        now = timezone.now()
+        if now - (payment.submitted_at or payment.created_at) >= REQUEST_TIMEOUT:
+            move_to(payment.id, 'expired', completed_at=now, next_attempt_at=None)
+            return 'expired'
+        PaymentTransaction.objects.filter(id=payment.id, status='submitted').update(
+            next_attempt_at=now + POLL_INTERVAL,
+            updated_at=now,
+        )
+        return 'waiting'
+
+    return result.status if apply_result(payment, result) else 'unchanged'
+
+
+def process_due(batch_size=100, executor=None):
+    """
+    Claim one batch of due transactions and process it, calling gateways
+    through `executor` (a concurrent.futures executor) when given.
+    Returns a Counter of outcomes.
+    """
+    payments = claim_due(batch_size)
+    if not payments:
+        return Counter()
+    results = executor.map(call_gateway, payments) if executor else map(call_gateway, payments)
+    return Counter(handle_result(payment, result) for payment, result in zip(payments, results))
@@ -0,0 +1,48 @@
+"""
+Payment Serializers
+"""
+
+from rest_framework import serializers
+
+from .models import PaymentTransaction
+from .processing import MAX_COLLECTIONS_PER_TOP_UP, PROVIDER_ALIASES
+
+
+class PaymentTransactionSerializer(serializers.ModelSerializer):
+    """Serializer for mobile money payment transactions (read-only)."""
+    
+    customer_name = serializers.CharField(source='customer.get_full_name', read_only=True)
+    provider_display = serializers.CharField(source='get_provider_display', read_only=True)
+    
+    class Meta:
+        model = PaymentTransaction
+        fields = [
+            'id',
+            'company',
+            'customer',
+            'customer_name',
+            'provider',
+            'provider_display',
+            'msisdn',
+            'collections',
+            'amount',
+            'currency',
+            'status',
+            'provider_reference',
+            'attempts',
+            'last_error',
+            'requested_by',
+            'submitted_at',
+            'completed_at',
+            'created_at',
+            'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class TopUpRequestSerializer(serializers.Serializer):
+    """Validate a top-up request."""
+    
+    collections = serializers.IntegerField(min_value=1, max_value=MAX_COLLECTIONS_PER_TOP_UP)
+    payment_method = serializers.ChoiceField(choices=sorted(PROVIDER_ALIASES), default='momo')
+    phone = serializers.RegexField(r'^\+?\d{9,15}$', required=False, allow_blank=True)
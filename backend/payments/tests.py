@@ -1,3 +1,144 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from accounts.company_models import Company
+from customers.models import Customer
+from .callbacks import ingest_callback, process_callbacks
+from .gateways import GatewayError, GatewayResult, SimulatedGateway, get_gateway, reset_gateways, set_gateway
+from .models import PaymentCallback, PaymentTransaction
+from .processing import apply_result, create_top_up, move_to, process_due, record_error
+
+
+class PaymentTestCase(TestCase):
+    """Shared fixtures: a customer of a company selling collections at 500."""
+
+    def setUp(self):
+        reset_gateways()
+        self.company = Company.objects.create(
+            name='Green Ltd', email='green@example.com', prepaid_collection_price=Decimal('500')
+        )
+        self.customer = Customer.objects.create(
+            first_name='Aline', last_name='M', email='aline@example.com', phone='0788000001', company=self.company
+        )
+        self.payment = create_top_up(self.customer, 4, 'mtn')
+
+    def tearDown(self):
+        reset_gateways()
+
+    def balance(self):
+        self.customer.refresh_from_db()
+        return self.customer.prepaid_balance
+
+    def status(self):
+        self.payment.refresh_from_db()
+        return self.payment.status
+
+
+class PaymentTransitionTests(PaymentTestCase):
+
+    def test_top_up_is_queued_at_the_company_price(self):
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertEqual(self.payment.amount, Decimal('2000'))
+        self.assertEqual(self.payment.msisdn, '0788000001')
+
+    def test_worker_credits_a_successful_payment_once(self):
+        set_gateway('mtn', SimulatedGateway('mtn', latency=0, error_rate=0, decline_rate=0))
+
+        outcomes = process_due()
+
+        self.assertEqual(outcomes['successful'], 1)
+        self.assertEqual(self.status(), 'successful')
+        self.assertFalse(apply_result(self.payment, GatewayResult('successful', 'REF-1')))
+        self.assertEqual(self.balance(), 4)
+
+    def test_settled_payment_does_not_change_again(self):
+        self.assertTrue(apply_result(self.payment, GatewayResult('failed', message='Declined')))
+
+        self.assertFalse(apply_result(self.payment, GatewayResult('successful', 'REF-1')))
+        self.assertEqual(self.status(), 'failed')
+        self.assertEqual(self.balance(), 0)
+
+    def test_late_success_after_expiry_is_credited(self):
+        move_to(self.payment.id, 'submitted')
+        move_to(self.payment.id, 'expired')
+
+        self.assertTrue(apply_result(self.payment, GatewayResult('successful', 'REF-1')))
+        self.assertEqual(self.status(), 'successful')
+        self.assertEqual(self.balance(), 4)
+
+    def test_gateway_errors_retry_then_fail(self):
+        self.assertEqual(record_error(self.payment, GatewayError('timeout')), 'retry')
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.attempts), ('pending', 1))
+
+        self.assertEqual(record_error(self.payment, GatewayError('bad number', retryable=False)), 'failed')
+        self.assertEqual(self.status(), 'failed')
+
+
+@override_settings(PAYMENT_GATEWAYS={'mtn': {'BACKEND': ''}}, PAYMENT_GATEWAY_SIMULATOR=False)
+class UnconfiguredGatewayTests(PaymentTestCase):
+
+    def setUp(self):
+        with self.settings(PAYMENT_GATEWAY_SIMULATOR=True):
+            super().setUp()
+        reset_gateways()
+
+    def test_provider_without_backend_has_no_gateway(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_gateway('mtn')
+
+    def test_top_up_is_refused(self):
+        with self.assertRaises(ValueError):
+            create_top_up(self.customer, 1, 'mtn')
+
+    def test_callbacks_are_rejected(self):
+        response = self.client.post('/api/v1/payments/callbacks/mtn/', {}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class PaymentCallbackTests(PaymentTestCase):
+
+    def callback(self, status, provider_transaction_id='MTN-1'):
+        ingest_callback('mtn', {
+            'reference': str(self.payment.id),
+            'status': status,
+            'provider_transaction_id': provider_transaction_id,
+        })
+
+    def test_duplicate_callbacks_are_stored_and_credited_once(self):
+        self.callback('successful')
+        self.callback('successful')
+
+        self.assertEqual(PaymentCallback.objects.count(), 1)
+        self.assertEqual(process_callbacks()['applied'], 1)
+        self.assertEqual(process_callbacks(), {})
+        self.assertEqual(self.status(), 'successful')
+        self.assertEqual(self.balance(), 4)
+
+    def test_success_outranks_failure_in_one_batch(self):
+        self.callback('failed')
+        self.callback('successful')
+
+        results = process_callbacks()
+
+        self.assertEqual((results['applied'], results['ignored']), (1, 1))
+        self.assertEqual(self.status(), 'successful')
+        self.assertEqual(self.balance(), 4)
+
+    def test_callback_for_settled_payment_is_ignored(self):
+        apply_result(self.payment, GatewayResult('failed'))
+        self.callback('successful')
+
+        self.assertEqual(process_callbacks()['ignored'], 1)
+        self.assertEqual(self.status(), 'failed')
+        self.assertEqual(self.balance(), 0)
+
+    def test_callback_for_unknown_payment_is_recorded_as_such(self):
+        PaymentTransaction.objects.all().delete()
+        self.callback('successful')
+
+        self.assertEqual(process_callbacks()['unknown_transaction'], 1)
+        self.assertEqual(PaymentCallback.objects.get().result, 'unknown_transaction')
@@ -0,0 +1,17 @@
+"""
+Payments URL Configuration
+"""
+
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import PaymentTransactionViewSet, PaymentCallbackView
+
+router = DefaultRouter()
+router.register(r'transactions', PaymentTransactionViewSet, basename='paymenttransaction')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    
+    # Provider callbacks
+    path('callbacks/<str:provider>/', PaymentCallbackView.as_view(), name='payment-callback'),
+]
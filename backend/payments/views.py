@@ -1,3 +1,121 @@
-from django.shortcuts import render
+"""
+Payment Views
+Mobile money transactions and provider callbacks.
+"""
 
-# Create your views here.
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.http import FileResponse
+from rest_framework import viewsets, status, filters
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django_filters.rest_framework import DjangoFilterBackend
+
+from customers.models import Customer
+from invoices.documents import get_document, receipt_context
+from .callbacks import ingest_callback
+from .gateways import get_gateway
+from .models import PaymentTransaction
+from .processing import create_top_up, resolve_provider
+from .serializers import PaymentTransactionSerializer, TopUpRequestSerializer
+
+
+class PaymentTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for mobile money payment transactions.
+
+    Provides:
+    - List/retrieve with filtering by customer, provider and status
+    - Requesting a top-up payment from a customer's phone
+    - PDF receipts for successful payments
+    """
+    queryset = PaymentTransaction.objects.select_related('customer', 'company').all()
+    serializer_class = PaymentTransactionSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['customer', 'provider', 'status']
+    search_fields = ['msisdn', 'provider_reference', 'customer__first_name', 'customer__last_name']
+    ordering_fields = ['created_at', 'amount', 'status']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.company_id:
+            queryset = queryset.filter(company_id=self.request.user.company_id)
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    def request_top_up(self, request):
+        """
+        Send a mobile money request-to-pay to a customer's phone.
+        The payment is processed in the background; poll the returned
+        transaction for its status.
+        """
+        serializer = TopUpRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        customers = Customer.objects.select_related('company').filter(deleted_at__isnull=True)
+        if request.user.company_id:
+            customers = customers.filter(company_id=request.user.company_id)
+        try:
+            customer = customers.get(id=request.data.get('customer'))
+        except (Customer.DoesNotExist, ValueError, ValidationError):
+            return Response({'error': 'Customer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            payment = create_top_up(
+                customer,
+                serializer.validated_data['collections'],
+                resolve_provider(serializer.validated_data['payment_method']),
+                msisdn=serializer.validated_data.get('phone', ''),
+                requested_by=request.user
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(PaymentTransactionSerializer(payment).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def receipt(self, request, pk=None):
+        """Download the receipt for a successful payment as a PDF."""
+        payment = self.get_object()
+        if payment.status != 'successful':
+            return Response(
+                {'error': 'Receipts are only available for successful payments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        path = get_document('receipt', receipt_context(payment))
+        return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'receipt-{payment.id}.pdf')
+
+
+class PaymentCallbackView(APIView):
+    """
+    Payment status notifications from mobile money providers.
+    Authenticated by the provider's shared callback token.
+
+    Callbacks are stored and acknowledged immediately; the payment worker
+    applies them in batches. Duplicates are acknowledged the same way.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, provider):
+        if provider not in dict(PaymentTransaction.PROVIDER_CHOICES):
+            return Response({'error': 'Unknown provider'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            gateway = get_gateway(provider)
+        except ImproperlyConfigured:
+            return Response({'error': 'Unknown provider'}, status=status.HTTP_404_NOT_FOUND)
+        if not gateway.verify_callback(request):
+            return Response({'error': 'Invalid callback token'}, status=status.HTTP_403_FORBIDDEN)
+
+        payload = request.data.dict() if hasattr(request.data, 'dict') else request.data
+        try:
+            ingest_callback(provider, payload)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'received': True})
@@ -13,6 +13,7 @@ django.setup()
 
 from accounts.models import User, Role
 from accounts.company_models import Company
+from customers.balance import credit
 from customers.models import Customer
 from operations.models import Collector, ServiceArea
 
@@ -165,11 +166,11 @@ def seed_data():
                 phone=f'+25078812{3457 + i}',
                 billing_address=location,
                 status='active',
-                prepaid_balance=random.randint(5, 20),
                 service_provider='C&GS Ltd',
                 company=company,
                 user=customer_user
             )
+            credit(customer.id, random.randint(5, 20), kind='opening', note='Seed data')
             print(f"  ✓ {customer.get_full_name()} - Card: {customer.card_number} | Email: {customer.email}")
     
     # Create service areas